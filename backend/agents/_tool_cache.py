@@ -0,0 +1,49 @@
+"""Small TTL cache for read-only tool calls shared across the backend.
+
+The same user's profile, progress summary and chart data get requested
+several times within a single turn (pre-fetch, UI builders) and again on
+rapid successive turns. Caching by (function, args) for a few seconds
+coalesces those repeats without meaningful staleness; writes that change
+a user's data call invalidate() to drop their entries immediately.
+"""
+
+from typing import Any, Callable, Dict, Tuple
+import threading
+import time
+
+_TTL = 30.0
+_MAX_ENTRIES = 10_000
+
+_lock = threading.RLock()
+_cache: Dict[Tuple, Tuple[float, Any]] = {}
+
+
+def cached_call(fn: Callable, *args, ttl: float = _TTL) -> Any:
+    """Call fn(*args), reusing a result cached within the last ttl seconds.
+
+    Results are only cached when they are dicts without an "error" key, so
+    transient failures are retried rather than pinned.
+    """
+    key = (fn.__name__, args)
+    now = time.monotonic()
+    with _lock:
+        hit = _cache.get(key)
+        if hit is not None and now - hit[0] < ttl:
+            return hit[1]
+
+    result = fn(*args)
+
+    if isinstance(result, dict) and "error" not in result:
+        with _lock:
+            if len(_cache) >= _MAX_ENTRIES:
+                _cache.clear()
+            _cache[key] = (now, result)
+    return result
+
+
+def invalidate(user_id: str) -> None:
+    """Drop every cached entry whose arguments mention user_id."""
+    with _lock:
+        stale = [key for key in _cache if user_id in key[1]]
+        for key in stale:
+            del _cache[key]
@@ -1,11 +1,42 @@
 """LLM client with function calling capabilities."""
 
 from typing import Dict, Any, List
+import asyncio
+import hashlib
 import json
-from openai import OpenAI
+import logging
+import re
+import time
+import httpx
+from openai import AsyncOpenAI
 from openai import OpenAIError, AuthenticationError, APIError
 
 from config import get_settings
+from agents import _tool_cache as shared_tool_cache
+
+log = logging.getLogger("llm_client")
+
+# orjson is a C-accelerated JSON parser (~2-3x faster than stdlib on the
+# small payloads tool calls produce). Fall back to stdlib json if missing.
+# Output is compact: indentation only inflates the bytes the model is billed
+# for as prompt tokens, and (in stdlib json) forces the slow pure-Python
+# encoder path. The model parses compact JSON just as well.
+try:
+    import orjson
+
+    _loads = orjson.loads
+
+    def _dumps(obj) -> str:
+        return orjson.dumps(obj, default=str).decode()
+
+    _JSONDecodeError = orjson.JSONDecodeError
+except ImportError:
+    _loads = json.loads
+
+    def _dumps(obj) -> str:
+        return json.dumps(obj, separators=(",", ":"), default=str)
+
+    _JSONDecodeError = json.JSONDecodeError
 
 # Import all tools
 from tools import user_profile, performance_analysis, quiz_management, recommendations
@@ -13,6 +44,389 @@ from tools import progress_tracking, explanations, motivation
 
 settings = get_settings()
 
+# Keywords that signal the user is asking about their data and therefore
+# needs tool calls (and the stronger model tier). Kept as a module constant
+# so routing and the no-tool-call warning share one definition.
+_DATA_KEYWORDS = (
+    'test', 'exam', 'score', 'result', 'performance', 'progress',
+    'analyze', 'how am i', 'quiz', 'practice', 'improve', 'chart', 'recommend'
+)
+
+# Compiled once so keyword detection is a single linear scan of the message
+# instead of one substring pass per keyword.
+_DATA_RE = re.compile("|".join(re.escape(kw) for kw in _DATA_KEYWORDS), re.IGNORECASE)
+
+# Deterministic intents whose required tool set the system prompt hard-codes
+# anyway. Dispatching them directly skips the tool-selection LLM round trip:
+# the tools run immediately and a single completion turns the results into
+# prose. Each entry maps a pattern to (tool_name, extra_args) specs; user_id
+# is injected at dispatch time.
+_FASTPATH = [
+    (
+        re.compile(r"analyz\w*\b.*\b(test|exam)", re.IGNORECASE),
+        (
+            ("get_latest_test_results", {}),
+            ("generate_bar_chart_data", {}),
+            ("analyze_performance_by_topic", {"section": "math"}),
+        ),
+    ),
+]
+
+# Per-tool whitelists of the keys the model actually needs. Everything else
+# (full question lists, raw response arrays) is stripped before the result
+# re-enters the context window: those bytes become prompt tokens on every
+# remaining loop iteration, and a stable, minimal payload also keeps the
+# prefix friendlier to the provider's prompt cache.
+_TOOL_SUMMARY_KEYS = {
+    "get_latest_test_results": (
+        "success", "test_id", "test_type", "total_score", "date_taken",
+        "sections", "completion_status", "message"
+    ),
+    "generate_adaptive_quiz": (
+        "success", "message", "quiz_id", "total_questions", "section", "focus_areas"
+    ),
+    "generate_bar_chart_data": (
+        "test_id", "test_type", "total_score", "bars", "max_value"
+    ),
+    "get_progress_summary": (
+        "test_type", "target_score", "current_score", "days_until_test",
+        "total_questions_attempted", "overall_accuracy", "recent_accuracy",
+        "accuracy_trend", "improvement", "practice_streak", "weak_areas", "strong_areas"
+    ),
+}
+
+# Read-only tools whose results can be reused for a short window. The system
+# prompt forces several of these in one "analyze my test" turn and they all
+# hit the same underlying user data, so a short TTL cache removes duplicate
+# store round trips. Tools with side effects (quiz creation/submission,
+# profile updates) are deliberately excluded.
+_CACHEABLE_TOOLS = frozenset({
+    "get_user_profile",
+    "get_learning_history",
+    "get_latest_test_results",
+    "analyze_performance_by_topic",
+    "identify_error_patterns",
+    "compare_progress",
+    "generate_bar_chart_data",
+    "search_questions",
+    "generate_study_recommendations",
+    "suggest_practice_topics",
+    "get_progress_summary",
+    "track_study_streak",
+    "get_question_explanation",
+    "explain_topic_concept",
+})
+
+# Phrases the model emits when it wrongly claims tool data was missing.
+# Compiled into a single case-insensitive alternation so the validator does
+# one C-level scan of the response instead of N Python substring passes
+# (and no longer needs a lowercased copy of the text).
+_NO_DATA_KEYWORDS = (
+    "haven't taken", "no test", "no results", "couldn't find", "could not find",
+    "didn't find", "unable to find", "issue finding", "don't have any results",
+    "hiccup", "issue with", "not being recognized", "verify your user"
+)
+_NO_DATA_RE = re.compile("|".join(re.escape(kw) for kw in _NO_DATA_KEYWORDS), re.IGNORECASE)
+
+# Characters that can open a markdown construct; text without any of them
+# needs no regex passes at all.
+_MD_SENTINELS = '*_#`[~'
+
+# Markdown-stripping patterns for _clean_markdown, compiled once at import.
+# re's internal cache is LRU-bounded and still pays a per-call dict probe,
+# so the hot path iterates compiled objects directly.
+_MD_PATTERNS = [
+    (re.compile(r'\*\*([^*]+)\*\*'), r'\1'),                    # bold **text**
+    (re.compile(r'__([^_]+)__'), r'\1'),                        # bold __text__
+    (re.compile(r'\*([^*]+)\*'), r'\1'),                        # italic *text*
+    (re.compile(r'_([^_]+)_'), r'\1'),                          # italic _text_
+    (re.compile(r'~~([^~]+)~~'), r'\1'),                        # strikethrough
+    (re.compile(r'^#{1,6}\s+', re.MULTILINE), ''),              # headers
+    (re.compile(r'\[([^\]]+)\]\([^\)]+\)'), r'\1'),             # links
+    (re.compile(r'```[\w]*\n?([^`]+)```', re.DOTALL), r'\1'),   # code blocks
+    (re.compile(r'`([^`]+)`'), r'\1'),                          # inline code
+    (re.compile(r'^[\s]*[-*+]\s+', re.MULTILINE), ''),          # list markers
+    (re.compile(r'^\s*\d+\.\s+', re.MULTILINE), ''),            # numbered lists
+    (re.compile(r'\n{3,}'), '\n\n'),                            # extra blank lines
+]
+
+
+# Tool schema for function calling is a constant; building it once at import
+# avoids re-allocating the nested dict structure per agent instance and per
+# request.
+_TOOLS_SCHEMA: List[Dict[str, Any]] = [
+    {
+        "type": "function",
+        "function": {
+            "name": "get_user_profile",
+            "description": "Retrieve user's complete profile including test type, target score, study preferences, and timeline",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "user_id": {
+                        "type": "string",
+                        "description": "The user's unique identifier"
+                    }
+                },
+                "required": ["user_id"]
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "get_learning_history",
+            "description": "Get user's practice history, study sessions, and activity statistics over a time period",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "user_id": {"type": "string"},
+                    "days": {
+                        "type": "integer",
+                        "description": "Number of days to look back",
+                        "default": 30
+                    }
+                },
+                "required": ["user_id"]
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "get_latest_test_results",
+            "description": "Get most recent practice test results with detailed breakdown by section",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "user_id": {"type": "string"},
+                    "test_id": {
+                        "type": "string",
+                        "description": "Optional specific test ID"
+                    }
+                },
+                "required": ["user_id"]
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "analyze_performance_by_topic",
+            "description": "Get detailed breakdown of performance across topics and subtopics for a specific section",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "user_id": {"type": "string"},
+                    "section": {
+                        "type": "string",
+                        "enum": ["math", "reading", "writing", "verbal", "quantitative"],
+                        "description": "Test section to analyze"
+                    },
+                    "timeframe": {
+                        "type": "string",
+                        "enum": ["week", "month", "all"],
+                        "default": "all"
+                    }
+                },
+                "required": ["user_id", "section"]
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "identify_error_patterns",
+            "description": "Analyze mistakes to identify patterns like topic weaknesses, difficulty struggles, or time management issues",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "user_id": {"type": "string"}
+                },
+                "required": ["user_id"]
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "compare_progress",
+            "description": "Compare current performance vs past performance or target score to show improvement",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "user_id": {"type": "string"},
+                    "comparison_type": {
+                        "type": "string",
+                        "enum": ["historical", "target"],
+                        "default": "historical"
+                    }
+                },
+                "required": ["user_id"]
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "generate_adaptive_quiz",
+            "description": "Create a personalized quiz based on user's weak areas, preferences, and performance history",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "user_id": {"type": "string"},
+                    "config": {
+                        "type": "object",
+                        "properties": {
+                            "size": {"type": "integer", "default": 20},
+                            "section": {"type": "string"},
+                            "topics": {"type": "array", "items": {"type": "string"}},
+                            "difficulty": {"type": "string"}
+                        }
+                    }
+                },
+                "required": ["user_id", "config"]
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "generate_study_recommendations",
+            "description": "Generate personalized study recommendations based on performance analysis and time until test",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "user_id": {"type": "string"}
+                },
+                "required": ["user_id"]
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "get_progress_summary",
+            "description": "Get comprehensive progress summary with trends, milestones, and achievements",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "user_id": {"type": "string"}
+                },
+                "required": ["user_id"]
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "track_study_streak",
+            "description": "Track consecutive days of study activity and provide motivation",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "user_id": {"type": "string"}
+                },
+                "required": ["user_id"]
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "get_question_explanation",
+            "description": "Get detailed explanation for a specific question with step-by-step breakdown",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "question_id": {"type": "string"},
+                    "detailed": {"type": "boolean", "default": True}
+                },
+                "required": ["question_id"]
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "generate_encouragement",
+            "description": "Generate personalized encouragement based on user's progress and current context",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "user_id": {"type": "string"},
+                    "context": {
+                        "type": "string",
+                        "enum": ["general", "after_quiz", "struggling", "milestone"],
+                        "default": "general"
+                    }
+                },
+                "required": ["user_id"]
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "generate_bar_chart_data",
+            "description": "Generate bar chart data visualization from test results showing scores by section/topic. Use this when user asks to analyze their test scores or wants to see a visual breakdown.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "user_id": {"type": "string"},
+                    "test_id": {
+                        "type": "string",
+                        "description": "Optional specific test ID to analyze. If not provided, uses most recent test."
+                    }
+                },
+                "required": ["user_id"]
+            }
+        }
+    }
+]
+
+
+# Parameter names per tool, precomputed so the per-tool-call user_id check
+# is an O(1) dict lookup instead of a linear scan over the schema.
+_TOOL_PARAMS: Dict[str, frozenset] = {
+    tool["function"]["name"]: frozenset(tool["function"].get("parameters", {}).get("properties", {}))
+    for tool in _TOOLS_SCHEMA
+}
+
+
+# Once a turn's first tool round has shown what the user is doing, later
+# iterations only need the tools reachable from that phase. A smaller tools
+# payload is fewer prompt tokens on every follow-up completion; the full set
+# is kept whenever the last tool gives no phase signal.
+_PHASE_BY_TOOL = {
+    "get_latest_test_results": "analysis",
+    "analyze_performance_by_topic": "analysis",
+    "identify_error_patterns": "analysis",
+    "compare_progress": "analysis",
+    "generate_bar_chart_data": "analysis",
+    "get_progress_summary": "analysis",
+    "track_study_streak": "analysis",
+    "generate_study_recommendations": "analysis",
+    "generate_adaptive_quiz": "quiz",
+}
+
+_PHASE_TOOL_NAMES = {
+    "analysis": frozenset({
+        "get_latest_test_results", "analyze_performance_by_topic",
+        "identify_error_patterns", "compare_progress", "generate_bar_chart_data",
+        "get_progress_summary", "track_study_streak",
+        "generate_study_recommendations", "generate_adaptive_quiz",
+    }),
+    "quiz": frozenset({
+        "generate_adaptive_quiz", "get_question_explanation", "generate_encouragement",
+    }),
+}
+
+_PHASE_TOOLS = {
+    phase: [tool for tool in _TOOLS_SCHEMA if tool["function"]["name"] in names]
+    for phase, names in _PHASE_TOOL_NAMES.items()
+}
+
 
 class TestPrepAgent:
     """LLM-powered test prep agent with function calling."""
@@ -25,253 +439,56 @@ class TestPrepAgent:
         # Debug: Show API key info (masked for security)
         if api_key:
             masked_key = f"{api_key[:10]}...{api_key[-4:]}" if len(api_key) > 14 else "***"
-            print(f"🔑 Initializing OpenAI client with API key (length: {len(api_key)}, preview: {masked_key})")
+            log.info("Initializing OpenAI client with API key (length: %d, preview: %s)", len(api_key), masked_key)
             
             # Verify API key format
             if not api_key.startswith('sk-'):
-                print(f"⚠️  WARNING: API key doesn't start with 'sk-'")
+                log.warning("API key doesn't start with 'sk-'")
             if len(api_key) < 20:
-                print(f"⚠️  WARNING: API key seems too short (length: {len(api_key)})")
+                log.warning("API key seems too short (length: %d)", len(api_key))
         else:
             raise ValueError("OPENAI_API_KEY is missing or empty!")
         
-        self.client = OpenAI(api_key=api_key)
-        self.model = "gpt-4-turbo-preview"
-        self.tools = self._define_tools()
+        # Shared async HTTP pool: keep-alive connections avoid a TCP/TLS
+        # handshake per completion, and async I/O keeps the event loop free
+        # so multiple user sessions can be served concurrently.
+        self._http = httpx.AsyncClient(
+            http2=True,
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=50),
+            timeout=30.0
+        )
+        self.client = AsyncOpenAI(api_key=api_key, http_client=self._http)
+        # Tiered routing: data questions go to the full model, chit-chat and
+        # simple follow-ups to the much faster/cheaper light tier.
+        self.model = "gpt-4o"
+        self.light_model = "gpt-4o-mini"
+        self.tools = _TOOLS_SCHEMA
         self.tool_map = self._create_tool_map()
-    
+        # Reuse one system message dict per agent instead of rebuilding it
+        # on every request
+        self._system_msg = {"role": "system", "content": self._SYSTEM_PROMPT}
+        self._example_msg = {"role": "assistant", "content": self._FORMAT_EXAMPLE}
+        # Short-TTL memo of read-only tool results: (name, args) -> (time, result)
+        self._tool_cache: Dict[tuple, tuple] = {}
+        self._tool_cache_ttl = 60.0
+        # Exact-match completion cache: an identical (model, messages, tools)
+        # request within the TTL replays the prior response without a network
+        # round trip. Mostly pays off for dev/retry traffic where the same
+        # turn is resent verbatim.
+        self._resp_cache: Dict[str, tuple] = {}
+        self._resp_cache_ttl = 120.0
+        # Full payloads of summarized tool results, keyed by tool_call id, so
+        # a later explicit request can still expand them
+        self._raw_results: Dict[str, Any] = {}
+
+    async def aclose(self):
+        """Close the shared HTTP connection pool at shutdown."""
+        await self.client.close()
+        await self._http.aclose()
+
     def _define_tools(self) -> List[Dict[str, Any]]:
         """Define all available tools for function calling."""
-        return [
-            {
-                "type": "function",
-                "function": {
-                    "name": "get_user_profile",
-                    "description": "Retrieve user's complete profile including test type, target score, study preferences, and timeline",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "user_id": {
-                                "type": "string",
-                                "description": "The user's unique identifier"
-                            }
-                        },
-                        "required": ["user_id"]
-                    }
-                }
-            },
-            {
-                "type": "function",
-                "function": {
-                    "name": "get_learning_history",
-                    "description": "Get user's practice history, study sessions, and activity statistics over a time period",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "user_id": {"type": "string"},
-                            "days": {
-                                "type": "integer",
-                                "description": "Number of days to look back",
-                                "default": 30
-                            }
-                        },
-                        "required": ["user_id"]
-                    }
-                }
-            },
-            {
-                "type": "function",
-                "function": {
-                    "name": "get_latest_test_results",
-                    "description": "Get most recent practice test results with detailed breakdown by section",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "user_id": {"type": "string"},
-                            "test_id": {
-                                "type": "string",
-                                "description": "Optional specific test ID"
-                            }
-                        },
-                        "required": ["user_id"]
-                    }
-                }
-            },
-            {
-                "type": "function",
-                "function": {
-                    "name": "analyze_performance_by_topic",
-                    "description": "Get detailed breakdown of performance across topics and subtopics for a specific section",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "user_id": {"type": "string"},
-                            "section": {
-                                "type": "string",
-                                "enum": ["math", "reading", "writing", "verbal", "quantitative"],
-                                "description": "Test section to analyze"
-                            },
-                            "timeframe": {
-                                "type": "string",
-                                "enum": ["week", "month", "all"],
-                                "default": "all"
-                            }
-                        },
-                        "required": ["user_id", "section"]
-                    }
-                }
-            },
-            {
-                "type": "function",
-                "function": {
-                    "name": "identify_error_patterns",
-                    "description": "Analyze mistakes to identify patterns like topic weaknesses, difficulty struggles, or time management issues",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "user_id": {"type": "string"}
-                        },
-                        "required": ["user_id"]
-                    }
-                }
-            },
-            {
-                "type": "function",
-                "function": {
-                    "name": "compare_progress",
-                    "description": "Compare current performance vs past performance or target score to show improvement",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "user_id": {"type": "string"},
-                            "comparison_type": {
-                                "type": "string",
-                                "enum": ["historical", "target"],
-                                "default": "historical"
-                            }
-                        },
-                        "required": ["user_id"]
-                    }
-                }
-            },
-            {
-                "type": "function",
-                "function": {
-                    "name": "generate_adaptive_quiz",
-                    "description": "Create a personalized quiz based on user's weak areas, preferences, and performance history",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "user_id": {"type": "string"},
-                            "config": {
-                                "type": "object",
-                                "properties": {
-                                    "size": {"type": "integer", "default": 20},
-                                    "section": {"type": "string"},
-                                    "topics": {"type": "array", "items": {"type": "string"}},
-                                    "difficulty": {"type": "string"}
-                                }
-                            }
-                        },
-                        "required": ["user_id", "config"]
-                    }
-                }
-            },
-            {
-                "type": "function",
-                "function": {
-                    "name": "generate_study_recommendations",
-                    "description": "Generate personalized study recommendations based on performance analysis and time until test",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "user_id": {"type": "string"}
-                        },
-                        "required": ["user_id"]
-                    }
-                }
-            },
-            {
-                "type": "function",
-                "function": {
-                    "name": "get_progress_summary",
-                    "description": "Get comprehensive progress summary with trends, milestones, and achievements",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "user_id": {"type": "string"}
-                        },
-                        "required": ["user_id"]
-                    }
-                }
-            },
-            {
-                "type": "function",
-                "function": {
-                    "name": "track_study_streak",
-                    "description": "Track consecutive days of study activity and provide motivation",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "user_id": {"type": "string"}
-                        },
-                        "required": ["user_id"]
-                    }
-                }
-            },
-            {
-                "type": "function",
-                "function": {
-                    "name": "get_question_explanation",
-                    "description": "Get detailed explanation for a specific question with step-by-step breakdown",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "question_id": {"type": "string"},
-                            "detailed": {"type": "boolean", "default": True}
-                        },
-                        "required": ["question_id"]
-                    }
-                }
-            },
-            {
-                "type": "function",
-                "function": {
-                    "name": "generate_encouragement",
-                    "description": "Generate personalized encouragement based on user's progress and current context",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "user_id": {"type": "string"},
-                            "context": {
-                                "type": "string",
-                                "enum": ["general", "after_quiz", "struggling", "milestone"],
-                                "default": "general"
-                            }
-                        },
-                        "required": ["user_id"]
-                    }
-                }
-            },
-            {
-                "type": "function",
-                "function": {
-                    "name": "generate_bar_chart_data",
-                    "description": "Generate bar chart data visualization from test results showing scores by section/topic. Use this when user asks to analyze their test scores or wants to see a visual breakdown.",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "user_id": {"type": "string"},
-                            "test_id": {
-                                "type": "string",
-                                "description": "Optional specific test ID to analyze. If not provided, uses most recent test."
-                            }
-                        },
-                        "required": ["user_id"]
-                    }
-                }
-            }
-        ]
+        return _TOOLS_SCHEMA
     
     def _create_tool_map(self) -> Dict[str, Any]:
         """Map function names to actual function implementations."""
@@ -297,107 +514,42 @@ class TestPrepAgent:
             "celebrate_achievement": motivation.celebrate_achievement,
         }
     
-    def _get_system_prompt(self) -> str:
-        """Return comprehensive system prompt."""
-        return """You are an expert test preparation coach specializing in standardized tests and certifications (ABC Certification, SAT, GRE, GMAT, etc.).
-
-Your role is to:
-1. Analyze student performance and identify strengths/weaknesses using the available tools
-2. Provide personalized study recommendations based on actual data
-3. Generate adaptive practice quizzes tailored to each student's needs
-4. Explain concepts and solutions clearly with step-by-step breakdowns
-5. Motivate and encourage students throughout their learning journey
-6. Track progress and celebrate achievements
-7. Help students develop effective test-taking strategies
-
-CRITICAL: YOU MUST USE TOOLS - NEVER GUESS OR ASSUME
-
-MANDATORY TOOL USAGE RULES (CRITICAL - FOLLOW EXACTLY):
-
-**CRITICAL RULE**: When a tool returns data with "success": true and "total_score", that means DATA EXISTS.
-You MUST acknowledge the data and use it. NEVER say "I couldn't find" or "you haven't taken" when tools return actual data.
-
-1. When user asks to "analyze my test", "analyze my exam", "analyze my last test", YOU MUST:
-   - STEP 1: get_latest_test_results(user_id) - ALWAYS call this first
-   - STEP 2: If get_latest_test_results returns {"success": true, "total_score": X, "sections": {...}}, DATA EXISTS! Use it!
-   - STEP 3: generate_bar_chart_data(user_id) - Always call this to create visualizations
-   - STEP 4: analyze_performance_by_topic(user_id, section) - Call for relevant sections
-   - NEVER say "you haven't taken a test" if get_latest_test_results returned data with scores
-
-2. When user asks about scores/results/performance/test/exam (without "analyze"), YOU MUST CALL:
-   - get_latest_test_results(user_id) - This is MANDATORY, never assume test results exist
-
-3. When user asks about progress/how they're doing, YOU MUST CALL:
-   - get_progress_summary(user_id) - Mandatory for progress questions
-
-4. If you see [SYSTEM: User explicitly requested to analyze their test...] in the message, THIS IS A DIRECT ORDER:
-   - You MUST call all three tools: get_latest_test_results, analyze_performance_by_topic, and generate_bar_chart_data
-   - DO NOT respond without calling these tools
-   - If a tool returns an error, still acknowledge the error and explain what went wrong
-
-5. If NO data is pre-fetched, YOU MUST CALL TOOLS:
-   - User asks about test/exam/score/results → CALL get_latest_test_results
-   - User asks to "analyze my test" or "analyze my exam" → CALL get_latest_test_results AND analyze_performance_by_topic AND generate_bar_chart_data
-   - User asks about progress/how they're doing → CALL get_progress_summary
-   - User asks how to improve → CALL get_latest_test_results AND identify_error_patterns
-   - User asks for practice questions/quiz → CALL generate_adaptive_quiz
-   - User asks about specific topics/weak areas → CALL analyze_performance_by_topic
-   - User asks for recommendations → CALL generate_study_recommendations
-   - User asks to see charts/visualization → CALL generate_bar_chart_data
-
-QUIZ GENERATION INTERPRETATION:
-- If generate_adaptive_quiz returns {"success": true, "quiz_id": "...", "total_questions": N}, quiz was CREATED SUCCESSFULLY
-- NEVER say "hiccup" or "issue finding profile" when quiz tool returns success=true
-- When quiz is created, acknowledge it: "I've created a personalized quiz with N questions for you!"
-
-6. NEVER respond without calling tools when users ask about:
-   - Their test scores or exam results (ALWAYS call get_latest_test_results first)
-   - Their performance or progress
-   - How to improve their scores
-   - Weak areas or topics
-   - Practice questions or quizzes
-   - Charts or visualizations
-
-7. If a tool returns an error (e.g., "No test results found"), acknowledge it clearly:
-   - Explain what the error means
-   - Offer alternatives (e.g., "It looks like you haven't taken a practice test yet. Would you like to take one now?")
-   - Never make up or guess test results
-
-Conversation Guidelines:
-- Be warm, encouraging, and supportive - you're their personal coach
-- Always use tools to access actual data before making claims about performance
-- Ask clarifying questions when needed to understand the student's goals
-- Remember context from previous messages in the conversation
-- Break down complex topics into digestible explanations
-- Celebrate progress and milestones genuinely
-- Be honest about challenges but always provide actionable next steps
-- Use specific numbers and metrics when discussing performance
-
-Response Formatting (CRITICAL - ALWAYS USE MARKDOWN):
-- **MANDATORY**: Use **Markdown formatting** in ALL responses for better readability
-- **ALWAYS bold these key elements**:
-  * ALL scores (e.g., **800**, **240 points**, **85th percentile**)
-  * Section names when showing results (e.g., **Reading**, **Algebra**, **Geometry**)
-  * Key metrics and percentages (e.g., **60% accuracy**, **90 days**)
-  * Important terms and focus areas (e.g., **weak areas**, **strongest section**)
-  * Action items and recommendations (e.g., **Practice daily**, **Take practice tests**)
-- Use *italic* for subtle emphasis or terminology
-- Use bullet points (- or *) for lists and multiple items
-- Use numbered lists (1., 2., 3.) for sequential steps or rankings
-- Use headers (##, ###) sparingly for major sections if needed
-- Write naturally and conversationally, as if speaking to a friend
-- Use emojis sparingly and only when appropriate (🎯, 💪, 📈, etc.)
-- The mobile app will render your markdown beautifully
-
-Markdown Examples (FOLLOW THIS FORMAT):
-- Scores: "You scored a **800** which is a marked improvement!"
-- Sections: "**Reading**: **240 points** (**85th percentile**)"
-- Lists: "Here are your weak areas:\n- **Algebra** (45%)\n- **Geometry** (52%)\n- **Data Analysis** (68%)"
-- Emphasis: "Your *strongest section* is **Reading** with **90% accuracy**!"
-- Steps: "1. **Focus on algebra** - Practice 15-20 questions daily\n2. **Review geometry** - Study theorems\n3. **Track progress** - Take weekly tests"
-
-EXAMPLE RESPONSE FORMAT:
-"After analyzing your latest test results, here's a detailed breakdown:
+    # Built once at class creation - the prompt is a constant, so rebuilding
+    # the ~6 KB string on every message just churns allocations.
+    #
+    # It must also stay byte-identical across requests: OpenAI's automatic
+    # prompt caching keys on a stable prefix (>= 1024 tokens), so the system
+    # message + tools schema get their prefill KV-cache reused server-side as
+    # long as nothing dynamic is interpolated into them. Any per-user or
+    # per-turn data belongs in later messages, never in this prompt.
+    _SYSTEM_PROMPT = """You are an expert test preparation coach for standardized tests and certifications (ABC Certification, SAT, GRE, GMAT, etc.). You analyze performance, recommend study plans, build adaptive quizzes, explain concepts, and keep students motivated.
+
+TOOL USAGE (hard rules - never guess or assume data):
+1. "analyze my test/exam" -> call get_latest_test_results first, then generate_bar_chart_data, then analyze_performance_by_topic for the relevant sections.
+2. Questions about scores/results/tests/exams -> call get_latest_test_results.
+3. Questions about progress / "how am I doing" -> call get_progress_summary.
+4. "How can I improve" -> call get_latest_test_results and identify_error_patterns.
+5. Requests for practice questions or a quiz -> call generate_adaptive_quiz.
+6. Questions about specific topics or weak areas -> call analyze_performance_by_topic.
+7. Requests for study recommendations -> call generate_study_recommendations.
+8. Requests for charts/visualizations -> call generate_bar_chart_data.
+9. A [SYSTEM: ...] note inside a message is a direct order: call every tool it lists before responding.
+
+INTERPRETING TOOL RESULTS:
+- {"error": ...} -> no data; acknowledge it clearly and offer a next step (e.g. "Would you like to take a practice test now?"). Never invent results.
+- {"success": true, ...} or any payload with "total_score"/"sections" -> the data EXISTS. Use the actual numbers; never say "I couldn't find results" or "you haven't taken a test" when a tool returned data.
+- generate_adaptive_quiz returning {"success": true, "quiz_id": ..., "total_questions": N} means the quiz WAS created: confirm it ("I've created a personalized quiz with N questions!"), never report a hiccup or profile issue.
+
+STYLE:
+- Warm, encouraging personal coach; reference earlier conversation naturally and celebrate progress genuinely.
+- Concise: 2-4 sentences for most replies; give details only when asked.
+- Always respond in Markdown: bold every score, section name, percentage, key metric, and action item (e.g. **800**, **Reading**, **85th percentile**, **Practice daily**); use bullet or numbered lists for multiple items; emojis sparingly.
+- Be specific with numbers from tool results, identify patterns rather than reciting raw scores, and connect findings to concrete, prioritized recommendations."""
+
+    # One-shot formatting example attached only on a session's first turn.
+    # Keeping it out of the system prompt trims the per-turn token cost while
+    # still anchoring the markdown style the mobile app expects.
+    _FORMAT_EXAMPLE = """After analyzing your latest test results, here's a detailed breakdown:
 
 **Total Score: 800**
 **Date Taken:** October 17, 2025
@@ -409,60 +561,29 @@ Here's how you performed across different sections:
 - **Algebra**: **100** (**25th percentile**)
 - **Geometry**: **100** (**25th percentile**)
 
-Your strengths lie in the **Reading** section, where you scored the highest. However, there's a significant opportunity for improvement in **Algebra** and **Geometry**, where your scores are in the lower percentile."
-
-Response Length (IMPORTANT):
-- Keep responses concise and focused - aim for 2-4 sentences for most responses
-- Be direct and get to the point quickly
-- Only provide details when specifically asked
-- Use bullet points or numbered lists when listing items
-- Avoid lengthy explanations unless the user explicitly requests more detail
-
-When analyzing performance:
-- MANDATORY: Always call tools to pull actual data - NEVER guess or assume scores
-- For test analysis: Call get_latest_test_results FIRST, then analyze_performance_by_topic, then generate_bar_chart_data
-- For progress questions: Call get_progress_summary
-- CRITICAL: When you call a tool and it returns data (NOT an error), that means the data EXISTS and is available
-- IMPORTANT: If get_latest_test_results returns a JSON object with "total_score" and "sections" (no "error" field), then test results ARE FOUND and available
-- DO NOT say "I couldn't find test results" if the tool returned data with scores - the data IS there, you must acknowledge it
-- When tool returns data successfully, acknowledge the scores and provide analysis based on the actual numbers returned
-- Be specific with numbers, percentages, and comparisons from actual tool results
-- Identify patterns, not just individual scores
-- Connect findings to concrete, actionable recommendations
-- Prioritize the most impactful areas for improvement
-
-TOOL RESPONSE INTERPRETATION:
-- If tool returns {"error": "..."} → No data found, acknowledge this clearly
-- If tool returns {"total_score": ..., "sections": {...}} → Data EXISTS, use it in your response
-- NEVER claim "I couldn't find results" when a tool successfully returns data
-
-When explaining concepts:
-- Start with the big picture before diving into details
-- Use examples relevant to actual test questions
-- Point out common mistakes and misconceptions
-- Provide practice opportunities and check for understanding
-- Adapt your explanation style based on the student's level
-
-When recommending practice:
-- Base recommendations on actual performance data
-- Consider time until the test and study availability
-- Balance weak areas with maintaining strengths
-- Make recommendations specific and actionable
-- Follow up on previous commitments and goals
-
-Maintain conversation context:
-- Reference previous discussions naturally
-- Follow up on commitments ("Last time you mentioned...")
-- Track user sentiment and adjust tone accordingly
-- Remember stated goals, preferences, and concerns
-
-Always strive to be helpful, accurate, and motivating. Your goal is to help students achieve their target scores and build confidence."""
+Your strengths lie in the **Reading** section, where you scored the highest. However, there's a significant opportunity for improvement in **Algebra** and **Geometry**, where your scores are in the lower percentile."""
+
+    def _get_system_prompt(self) -> str:
+        """Return comprehensive system prompt."""
+        return self._SYSTEM_PROMPT
+
+    def _select_model(self, message: str, history_len: int) -> str:
+        """Pick the model tier for this turn.
+
+        Short conversations with no data keywords ("thanks", "ok", greetings)
+        don't need tool calls, so they route to the light model, which has
+        much lower time-to-first-token and cost per token.
+        """
+        if history_len <= 4 and not _DATA_RE.search(message):
+            return self.light_model
+        return self.model
 
     async def process_message(
         self,
         user_id: str,
         message: str,
-        conversation_history: List[Dict[str, str]]
+        conversation_history: List[Dict[str, str]],
+        force_tools: bool = False
     ) -> Dict[str, Any]:
         """
         Process user message with function calling.
@@ -471,40 +592,48 @@ Always strive to be helpful, accurate, and motivating. Your goal is to help stud
             user_id: User's unique identifier
             message: User's message
             conversation_history: Previous conversation turns
+            force_tools: Run the analysis tool set directly instead of
+                letting the model decide (used for explicit analysis asks)
             
         Returns:
             Assistant response with metadata
         """
-        # Limit conversation history to recent messages for faster processing
-        # Keep only last 5 exchanges (10 messages) to reduce context size
-        limited_history = conversation_history[-10:] if len(conversation_history) > 10 else conversation_history
+        # The orchestrator passes a bounded deque (maxlen=10), so history is
+        # already capped at the last 5 exchanges with O(1) eviction on append
+        # instead of a per-request slice copy.
+        limited_history = conversation_history
         
-        # Build messages
-        messages = [
-            {"role": "system", "content": self._get_system_prompt()}
-        ] + limited_history + [
-            {"role": "user", "content": message}
-        ]
+        # Build messages. The shared system message is always first and never
+        # modified so the cached prompt prefix stays valid; dynamic context
+        # (pre-fetched data, tool-forcing hints) rides in the user message.
+        if limited_history:
+            messages = [self._system_msg, *limited_history, {"role": "user", "content": message}]
+        else:
+            # First turn of a session: include the one-shot formatting example
+            messages = [self._system_msg, self._example_msg, {"role": "user", "content": message}]
         
         tool_calls_made = []
+        model = self._select_model(message, len(limited_history))
         
         try:
-            response = await self._process_with_tools(user_id, messages, tool_calls_made)
+            # Drain the token stream; callers that want incremental output
+            # use process_message_stream instead.
+            final = None
+            async for event in self._stream_with_tools(
+                user_id, messages, tool_calls_made, model, force_tools=force_tools
+            ):
+                if event["type"] == "final":
+                    final = event
             
             return {
-                "message": response,
+                "message": final["message"] if final else None,
                 "tool_calls_made": len(tool_calls_made),
-                "tools_used": [tc["name"] for tc in tool_calls_made]
+                "tools_used": [tc["name"] for tc in tool_calls_made],
+                "tool_results": final.get("tool_results", {}) if final else {}
             }
         
         except AuthenticationError as e:
-            error_msg = str(e)
-            error_code = e.status_code if hasattr(e, 'status_code') else 401
-            print(f"Error processing message: Error code: {error_code} - {error_msg}")
-            # Extract error details from response body if available
-            error_body = getattr(e, 'body', None)
-            if isinstance(error_body, dict) and 'error' in error_body:
-                print(f"Error details: {error_body.get('error', {})}")
+            error_code, error_msg = self._log_api_error(e, default_code=401)
             return {
                 "message": "I apologize, but there's an authentication issue with the API. Please check your API key configuration in the .env file.",
                 "error": error_msg,
@@ -513,13 +642,7 @@ Always strive to be helpful, accurate, and motivating. Your goal is to help stud
                 "tools_used": []
             }
         except APIError as e:
-            error_msg = str(e)
-            error_code = e.status_code if hasattr(e, 'status_code') else 'N/A'
-            print(f"Error processing message: Error code: {error_code} - {error_msg}")
-            # Extract error details from response body if available
-            error_body = getattr(e, 'body', None)
-            if isinstance(error_body, dict) and 'error' in error_body:
-                print(f"Error details: {error_body.get('error', {})}")
+            error_code, error_msg = self._log_api_error(e, default_code='N/A')
             return {
                 "message": f"I encountered an API error (code {error_code}). Please try again later.",
                 "error": error_msg,
@@ -529,7 +652,7 @@ Always strive to be helpful, accurate, and motivating. Your goal is to help stud
             }
         except OpenAIError as e:
             error_msg = str(e)
-            print(f"Error processing message: OpenAI Error - {error_msg}")
+            log.error("Error processing message: OpenAI Error - %s", error_msg)
             return {
                 "message": "I encountered an error with the AI service. Please try again.",
                 "error": error_msg,
@@ -538,7 +661,7 @@ Always strive to be helpful, accurate, and motivating. Your goal is to help stud
             }
         except Exception as e:
             error_msg = str(e)
-            print(f"Error processing message: {error_msg}")
+            log.exception("Error processing message: %s", error_msg)
             return {
                 "message": "I apologize, but I encountered an error. Let's try that again.",
                 "error": error_msg,
@@ -546,311 +669,599 @@ Always strive to be helpful, accurate, and motivating. Your goal is to help stud
                 "tools_used": []
             }
     
-    async def _process_with_tools(
+    def _log_api_error(self, e, default_code=None):
+        """Extract (status_code, message) from an API error and log it once.
+        
+        Uses EAFP attribute access rather than repeated hasattr/getattr probes
+        so the error path does minimal reflective work.
+        """
+        try:
+            error_code = e.status_code
+        except AttributeError:
+            error_code = default_code
+        error_msg = str(e)
+        log.error("Error processing message: Error code: %s - %s", error_code, error_msg)
+        try:
+            error_body = e.body
+        except AttributeError:
+            error_body = None
+        if isinstance(error_body, dict) and 'error' in error_body:
+            log.error("Error details: %s", error_body.get('error', {}))
+        return error_code, error_msg
+
+    async def process_message_stream(
+        self,
+        user_id: str,
+        message: str,
+        conversation_history: List[Dict[str, str]],
+        force_tools: bool = False
+    ):
+        """
+        Stream the assistant response incrementally.
+        
+        Yields {"type": "token", "content": str} for each content delta as it
+        arrives from the model, then a final {"type": "final", ...} event with
+        the same shape as process_message's return value. The final event is
+        authoritative: the safety validator may correct the streamed text.
+        """
+        limited_history = conversation_history
+        if limited_history:
+            messages = [self._system_msg, *limited_history, {"role": "user", "content": message}]
+        else:
+            messages = [self._system_msg, self._example_msg, {"role": "user", "content": message}]
+        
+        tool_calls_made = []
+        model = self._select_model(message, len(limited_history))
+        
+        try:
+            async for event in self._stream_with_tools(
+                user_id, messages, tool_calls_made, model, force_tools=force_tools
+            ):
+                if event["type"] == "final":
+                    yield {
+                        "type": "final",
+                        "message": event["message"],
+                        "tool_calls_made": len(tool_calls_made),
+                        "tools_used": [tc["name"] for tc in tool_calls_made],
+                        "tool_results": event.get("tool_results", {})
+                    }
+                else:
+                    yield event
+        except Exception as e:
+            error_msg = str(e)
+            log.exception("Error processing message stream: %s", error_msg)
+            yield {
+                "type": "final",
+                "message": "I apologize, but I encountered an error. Let's try that again.",
+                "error": error_msg,
+                "tool_calls_made": 0,
+                "tools_used": []
+            }
+    
+    async def _run_fastpath(
         self,
         user_id: str,
         messages: List[Dict],
-        tool_calls_made: List[Dict]
-    ) -> str:
-        """Process message using OpenAI with tool calling."""
-        print(f"\n{'='*60}")
-        print(f"🎯 Processing message for user_id: {user_id}")
-        print(f"{'='*60}\n")
+        tool_calls_made: List[Dict],
+        tool_results: Dict[str, Any],
+        force: bool = False
+    ) -> bool:
+        """
+        Execute a deterministic intent's tool set without an LLM round trip.
         
-        # Initial LLM call
-        # Debug: Check if we have tools available
-        print(f"🔧 Available tools: {len(self.tools)} tools")
-        print(f"📝 User message preview: {messages[-1].get('content', '')[:100]}...")
+        Returns True when a fastpath pattern matched (or the caller forced
+        the analysis set); the tool calls and their results are appended to
+        messages in standard tool-call wire format so the follow-up
+        completion (and the response validator) see them exactly as if the
+        model had requested them.
+        """
+        if force:
+            # Caller already classified the intent; skip the pattern match
+            tool_specs = _FASTPATH[0][1]
+        else:
+            content = messages[-1].get("content") or ""
+            for pattern, tool_specs in _FASTPATH:
+                if pattern.search(content):
+                    break
+            else:
+                return False
         
-        response = self.client.chat.completions.create(
-            model=self.model,
-            messages=messages,
-            tools=self.tools if self.tools else None,
-            tool_choice="auto",  # Let model decide when to use tools
-            temperature=0.7,  # Slightly higher for better tool usage decisions
-            max_tokens=500  # Increased to allow for tool calls
-        )
+        calls = [
+            (f"fastpath_{i}", name, {"user_id": user_id, **extra})
+            for i, (name, extra) in enumerate(tool_specs)
+        ]
+        log.debug("Fastpath matched; dispatching %d tools directly", len(calls))
+        
+        results = await asyncio.gather(*[
+            asyncio.to_thread(self._execute_tool, name, arguments)
+            for _, name, arguments in calls
+        ])
+        
+        messages.append({
+            "role": "assistant",
+            "content": None,
+            "tool_calls": [
+                {
+                    "id": call_id,
+                    "type": "function",
+                    "function": {"name": name, "arguments": json.dumps(arguments)}
+                }
+                for call_id, name, arguments in calls
+            ]
+        })
+        for (call_id, name, arguments), result in zip(calls, results):
+            tool_calls_made.append({
+                "name": name,
+                "arguments": arguments
+            })
+            tool_results[name] = result if isinstance(result, dict) else None
+            messages.append({
+                "role": "tool",
+                "tool_call_id": call_id,
+                "name": name,
+                "content": self._format_tool_result(name, result, call_id)
+            })
+        return True
+    
+    async def _stream_with_tools(
+        self,
+        user_id: str,
+        messages: List[Dict],
+        tool_calls_made: List[Dict],
+        model: str = None,
+        force_tools: bool = False
+    ):
+        """
+        Process message using OpenAI with tool calling, streaming tokens.
+        
+        Runs the completions with stream=True so the first token of the final
+        answer reaches the caller within one model step instead of after the
+        full completion. Yields {"type": "token", "content": str} for each
+        content delta, then {"type": "final", "message": str} with the
+        complete validated response. Tool-call turns yield no token events.
+        """
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug("Processing message for user_id: %s", user_id)
+            log.debug("Available tools: %d tools", len(self.tools))
+            log.debug("User message preview: %.100s...", messages[-1].get('content', ''))
         
         # Handle function calls iteratively
         max_iterations = 5  # Reduced to prevent long loops
         iterations = 0
         
-        finish_reason = response.choices[0].finish_reason
-        print(f"🤖 Initial LLM finish_reason: {finish_reason}")
-        
-        if finish_reason != "tool_calls":
-            print(f"⚠️  LLM did not request tool calls. Finish reason: {finish_reason}")
-            # If user is asking about data but no tools were called, log this
-            user_message = messages[-1].get('content', '').lower()
-            data_keywords = ['test', 'exam', 'score', 'result', 'performance', 'progress', 'analyze', 'how am i']
-            if any(keyword in user_message for keyword in data_keywords):
-                print(f"⚠️  WARNING: User asked about data but LLM didn't call tools!")
-                print(f"   User message contains: {[kw for kw in data_keywords if kw in user_message]}")
+        # Parsed tool results for this turn, keyed by tool name (last call
+        # wins). The validator reads these dicts directly - an O(1) lookup
+        # per tool of interest instead of any scan or JSON re-parse.
+        tool_results: Dict[str, Any] = {}
+
+        # Sampling knobs: tool-selection turns keep some temperature, but once
+        # real data is in context the final turn just restates it - decode cost
+        # scales with output tokens, and temperature 0 keeps the summarization
+        # deterministic (and completion-cacheable).
+        temperature = 0.7  # Slightly higher for better tool usage decisions
+        max_tokens = 500  # Increased to allow for tool calls
+
+        tool_choice = "auto"  # Let model decide when to use tools
+        if await self._run_fastpath(user_id, messages, tool_calls_made, tool_results, force=force_tools):
+            # Results are already in context; one non-tool completion suffices
+            tool_choice = "none"
+            temperature = 0.0
+            max_tokens = 300
         
-        while response.choices[0].finish_reason == "tool_calls" and iterations < max_iterations:
+        # Start with the full tools payload; tool rounds narrow it by phase
+        tools_payload = self.tools
+
+        while True:
+            request_key = self._completion_cache_key(
+                model or self.model, messages, tool_choice, tools_payload, temperature, max_tokens
+            )
+            cached = self._resp_cache.get(request_key)
+            if cached is not None and time.monotonic() - cached[0] < self._resp_cache_ttl:
+                # Replay a verbatim repeat of this request without the
+                # network round trip; the content arrives as one token event.
+                log.debug("Completion cache hit, replaying cached response")
+                _, content, tool_calls, finish_reason = cached
+                if content:
+                    yield {"type": "token", "content": content}
+            else:
+                stream = await self.client.chat.completions.create(
+                    model=model or self.model,
+                    messages=messages,
+                    tools=tools_payload if tools_payload else None,
+                    tool_choice=tool_choice,
+                    temperature=temperature,
+                    max_tokens=max_tokens,
+                    stream=True
+                )
+
+                # Accumulate content and tool-call deltas as they stream in
+                content_parts = []
+                tool_calls = []
+                finish_reason = None
+                usage = None
+                async for chunk in stream:
+                    # Usage (when the provider sends it) arrives on a trailing
+                    # chunk with no choices; grab it before the choices guard.
+                    chunk_usage = getattr(chunk, "usage", None)
+                    if chunk_usage is not None:
+                        usage = chunk_usage
+                    if not chunk.choices:
+                        continue
+                    choice = chunk.choices[0]
+                    if choice.finish_reason:
+                        finish_reason = choice.finish_reason
+                    delta = choice.delta
+                    if delta is None:
+                        continue
+                    if delta.tool_calls:
+                        for tc in delta.tool_calls:
+                            while len(tool_calls) <= tc.index:
+                                tool_calls.append({
+                                    "id": None,
+                                    "type": "function",
+                                    "function": {"name": "", "arguments": ""}
+                                })
+                            # Bind pydantic attributes to locals once per delta;
+                            # repeated descriptor dispatch adds up across a stream
+                            slot = tool_calls[tc.index]
+                            if tc.id:
+                                slot["id"] = tc.id
+                            fn = tc.function
+                            if fn:
+                                slot_fn = slot["function"]
+                                if fn.name:
+                                    slot_fn["name"] += fn.name
+                                if fn.arguments:
+                                    slot_fn["arguments"] += fn.arguments
+                    if delta.content:
+                        content_parts.append(delta.content)
+                        yield {"type": "token", "content": delta.content}
+
+                content = "".join(content_parts) if content_parts else None
+                if usage is not None and log.isEnabledFor(logging.DEBUG):
+                    # cached_tokens confirms the static system prompt + tools
+                    # prefix is getting server-side prompt-cache hits.
+                    details = getattr(usage, "prompt_tokens_details", None)
+                    log.debug(
+                        "Prompt tokens: %s (cached: %s)",
+                        getattr(usage, "prompt_tokens", None),
+                        getattr(details, "cached_tokens", None)
+                    )
+                if len(self._resp_cache) > 128:
+                    self._resp_cache.clear()
+                self._resp_cache[request_key] = (time.monotonic(), content, tool_calls, finish_reason)
+
+            log.debug("LLM finish_reason: %s", finish_reason)
+            
+            if finish_reason != "tool_calls" or not tool_calls:
+                if iterations == 0:
+                    log.debug("LLM did not request tool calls. Finish reason: %s", finish_reason)
+                    # If user is asking about data but no tools were called, log this
+                    if log.isEnabledFor(logging.DEBUG):
+                        hits = _DATA_RE.findall(messages[-1].get('content', ''))
+                        if hits:
+                            log.debug("User asked about data (%s) but LLM didn't call tools", hits)
+                break
+            
+            if iterations >= max_iterations:
+                log.warning("Reached max tool iterations (%d), stopping", max_iterations)
+                break
+            
             iterations += 1
-            tool_calls = response.choices[0].message.tool_calls
-            print(f"\n📞 LLM wants to call {len(tool_calls)} tool(s) (iteration {iterations})")
+            log.debug("LLM wants to call %d tool(s) (iteration %d)", len(tool_calls), iterations)
             
-            # Add assistant message with tool calls
+            # Add assistant message with tool calls. The delta accumulator
+            # above builds these dicts directly in OpenAI wire format, so no
+            # per-iteration re-serialization of SDK objects is needed here.
             messages.append({
                 "role": "assistant",
-                "content": response.choices[0].message.content,
-                "tool_calls": [
-                    {
-                        "id": tc.id,
-                        "type": "function",
-                        "function": {
-                            "name": tc.function.name,
-                            "arguments": tc.function.arguments
-                        }
-                    }
-                    for tc in tool_calls
-                ]
+                "content": content,
+                "tool_calls": tool_calls
             })
             
-            # Execute each tool call
+            # Parse arguments and normalize user_id for each tool call first,
+            # then execute them concurrently: the tools are independent
+            # I/O-bound lookups, so wall time becomes max(t_i) instead of
+            # sum(t_i) when the LLM requests several at once.
+            pending = []
             for tool_call in tool_calls:
-                function_name = tool_call.function.name
+                function_name = tool_call["function"]["name"]
                 try:
-                    arguments = json.loads(tool_call.function.arguments)
-                except json.JSONDecodeError:
+                    arguments = _loads(tool_call["function"]["arguments"])
+                except _JSONDecodeError:
                     arguments = {}
-                
-                print(f"  📋 Tool: {function_name}, Args from LLM: {arguments}")
-                
+
+                log.debug("Tool: %s, Args from LLM: %s", function_name, arguments)
+
                 # Add user_id to arguments if not present
                 function_params = self._get_function_params(function_name)
                 if "user_id" in function_params:
                     if "user_id" not in arguments:
-                        print(f"  ➕ Injecting user_id: {user_id}")
                         arguments["user_id"] = user_id
-                    else:
-                        llm_user_id = arguments.get("user_id")
-                        if llm_user_id != user_id:
-                            print(f"  ⚠️  WARNING: LLM provided wrong user_id '{llm_user_id}', correcting to '{user_id}'")
-                            arguments["user_id"] = user_id
-                        else:
-                            print(f"  ✅ user_id already correct in args: {user_id}")
-                else:
-                    print(f"  ℹ️  user_id not needed for this function")
-                
-                # Execute the function
-                result = self._execute_tool(function_name, arguments)
-                
+                    elif arguments.get("user_id") != user_id:
+                        log.warning("LLM provided wrong user_id '%s', correcting to '%s'", arguments.get("user_id"), user_id)
+                        arguments["user_id"] = user_id
+
+                pending.append((tool_call, function_name, arguments))
+
+            # Execute in parallel; tools are sync so run them in threads.
+            # _execute_tool catches its own exceptions and returns error dicts.
+            results = await asyncio.gather(*[
+                asyncio.to_thread(self._execute_tool, function_name, arguments)
+                for _, function_name, arguments in pending
+            ])
+
+            # Append the resulting tool messages in the original order
+            for (tool_call, function_name, arguments), result in zip(pending, results):
                 # Track tool call
                 tool_calls_made.append({
                     "name": function_name,
                     "arguments": arguments
                 })
-                
+                tool_results[function_name] = result if isinstance(result, dict) else None
+
                 # Format result for LLM - make it more readable and clear
                 if isinstance(result, dict):
                     # Check if there's an error
                     if result.get("error"):
-                        content = json.dumps(result, indent=2)
-                        print(f"  ⚠️  Tool returned error: {result.get('error')}")
+                        content_str = _dumps(result)
+                        log.debug("Tool returned error: %s", result.get('error'))
                     else:
-                        # Success - format clearly so LLM understands the data
-                        content = json.dumps(result, indent=2)
-                        print(f"  ✅ Tool returned SUCCESS - data available: {list(result.keys())}")
-                        if "total_score" in result:
-                            print(f"     Total score: {result.get('total_score')}, Sections: {len(result.get('sections', {}))}")
+                        # Success - format clearly so LLM understands the data,
+                        # compacting oversized payloads before they re-enter
+                        # the context window
+                        content_str = self._format_tool_result(function_name, result, tool_call["id"])
+                        if log.isEnabledFor(logging.DEBUG):
+                            log.debug("Tool returned SUCCESS - data available: %s", list(result.keys()))
                 else:
-                    content = json.dumps(result, indent=2)
+                    content_str = _dumps(result)
                 
                 # Add function result to messages
                 messages.append({
                     "role": "tool",
-                    "tool_call_id": tool_call.id,
+                    "tool_call_id": tool_call["id"],
                     "name": function_name,
-                    "content": content
+                    "content": content_str
                 })
-            
-            # Get next response from LLM
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=messages,
-                tools=self.tools,
-                tool_choice="auto",
-                temperature=0.7,  # Slightly higher for better tool usage decisions
-                max_tokens=500  # Increased to allow for tool calls
-            )
-            finish_reason = response.choices[0].finish_reason
-            print(f"🤖 Next LLM finish_reason: {finish_reason}")
-            if finish_reason != "tool_calls":
-                print(f"⚠️  LLM stopped calling tools. Finish reason: {finish_reason}")
-        
-        final_response = response.choices[0].message.content
+
+            # A successful quiz creation is fully determined by the tool
+            # output - the canned confirmation says everything the model
+            # would, so skip the follow-up completion round trip entirely.
+            # Open-ended results (test analysis etc.) still go to the model.
+            if (
+                len(pending) == 1
+                and pending[0][1] == "generate_adaptive_quiz"
+                and isinstance(results[0], dict)
+                and results[0].get("success")
+                and results[0].get("quiz_id")
+            ):
+                direct = self._quiz_confirmation(results[0])
+                log.debug("Quiz created; rendering confirmation without a follow-up completion")
+                yield {"type": "token", "content": direct}
+                yield {"type": "final", "message": direct, "tool_results": tool_results}
+                return
+
+            # Narrow the tools payload to the phase the last tool implies
+            if pending:
+                phase = _PHASE_BY_TOOL.get(pending[-1][1])
+                if phase:
+                    tools_payload = _PHASE_TOOLS[phase]
+
+            # Once a tool round has produced real data, the next turn mostly
+            # restates it: decode deterministically and cap the output length
+            if any(isinstance(r, dict) and not r.get("error") for r in results):
+                temperature = 0.0
+                max_tokens = 300
+
+        final_response = content
         
         # Safety check: If tools returned data but LLM says it couldn't find data, correct this
-        final_response = self._validate_response_against_tools(final_response, tool_calls_made, messages)
+        final_response = self._validate_response_against_tools(final_response, tool_calls_made, tool_results)
         
         # NOTE: Markdown formatting is now PRESERVED and sent to frontend for rendering
         # The _clean_markdown function is no longer called - we want to keep the markdown!
         
-        print(f"\n✨ Final response (with markdown): {final_response[:200]}...\n")
-        return final_response
+        log.debug("Final response (with markdown): %.200s...", final_response or "")
+        yield {"type": "final", "message": final_response, "tool_results": tool_results}
     
-    def _validate_response_against_tools(self, response: str, tool_calls_made: List[Dict], messages: List[Dict]) -> str:
+    @staticmethod
+    def _quiz_confirmation(quiz_data: Dict[str, Any]) -> str:
+        """Render the canned confirmation for a successfully created quiz.
+
+        Joins the optional sentences once - no repeated str += reallocation.
+        """
+        total_questions = quiz_data.get("total_questions")
+        focus_areas = quiz_data.get("focus_areas", ["general"])
+        section = quiz_data.get("section", "mixed")
+
+        parts = [f"I've created a personalized quiz for you with {total_questions} questions!"]
+        if section != "mixed":
+            parts.append(f"It focuses on {section}.")
+        if focus_areas and focus_areas != ["general"]:
+            parts.append(f"The quiz covers: {', '.join(focus_areas)}.")
+        parts.append("Ready to start when you are!")
+        return " ".join(parts)
+
+    def _completion_cache_key(self, model: str, messages: List[Dict], tool_choice: str,
+                              tools_payload: List[Dict], temperature: float, max_tokens: int) -> str:
+        """Hash the full request payload for the exact-match completion cache.
+
+        Tool schemas are represented by their names - the schema bodies are
+        import-time constants, so hashing them again would be wasted work.
+        """
+        payload = json.dumps(
+            {
+                "model": model,
+                "messages": messages,
+                "tools": [t["function"]["name"] for t in tools_payload],
+                "tool_choice": tool_choice,
+                "temperature": temperature,
+                "max_tokens": max_tokens,
+            },
+            sort_keys=True,
+            default=str
+        )
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def _validate_response_against_tools(self, response: str, tool_calls_made: List[Dict], tool_results: Dict[str, Any]) -> str:
         """
         Validate that the LLM response correctly interprets tool results.
         If tools returned data but LLM claims no data found, FIX the response.
+
+        tool_results carries the original result dicts from this turn keyed
+        by tool name, so each tool of interest is a single dict lookup.
         """
-        import json
-        
         # Check if LLM claimed no data/error but tools returned success
-        response_lower = response.lower()
-        no_data_keywords = ["haven't taken", "no test", "no results", "couldn't find", "could not find", "didn't find", "unable to find", "issue finding", "don't have any results", "hiccup", "issue with", "not being recognized", "verify your user"]
-        claimed_error = any(keyword in response_lower for keyword in no_data_keywords)
-        
+        claimed_error = bool(_NO_DATA_RE.search(response))
+
         if claimed_error:
-            # Check what tools were called and what they returned
+            # Check what the tools of interest returned
             test_data = None
             quiz_data = None
-            
-            for message in messages:
-                # Check test results
-                if message.get("role") == "tool" and message.get("name") == "get_latest_test_results":
-                    tool_result = message.get("content", "")
-                    try:
-                        result_data = json.loads(tool_result)
-                        # If tool returned success (has total_score, no error), data EXISTS
-                        if result_data.get("success") and result_data.get("total_score"):
-                            test_data = result_data
-                            print(f"\n🚨 CRITICAL ERROR DETECTED:")
-                            print(f"   LLM claimed no data but get_latest_test_results returned:")
-                            print(f"   - total_score: {result_data.get('total_score')}")
-                            print(f"   - sections: {len(result_data.get('sections', {}))}")
-                            print(f"   - success: {result_data.get('success')}")
-                            print(f"   OVERRIDING LLM response with correct information!\n")
-                    except Exception as e:
-                        print(f"   Error parsing test result: {e}")
-                
-                # Check quiz generation
-                if message.get("role") == "tool" and message.get("name") == "generate_adaptive_quiz":
-                    tool_result = message.get("content", "")
-                    try:
-                        result_data = json.loads(tool_result)
-                        # If tool returned success, quiz WAS created
-                        if result_data.get("success") and result_data.get("quiz_id"):
-                            quiz_data = result_data
-                            print(f"\n🚨 CRITICAL ERROR DETECTED:")
-                            print(f"   LLM claimed issue/error but generate_adaptive_quiz returned:")
-                            print(f"   - success: {result_data.get('success')}")
-                            print(f"   - quiz_id: {result_data.get('quiz_id')}")
-                            print(f"   - total_questions: {result_data.get('total_questions')}")
-                            print(f"   - message: {result_data.get('message')}")
-                            print(f"   OVERRIDING LLM response with correct information!\n")
-                    except Exception as e:
-                        print(f"   Error parsing quiz result: {e}")
+
+            # Test results: success with total_score means data EXISTS
+            result_data = tool_results.get("get_latest_test_results")
+            if isinstance(result_data, dict) and result_data.get("success") and result_data.get("total_score"):
+                test_data = result_data
+                log.warning(
+                    "LLM claimed no data but get_latest_test_results returned total_score=%s, %d sections; overriding response",
+                    result_data.get('total_score'), len(result_data.get('sections', {}))
+                )
+
+            # Quiz generation: success means the quiz WAS created
+            result_data = tool_results.get("generate_adaptive_quiz")
+            if isinstance(result_data, dict) and result_data.get("success") and result_data.get("quiz_id"):
+                quiz_data = result_data
+                log.warning(
+                    "LLM claimed issue/error but generate_adaptive_quiz returned quiz_id=%s with %s questions; overriding response",
+                    result_data.get('quiz_id'), result_data.get('total_questions')
+                )
             
             # Override response if we found successful quiz generation
             if quiz_data:
-                total_questions = quiz_data.get("total_questions")
-                focus_areas = quiz_data.get("focus_areas", ["general"])
-                section = quiz_data.get("section", "mixed")
-                
-                corrected_response = f"I've created a personalized quiz for you with {total_questions} questions! "
-                if section != "mixed":
-                    corrected_response += f"It focuses on {section}. "
-                if focus_areas and focus_areas != ["general"]:
-                    corrected_response += f"The quiz covers: {', '.join(focus_areas)}. "
-                corrected_response += "Ready to start when you are!"
-                
-                print(f"✅ Replaced incorrect LLM response with correct quiz confirmation")
-                return corrected_response
-            
+                log.info("Replaced incorrect LLM response with correct quiz confirmation")
+                return self._quiz_confirmation(quiz_data)
+
             # If we found test data but LLM said no data, override the response
             if test_data:
                 total_score = test_data.get("total_score")
                 sections = test_data.get("sections", {})
-                
+
                 # Create a corrected response
                 corrected_response = f"I found your latest test results! You scored {total_score} total. "
-                
+
                 # Add section breakdown
                 if sections:
-                    corrected_response += "Here's your breakdown:\n\n"
-                    for section_name, section_data in sections.items():
-                        score = section_data.get("score")
-                        percentile = section_data.get("percentile")
-                        corrected_response += f"{section_name.title()}: {score} points ({percentile}th percentile)\n"
-                    
-                    # Add analysis
-                    corrected_response += "\nYour strongest areas are Reading and Writing. Let's focus on improving your Math sections (Algebra and Geometry) to boost your overall score!"
-                
-                print(f"✅ Replaced incorrect LLM response with correct data-based response")
+                    breakdown = "\n".join(
+                        f"{section_name.title()}: {section_data.get('score')} points ({section_data.get('percentile')}th percentile)"
+                        for section_name, section_data in sections.items()
+                    )
+                    corrected_response += (
+                        "Here's your breakdown:\n\n" + breakdown +
+                        "\n\nYour strongest areas are Reading and Writing. Let's focus on improving your Math sections (Algebra and Geometry) to boost your overall score!"
+                    )
+
+                log.info("Replaced incorrect LLM response with correct data-based response")
                 return corrected_response
         
         return response
     
     def _clean_markdown(self, text: str) -> str:
         """Remove markdown formatting from text to ensure clean display in frontend."""
-        import re
-        
         if not text:
             return text
-        
-        # Remove bold (**text** or __text__)
-        text = re.sub(r'\*\*([^*]+)\*\*', r'\1', text)
-        text = re.sub(r'__([^_]+)__', r'\1', text)
-        
-        # Remove italic (*text* or _text_)
-        text = re.sub(r'\*([^*]+)\*', r'\1', text)
-        text = re.sub(r'_([^_]+)_', r'\1', text)
-        
-        # Remove strikethrough (~~text~~)
-        text = re.sub(r'~~([^~]+)~~', r'\1', text)
-        
-        # Remove headers (# Header, ## Header, etc.)
-        text = re.sub(r'^#{1,6}\s+', '', text, flags=re.MULTILINE)
-        
-        # Remove markdown links [text](url) -> text
-        text = re.sub(r'\[([^\]]+)\]\([^\)]+\)', r'\1', text)
-        
-        # Remove markdown code blocks ```code``` -> code
-        text = re.sub(r'```[\w]*\n?([^`]+)```', r'\1', text, flags=re.DOTALL)
-        
-        # Remove inline code `code` -> code
-        text = re.sub(r'`([^`]+)`', r'\1', text)
-        
-        # Remove markdown list markers at start of lines (-, *, +)
-        text = re.sub(r'^[\s]*[-*+]\s+', '', text, flags=re.MULTILINE)
-        
-        # Remove numbered list markers (1., 2., etc.) at start of lines
-        text = re.sub(r'^\s*\d+\.\s+', '', text, flags=re.MULTILINE)
-        
-        # Clean up multiple consecutive newlines (max 2)
-        text = re.sub(r'\n{3,}', '\n\n', text)
-        
-        # Strip leading/trailing whitespace
-        text = text.strip()
-        
-        return text
+
+        # Most short replies contain no markdown at all; one linear scan for
+        # the sentinel characters is far cheaper than twelve regex passes.
+        if not any(ch in text for ch in _MD_SENTINELS):
+            return text.strip()
+
+        for pattern, repl in _MD_PATTERNS:
+            text = pattern.sub(repl, text)
+
+        return text.strip()
     
-    def _get_function_params(self, function_name: str) -> List[str]:
+    def _format_tool_result(self, function_name: str, result: Any, call_id: str) -> str:
+        """
+        Serialize a tool result for the model, pruning it to what the model
+        actually needs.
+
+        Results from tools with a _TOOL_SUMMARY_KEYS whitelist are always
+        projected onto those keys before serialization; whenever that drops
+        data, the complete result is parked in _raw_results under the
+        tool_call id in case it needs to be expanded later.
+        """
+        summary_keys = _TOOL_SUMMARY_KEYS.get(function_name)
+        if summary_keys is None or not isinstance(result, dict):
+            return _dumps(result)
+
+        summary = {key: result[key] for key in summary_keys if key in result}
+        if len(summary) < len(result):
+            if len(self._raw_results) > 256:
+                self._raw_results.clear()
+            self._raw_results[call_id] = result
+            summary["truncated"] = True
+        return _dumps(summary)
+
+    def _get_function_params(self, function_name: str) -> frozenset:
         """Get parameter names for a function."""
-        tool = next((t for t in self.tools if t["function"]["name"] == function_name), None)
-        if tool and "parameters" in tool["function"]:
-            return list(tool["function"]["parameters"].get("properties", {}).keys())
-        return []
+        return _TOOL_PARAMS.get(function_name, frozenset())
+    
+    def _invalidate_tool_cache(self, user_id: Any) -> None:
+        """Drop a user's cached tool results and prune expired entries.
+        
+        Called after a write tool runs so the next read-only call sees
+        the write instead of a pre-write result; expired keys are swept
+        in the same pass since nothing else evicts them.
+        """
+        now = time.monotonic()
+        user_key = str(user_id) if user_id is not None else None
+        stale = [
+            key for key, (cached_at, _) in self._tool_cache.items()
+            if now - cached_at >= self._tool_cache_ttl
+            or (user_key is not None and user_key in key[1])
+        ]
+        for key in stale:
+            del self._tool_cache[key]
     
     def _execute_tool(self, function_name: str, arguments: Dict[str, Any]) -> Any:
         """Execute the appropriate tool function."""
         func = self.tool_map.get(function_name)
         if not func:
-            print(f"❌ Unknown function: {function_name}")
+            log.error("Unknown function: %s", function_name)
             return {"error": f"Unknown function: {function_name}"}
-        
+
+        # Serve repeat read-only calls from the short-TTL cache
+        cache_key = None
+        if function_name in _CACHEABLE_TOOLS:
+            try:
+                cache_key = (function_name, json.dumps(arguments, sort_keys=True))
+            except TypeError:
+                cache_key = None
+            if cache_key is not None:
+                cached = self._tool_cache.get(cache_key)
+                if cached and time.monotonic() - cached[0] < self._tool_cache_ttl:
+                    log.debug("Cache hit for %s, skipping re-execution", function_name)
+                    return cached[1]
+
         try:
-            print(f"🔧 Calling {function_name} with args: {arguments}")
+            log.debug("Calling %s with args: %s", function_name, arguments)
             result = func(**arguments)
-            print(f"✅ Result from {function_name}: {json.dumps(result, indent=2)[:200]}...")
+            if log.isEnabledFor(logging.DEBUG):
+                log.debug("Result from %s: %.200s...", function_name, _dumps(result))
+            if cache_key is not None and not (isinstance(result, dict) and result.get("error")):
+                self._tool_cache[cache_key] = (time.monotonic(), result)
+            elif function_name not in _CACHEABLE_TOOLS:
+                # Write tools (quiz submission, profile updates) change what
+                # the read-only tools would return for this user, both here
+                # and in the shared cache behind the orchestrator's
+                # prefetches and UI builders
+                user_id = arguments.get("user_id")
+                self._invalidate_tool_cache(user_id)
+                if user_id:
+                    shared_tool_cache.invalidate(str(user_id))
             return result
         except Exception as e:
-            print(f"❌ Error in {function_name}: {str(e)}")
-            import traceback
-            traceback.print_exc()
+            log.exception("Error in %s: %s", function_name, e)
             return {"error": str(e)}
 
@@ -1,11 +1,339 @@
 """Conversation orchestrator for managing multi-turn interactions."""
 
 from typing import Dict, Any, List, Optional
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import logging
+import re
+import time
 import uuid
+from collections import deque
 from datetime import datetime
+from functools import lru_cache
+from operator import itemgetter
 
+from agents import _tool_cache
 from agents.llm_client import TestPrepAgent
+from agents.scenarios import ConversationScenarios
 from storage.memory_store import store
+from tools.performance_analysis import (
+    analyze_performance_by_topic,
+    compare_progress,
+    generate_bar_chart_data,
+    get_latest_test_results,
+)
+from tools.progress_tracking import get_progress_summary
+from tools.user_profile import get_user_dashboard_bundle, get_user_profile
+
+log = logging.getLogger("orchestrator")
+
+# Shared worker pool for fanning blocking tool calls out of sync helpers
+_PREFETCH_POOL = ThreadPoolExecutor(max_workers=8, thread_name_prefix="prefetch")
+
+# Keyword tables scanned on every message, kept at module scope as the
+# single source of truth (and so nothing is rebuilt per call).
+_ANALYSIS_KEYWORDS = (
+    'analyze', 'analysis', 'chart', 'visual', 'graph', 'breakdown',
+    'detailed analysis', 'show me'
+)
+# Compiled once: one C-level scan of the message instead of one substring
+# pass per keyword.
+_ANALYSIS_RE = re.compile("|".join(re.escape(kw) for kw in _ANALYSIS_KEYWORDS), re.IGNORECASE)
+
+# Only a direct "analyze my test/exam" ask may force the agent's analysis
+# fastpath. The broader _ANALYSIS_RE wording ("show me", "breakdown", ...)
+# still classifies a message as analysis for enrichment, but forcing on it
+# would hard-lock quiz and explanation requests out of their tools, so the
+# force gate mirrors the fastpath pattern in llm_client.
+_FORCE_ANALYSIS_RE = re.compile(r"analyz\w*\b.*\b(test|exam)", re.IGNORECASE)
+
+# Matches "85%" or "17/20" style accuracy mentions in quiz wrap-ups
+_ACCURACY_RE = re.compile(r'(\d+)%|(\d+)/(\d+)')
+
+# Keywords that indicate the user wants their stored data (scores, progress)
+_DATA_REQUEST_KEYWORDS = (
+    'score', 'result', 'performance', 'test', 'exam',
+    'progress', 'improvement', 'better', 'worse', 'how am i doing'
+)
+_DATA_REQUEST_RE = re.compile("|".join(re.escape(kw) for kw in _DATA_REQUEST_KEYWORDS), re.IGNORECASE)
+
+
+def _classify_intent(message: str) -> Optional[str]:
+    """Classify a message once for everyone downstream.
+
+    Returns "analysis" for explicit analysis requests, "data" for messages
+    asking about stored scores/progress, or None. Single source of truth so
+    entry points and enrichment never disagree on what counts as analysis.
+    """
+    if _ANALYSIS_RE.search(message):
+        return "analysis"
+    if _DATA_REQUEST_RE.search(message):
+        return "data"
+    return None
+
+# Phrase buckets for contextual quick-reply selection
+_QUIZ_CONTEXT_WORDS = ('quiz', 'practice', 'question')
+_QUIZ_DONE_WORDS = ('complete', 'finished', 'done', 'result', 'score', 'correct')
+_IMPROVEMENT_WORDS = ('improve', 'better', 'weak', 'struggl', 'help')
+_DATA_ISSUE_PHRASES = (
+    'issue retrieving', 'error', 'could not', 'unable to',
+    'no recent test results', 'no test results', 'haven\'t taken'
+)
+_CONFIRMATION_PHRASES = (
+    'would you like', 'do you want', 'shall we', 'ready to',
+    'can you confirm', 'please confirm', 'let me know'
+)
+_ANALYSIS_RESPONSE_PHRASES = (
+    'based on', 'you scored', 'your performance', 'recommend', 'suggest',
+    'weak areas', 'strengths', 'improve', 'focus on', 'analysis', 'breakdown'
+)
+_PROGRESS_WORDS = ('streak', 'progress', 'improvement', 'better', 'days', 'practice')
+_TOPIC_KEYWORDS = ('algebra', 'geometry', 'reading', 'writing', 'math', 'verbal', 'quantitative')
+
+# Pie-chart render tables; frozen at module scope so the response path
+# doesn't rebuild them per call.
+_SECTION_COLORS = {
+    "reading": "#1C1C1E",      # Darkest gray
+    "writing": "#3A3A3C",      # Medium-dark gray
+    "math": "#6D6D70",         # Medium gray
+    "verbal": "#8E8E93",       # Light gray
+    "quantitative": "#AEAEB2",  # Lightest gray
+    "reasoning": "#5A5A5D",    # Medium-light gray
+    "algebra": "#AEAEB2",       # Lightest gray
+    "geometry": "#C7C7CC"       # Very light gray
+}
+
+_SECTION_DISPLAY_NAMES = {
+    "reading": "Reading",
+    "writing": "Writing",
+    "math": "Math",
+    "verbal": "Verbal",
+    "quantitative": "Quantitative",
+    "reasoning": "Reasoning",
+    "algebra": "Algebra",
+    "geometry": "Geometry"
+}
+
+
+@lru_cache(maxsize=1024)
+def _pie_chart_for(test_id: Optional[str], sections_key: tuple) -> Dict[str, Any]:
+    """Build pie-chart data for a (test, section-scores) pair.
+
+    Deterministic in its arguments, so repeated renders of the same test
+    (progress view, comparison view) become a cache lookup - including
+    the md5-derived test number.
+    """
+    total_score = sum(score for _, score in sections_key)
+
+    segments = [
+        {
+            "name": _SECTION_DISPLAY_NAMES.get(section_key, section_key.title()),
+            "score": score,
+            "percentage": (score * 100) // total_score if total_score > 0 else 0,
+            "color": _SECTION_COLORS.get(section_key, "#8E8E93"),
+            "section_key": section_key
+        }
+        for section_key, score in sections_key
+    ]
+
+    # Sort by score (largest first); itemgetter is C-implemented
+    segments.sort(key=itemgetter("score"), reverse=True)
+
+    # Extract test number from test_id if available
+    test_number = None
+    if test_id:
+        try:
+            # Try to extract a number from test_id, or use a hash
+            hash_int = int(hashlib.md5(test_id.encode()).hexdigest()[:8], 16)
+            test_number = str((hash_int % 99) + 1)  # Number between 1-99
+        except (AttributeError, ValueError):
+            test_number = "#"
+
+    return {
+        "type": "pie_chart",
+        "title": "Performance Breakdown",
+        "data": {
+            "segments": segments,
+            "test_number": test_number or "#",
+            "total_score": total_score
+        }
+    }
+
+
+# isoformat() timestamps only carry second precision here, so the string
+# is rendered at most once per second instead of once per call site.
+_TS_CACHE = [0, ""]
+
+
+def _now_iso() -> str:
+    """Current time as an ISO-8601 string, cached for the current second."""
+    now = int(time.time())
+    if now != _TS_CACHE[0]:
+        _TS_CACHE[0] = now
+        _TS_CACHE[1] = datetime.now().isoformat(timespec="seconds")
+    return _TS_CACHE[1]
+
+
+def _phrase_re(phrases: tuple) -> "re.Pattern":
+    """Compile a phrase bucket into one alternation.
+
+    Each bucket check becomes a single C-level scan of the (already
+    lowercased) text instead of one Python substring pass per phrase -
+    the multi-pattern equivalent of an automaton scan at these sizes.
+    """
+    return re.compile("|".join(re.escape(p) for p in phrases))
+
+
+_QUIZ_CONTEXT_RE = _phrase_re(_QUIZ_CONTEXT_WORDS)
+_QUIZ_DONE_RE = _phrase_re(_QUIZ_DONE_WORDS)
+_IMPROVEMENT_RE = _phrase_re(_IMPROVEMENT_WORDS)
+_DATA_ISSUE_RE = _phrase_re(_DATA_ISSUE_PHRASES)
+_CONFIRMATION_RE = _phrase_re(_CONFIRMATION_PHRASES)
+_ANALYSIS_RESPONSE_RE = _phrase_re(_ANALYSIS_RESPONSE_PHRASES)
+_PROGRESS_RE = _phrase_re(_PROGRESS_WORDS)
+
+# Quick replies keyed by the tool that shaped the response, checked in
+# priority order. One set() conversion plus dict lookups replaces the old
+# seven-branch cascade of O(len) list membership scans.
+# Follow-up suggestions keyed by tool, checked in order; at most two are
+# returned per turn.
+_FOLLOWUPS = (
+    ("analyze_performance_by_topic", "Would you like me to create a practice quiz focused on your weak areas?"),
+    ("generate_adaptive_quiz", "Ready to start the quiz whenever you are!"),
+    ("get_latest_test_results", "Want to see how this compares to your previous attempts?"),
+    ("get_progress_summary", "Would you like specific recommendations to improve further?"),
+)
+
+_TOOL_REPLY_PRIORITY = (
+    "get_latest_test_results",
+    "analyze_performance_by_topic",
+    "generate_adaptive_quiz",
+    "generate_bar_chart_data",
+    "generate_study_recommendations",
+    "get_progress_summary",
+    "identify_error_patterns",
+    "get_question_explanation",
+)
+
+# Reply sets are interned as tuples and shared by reference: every
+# assignment below would otherwise allocate four dicts plus a list per
+# request for content that never changes. JSON serialization treats a
+# tuple as an array, so nothing downstream notices.
+_CHART_OR_RECS_REPLIES = (
+    {"text": "🎯 Create practice quiz", "action": "create_quiz"},
+    {"text": "📊 Analyze more details", "action": "analyze_exam"},
+    {"text": "💡 Show study plan", "action": "get_recommendations"},
+    {"text": "📈 Track my progress", "action": "check_progress"}
+)
+
+_QR_DEFAULT = (
+    {"text": "📊 Analyze my last exam", "action": "analyze_exam"},
+    {"text": "💰 How can I improve my scores?", "action": "improve_scores"},
+    {"text": "🤔 How am I doing now?", "action": "check_progress"},
+    {"text": "📝 Come up with similar questions", "action": "create_quiz"}
+)
+
+_QR_POST_QUIZ = (
+    {"text": "📊 Review my results", "action": "analyze_exam"},
+    {"text": "🎯 Try another quiz", "action": "create_quiz"},
+    {"text": "💡 Get study tips", "action": "get_recommendations"},
+    {"text": "📈 Check overall progress", "action": "check_progress"}
+)
+
+_QR_IMPROVEMENT = (
+    {"text": "🎯 Create practice on weak areas", "action": "create_quiz"},
+    {"text": "📊 Show detailed breakdown", "action": "analyze_exam"},
+    {"text": "💡 Get personalized recommendations", "action": "get_recommendations"},
+    {"text": "📚 Review explanations", "action": "review_concepts"}
+)
+
+_QR_DATA_ISSUE = (
+    {"text": "✅ I did take a test!", "action": "confirm_test_taken"},
+    {"text": "🎯 Let's do a practice quiz", "action": "create_quiz"},
+    {"text": "📊 Check my profile", "action": "check_profile"},
+    {"text": "💬 I need help", "action": "support"}
+)
+
+_QR_CONFIRM_QUIZ = (
+    {"text": "✅ Yes! Let's do it", "action": "start_quiz"},
+    {"text": "⚙️ Let me customize it", "action": "customize_quiz"},
+    {"text": "📚 Review first", "action": "review_concepts"},
+    {"text": "❌ Maybe later", "action": "cancel"}
+)
+
+_QR_CONFIRM_TEST = (
+    {"text": "✅ Yep, I took one!", "action": "confirm_test_taken"},
+    {"text": "❌ Not yet", "action": "no_test_yet"},
+    {"text": "🎯 Let's practice", "action": "create_quiz"}
+)
+
+_QR_CONFIRM_SCHEDULE = (
+    {"text": "📅 Set a new date", "action": "schedule_test"},
+    {"text": "📊 Just study for now", "action": "focus_study"},
+    {"text": "💬 Tell me more", "action": "more_info"}
+)
+
+_QR_CONFIRM_GENERIC = (
+    {"text": "✅ Yes, sounds good!", "action": "confirm_yes"},
+    {"text": "❌ Nope, I'm good", "action": "confirm_no"},
+    {"text": "💬 Tell me more", "action": "more_info"}
+)
+
+_QR_ANALYSIS_GENERIC = (
+    {"text": "🎯 Help me practice", "action": "create_quiz"},
+    {"text": "📊 Show me more details", "action": "analyze_exam"},
+    {"text": "💡 What should I study?", "action": "get_recommendations"},
+    {"text": "📈 How am I doing now?", "action": "check_progress"}
+)
+
+_QR_PROGRESS = (
+    {"text": "📈 Overall progress", "action": "check_progress"},
+    {"text": "🎯 Create practice quiz", "action": "create_quiz"},
+    {"text": "📊 Analyze my test", "action": "analyze_exam"},
+    {"text": "💡 Get recommendations", "action": "get_recommendations"}
+)
+
+_TOOL_QUICK_REPLIES = {
+    "get_latest_test_results": (
+        {"text": "📊 Analyze my last exam", "action": "analyze_exam"},
+        {"text": "💰 How can I improve my scores?", "action": "improve_scores"},
+        {"text": "📈 Compare with my target", "action": "compare_progress"},
+        {"text": "🎯 Generate practice questions", "action": "create_quiz"}
+    ),
+    "analyze_performance_by_topic": (
+        {"text": "🎯 Create practice on weak areas", "action": "create_quiz"},
+        {"text": "📊 Show detailed breakdown", "action": "detailed_analysis"},
+        {"text": "💡 What should I study next?", "action": "get_recommendations"},
+        {"text": "📈 How am I doing overall?", "action": "check_progress"}
+    ),
+    "generate_adaptive_quiz": (
+        {"text": "▶️ Start this quiz", "action": "start_quiz"},
+        {"text": "⚙️ Customize quiz settings", "action": "customize_quiz"},
+        {"text": "📚 Review concepts first", "action": "review_concepts"},
+        {"text": "❌ Skip for now", "action": "cancel"}
+    ),
+    "generate_bar_chart_data": _CHART_OR_RECS_REPLIES,
+    "generate_study_recommendations": _CHART_OR_RECS_REPLIES,
+    "get_progress_summary": (
+        {"text": "🎯 Create practice questions", "action": "create_quiz"},
+        {"text": "📊 Analyze my last test", "action": "analyze_exam"},
+        {"text": "💡 Get recommendations", "action": "get_recommendations"},
+        {"text": "🔥 Check my streak", "action": "check_progress"}
+    ),
+    "identify_error_patterns": (
+        {"text": "🎯 Practice my weak topics", "action": "create_quiz"},
+        {"text": "📊 Show detailed analysis", "action": "detailed_analysis"},
+        {"text": "💡 How to fix these mistakes?", "action": "get_recommendations"},
+        {"text": "📚 Review explanations", "action": "review_concepts"}
+    ),
+    "get_question_explanation": (
+        {"text": "🎯 Try similar questions", "action": "create_quiz"},
+        {"text": "📊 Analyze my test", "action": "analyze_exam"},
+        {"text": "💡 Explain another topic", "action": "explain_concepts"},
+        {"text": "📈 Check my progress", "action": "check_progress"}
+    ),
+}
 
 
 class ConversationOrchestrator:
@@ -14,6 +342,54 @@ class ConversationOrchestrator:
     def __init__(self):
         self.llm_agent = TestPrepAgent()
         self.max_context_turns = 10
+        # Formatted-history cache: session_id -> bounded deque, kept in sync
+        # by _save_message so steady-state turns skip re-reading and
+        # re-formatting the transcript from the store. Oldest session is
+        # evicted once the cache holds _history_cache_max sessions.
+        self._history_cache: Dict[str, deque] = {}
+        self._history_cache_max = 512
+        # Conversation writes go through a background writer task so the
+        # request path never waits on storage. Bounded so a stalled writer
+        # surfaces as inline writes rather than unbounded memory growth.
+        self._write_queue: asyncio.Queue = asyncio.Queue(maxsize=10000)
+        self._writer_task: Optional[asyncio.Task] = None
+        # UI builders keyed by the tool whose call justifies the element,
+        # in render order; _create_structured_response walks this table.
+        self._ui_builders = (
+            ("get_progress_summary", self._ui_progress),
+            ("generate_adaptive_quiz", self._ui_quiz),
+            ("generate_bar_chart_data", self._ui_bar_chart),
+            ("analyze_performance_by_topic", self._ui_math_analysis),
+        )
+
+    async def aclose(self):
+        """Flush pending storage writes and close the LLM client."""
+        if self._writer_task is not None:
+            await self._write_queue.join()
+            self._writer_task.cancel()
+            self._writer_task = None
+        await self.llm_agent.aclose()
+
+    async def _storage_writer(self):
+        """Drain queued conversation writes off the request path.
+        
+        Whatever has accumulated since the last wake-up is flushed as one
+        batched store call, amortizing the per-write round trip.
+        """
+        while True:
+            batch = [await self._write_queue.get()]
+            while True:
+                try:
+                    batch.append(self._write_queue.get_nowait())
+                except asyncio.QueueEmpty:
+                    break
+            try:
+                store.add_conversation_messages(batch)
+            except Exception as e:
+                log.error("Background storage write failed: %s", e)
+            finally:
+                for _ in batch:
+                    self._write_queue.task_done()
     
     async def handle_message(
         self,
@@ -35,7 +411,12 @@ class ConversationOrchestrator:
         # Create or retrieve session
         is_new_session = session_id is None
         if not session_id:
-            session_id = str(uuid.uuid4())
+            # .hex skips the dash formatting of str(uuid4())
+            session_id = uuid.uuid4().hex
+
+        # Lazily start the background writer inside the running loop
+        if self._writer_task is None:
+            self._writer_task = asyncio.get_running_loop().create_task(self._storage_writer())
         
         try:
             # Get conversation history
@@ -48,86 +429,157 @@ class ConversationOrchestrator:
             # Save user message
             self._save_message(session_id, "user", message)
             
-            # Check if user is asking for analysis - if so, DON'T pre-fetch (let LLM call tools)
-            message_lower = message.lower()
-            analysis_keywords = ['analyze', 'analysis', 'chart', 'visual', 'graph', 'breakdown', 'detailed analysis', 'show me']
-            is_explicit_analysis = any(keyword in message_lower for keyword in analysis_keywords)
-            
+            # Explicit analyze-my-test asks dispatch the analysis tool set
+            # directly via the agent's fastpath instead of stuffing
+            # instructions into the prompt; the message itself stays
+            # untouched and anything broader keeps normal tool selection.
+            is_explicit_analysis = bool(_FORCE_ANALYSIS_RE.search(message))
             if is_explicit_analysis:
-                print(f"📊 User requested analysis - skipping pre-fetch to force tool calls")
-                enriched_message = self._force_tool_usage_message(user_id, message)
-            else:
-                # Don't pre-fetch at all - always let LLM call tools for data
-                print(f"🔧 Skipping pre-fetch - letting LLM call tools")
-                enriched_message = message
+                log.debug("User requested analysis - forcing the analysis tool set")
             
             # Process with LLM agent
             response = await self.llm_agent.process_message(
                 user_id=user_id,
-                message=enriched_message,
-                conversation_history=history
-            )
-            
-            # Save assistant response
-            self._save_message(
-                session_id,
-                "assistant",
-                response["message"],
-                tool_calls=response.get("tools_used", [])
-            )
-            
-            # Check for follow-up suggestions
-            follow_ups = self._identify_follow_ups(response)
-            
-            # Enhance response with structured UI elements
-            structured_response = self._create_structured_response(
-                response["message"],
-                response.get("tools_used", []),
-                user_id
-            )
-            
-            # Add smart quick replies based on message content, tools used, and conversation context
-            self._add_contextual_quick_replies(
-                response["message"], 
-                structured_response, 
-                message,
-                tools_used=response.get("tools_used", []),
-                conversation_history=history
+                message=message,
+                conversation_history=history,
+                force_tools=is_explicit_analysis
             )
             
-            return {
-                "session_id": session_id,
-                "response": response["message"],
-                "follow_ups": follow_ups,
-                "tools_used": response.get("tools_used", []),
-                "ui_elements": structured_response,
-                "metadata": {
-                    "timestamp": datetime.now().isoformat(),
-                    "tool_calls_made": response.get("tool_calls_made", 0)
-                }
-            }
+            return await self._finalize_turn(session_id, user_id, message, history, response)
         
         except Exception as e:
-            # Error handling
-            error_message = "I apologize, but I encountered an issue. Could you please rephrase your question?"
-            
-            self._save_message(
-                session_id,
-                "system",
-                f"Error: {str(e)}"
-            )
-            
-            return {
-                "session_id": session_id,
-                "response": error_message,
-                "error": str(e) if self.llm_agent.settings.DEBUG else "An error occurred",
-                "follow_ups": [],
-                "tools_used": [],
-                "metadata": {
-                    "timestamp": datetime.now().isoformat(),
-                    "error": True
-                }
+            return self._error_response(session_id, e)
+
+    async def handle_message_stream(
+        self,
+        user_id: str,
+        message: str,
+        session_id: Optional[str] = None
+    ):
+        """
+        Streaming variant of handle_message.
+
+        Yields {"type": "token", "content": str} events as the assistant
+        response arrives, then {"type": "final", "data": ...} whose data has
+        the same shape as handle_message's return value. The final payload
+        is authoritative: the agent's validator may correct streamed text.
+        """
+        is_new_session = session_id is None
+        if not session_id:
+            session_id = uuid.uuid4().hex
+
+        if self._writer_task is None:
+            self._writer_task = asyncio.get_running_loop().create_task(self._storage_writer())
+
+        try:
+            history = self._get_formatted_history(session_id)
+
+            # Session starts are template-driven, not streamed; emit the
+            # welcome payload as a single final event.
+            if is_new_session and len(history) == 0:
+                result = await self._handle_session_start(user_id, session_id, message)
+                yield {"type": "final", "data": result}
+                return
+
+            self._save_message(session_id, "user", message)
+
+            is_explicit_analysis = bool(_FORCE_ANALYSIS_RE.search(message))
+
+            response = None
+            async for event in self.llm_agent.process_message_stream(
+                user_id=user_id,
+                message=message,
+                conversation_history=history,
+                force_tools=is_explicit_analysis
+            ):
+                if event["type"] == "final":
+                    response = event
+                else:
+                    yield event
+
+            yield {
+                "type": "final",
+                "data": await self._finalize_turn(session_id, user_id, message, history, response)
             }
+        except Exception as e:
+            yield {"type": "final", "data": self._error_response(session_id, e)}
+
+    async def _finalize_turn(
+        self,
+        session_id: str,
+        user_id: str,
+        message: str,
+        history: deque,
+        response: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """Persist the assistant turn and assemble the response payload."""
+        # Save assistant response; the store write lands on the
+        # background writer queue, so this never blocks the turn.
+        self._save_message(
+            session_id,
+            "assistant",
+            response["message"],
+            response.get("tools_used", [])
+        )
+
+        # Build the structured UI elements on a worker thread (the
+        # helper reads the store synchronously) while the follow-up
+        # scan runs on the loop; the two are independent.
+        structured_task = asyncio.create_task(asyncio.to_thread(
+            self._create_structured_response,
+            response["message"],
+            response.get("tools_used", []),
+            user_id,
+            response.get("tool_results")
+        ))
+
+        # Check for follow-up suggestions
+        follow_ups = self._identify_follow_ups(response)
+
+        structured_response = await structured_task
+
+        # Add smart quick replies based on message content, tools used, and conversation context
+        self._add_contextual_quick_replies(
+            response["message"],
+            structured_response,
+            message,
+            tools_used=response.get("tools_used", []),
+            conversation_history=history
+        )
+
+        return {
+            "session_id": session_id,
+            "response": response["message"],
+            "follow_ups": follow_ups,
+            "tools_used": response.get("tools_used", []),
+            "ui_elements": structured_response,
+            "metadata": {
+                "timestamp": _now_iso(),
+                "tool_calls_made": response.get("tool_calls_made", 0)
+            }
+        }
+
+    def _error_response(self, session_id: str, e: Exception) -> Dict[str, Any]:
+        """Record an error turn and build the apologetic fallback payload."""
+        error_message = "I apologize, but I encountered an issue. Could you please rephrase your question?"
+
+        self._save_message(
+            session_id,
+            "system",
+            f"Error: {str(e)}"
+        )
+
+        return {
+            "session_id": session_id,
+            "response": error_message,
+            "error": str(e) if self.llm_agent.settings.DEBUG else "An error occurred",
+            "follow_ups": [],
+            "tools_used": [],
+            "metadata": {
+                "timestamp": _now_iso(),
+                "error": True
+            }
+        }
     
     async def _handle_session_start(
         self,
@@ -146,49 +598,28 @@ class ConversationOrchestrator:
         Returns:
             Response with user profile information and personalized greeting
         """
-        from tools.user_profile import get_user_profile
-        from tools.progress_tracking import get_progress_summary
-        
-        # Fetch user profile
-        profile = get_user_profile(user_id)
-        
+        # Profile, progress and the latest test all key on the same user;
+        # the bundle fetches them in one call (and one thread hop), and the
+        # latest test is threaded through both welcome helpers rather than
+        # re-fetched by each.
+        bundle = await asyncio.to_thread(get_user_dashboard_bundle, user_id)
+        profile = bundle["profile"]
+        progress = bundle["progress"]
+        latest_test = bundle["latest_test"]
+
         if profile.get("error"):
-            # If profile not found, proceed normally
-            self._save_message(session_id, "user", message)
-            response = await self.llm_agent.process_message(
-                user_id=user_id,
-                message=message,
-                conversation_history=[]
-            )
-            self._save_message(session_id, "assistant", response["message"])
-            
-            return {
-                "session_id": session_id,
-                "response": response["message"],
-                "follow_ups": [],
-                "tools_used": response.get("tools_used", []),
-                "ui_elements": self._create_structured_response(
-                    response["message"],
-                    response.get("tools_used", []),
-                    user_id
-                ),
-                "metadata": {
-                    "timestamp": datetime.now().isoformat(),
-                    "tool_calls_made": response.get("tool_calls_made", 0)
-                }
-            }
-        
-        # Get progress summary
-        progress = get_progress_summary(user_id)
-        
+            # No profile to greet with - hand the message to the normal
+            # pipeline (session_id is set, so this won't recurse here).
+            return await self.handle_message(user_id, message, session_id=session_id)
+
         # Create personalized welcome message
-        welcome_message = self._create_welcome_message(profile, progress)
-        
+        welcome_message = self._create_welcome_message(profile, progress, latest_test)
+
         # Save the welcome message
         self._save_message(session_id, "assistant", welcome_message)
-        
+
         # Create UI elements for the welcome screen
-        ui_elements = self._create_welcome_ui_elements(profile, progress)
+        ui_elements = self._create_welcome_ui_elements(profile, progress, latest_test)
         
         return {
             "session_id": session_id,
@@ -199,7 +630,7 @@ class ConversationOrchestrator:
             "tools_used": ["get_user_profile", "get_progress_summary"],
             "ui_elements": ui_elements,
             "metadata": {
-                "timestamp": datetime.now().isoformat(),
+                "timestamp": _now_iso(),
                 "tool_calls_made": 2,
                 "is_welcome": True
             }
@@ -208,19 +639,19 @@ class ConversationOrchestrator:
     def _create_welcome_message(
         self,
         profile: Dict[str, Any],
-        progress: Dict[str, Any]
+        progress: Dict[str, Any],
+        latest_test: Optional[Dict[str, Any]] = None
     ) -> str:
-        """Create a personalized welcome message based on user profile."""
-        from tools.performance_analysis import get_latest_test_results
-        
+        """Create a personalized welcome message based on user profile.
+
+        latest_test is fetched once by the caller and shared with
+        _create_welcome_ui_elements to avoid duplicate lookups.
+        """
         name = profile.get("name", "there").split()[0]  # Use first name only
         test_type = profile.get("test_type", "ABC Certification")
         target_score = profile.get("target_score")
         baseline_score = profile.get("baseline_score")
-        user_id = profile.get("user_id")
-        
-        # Check for recent test results
-        latest_test = get_latest_test_results(user_id) if user_id else None
+
         current_score = None
         if latest_test and not latest_test.get("error"):
             current_score = latest_test.get("total_score")
@@ -272,7 +703,8 @@ class ConversationOrchestrator:
     def _create_welcome_ui_elements(
         self,
         profile: Dict[str, Any],
-        progress: Dict[str, Any]
+        progress: Dict[str, Any],
+        latest_test: Optional[Dict[str, Any]] = None
     ) -> Dict[str, Any]:
         """Create UI elements for the welcome screen."""
         ui_elements = {
@@ -285,30 +717,26 @@ class ConversationOrchestrator:
         test_type = profile.get("test_type", "N/A")
         target_score = profile.get("target_score", "N/A")
         days_until_test = profile.get("days_until_test")
-        user_id = profile.get("user_id")
         baseline_score = profile.get("baseline_score")
-        
+
         # Get current score - prioritize latest test results over progress/baseline
-        from tools.performance_analysis import get_latest_test_results
         current_score = None
-        
+
         # First, try to get the latest test score
-        if user_id:
-            latest_test = get_latest_test_results(user_id)
-            if latest_test and not latest_test.get("error"):
-                current_score = latest_test.get("total_score")
-                print(f"  📊 Using latest test score for UI: {current_score}")
+        if latest_test and not latest_test.get("error"):
+            current_score = latest_test.get("total_score")
+            log.debug("Using latest test score for UI: %s", current_score)
         
         # If no test score, try progress data
         if not current_score and not progress.get("error"):
             current_score = progress.get("current_score") or progress.get("latest_score")
             if current_score:
-                print(f"  📊 Using progress score for UI: {current_score}")
+                log.debug("Using progress score for UI: %s", current_score)
         
         # Finally, fallback to baseline
         if not current_score:
             current_score = baseline_score
-            print(f"  📊 Using baseline score for UI: {current_score}")
+            log.debug("Using baseline score for UI: %s", current_score)
         
         ui_elements["cards"].append({
             "type": "profile_overview",
@@ -351,12 +779,7 @@ class ConversationOrchestrator:
                     })
         
         # Add quick reply buttons matching the image
-        ui_elements["quick_replies"] = [
-            {"text": "📊 Analyze my last exam", "action": "analyze_exam"},
-            {"text": "💰 How can I improve my scores?", "action": "improve_scores"},
-            {"text": "🤔 How am I doing now?", "action": "check_progress"},
-            {"text": "📝 Come up with similar questions", "action": "create_quiz"}
-        ]
+        ui_elements["quick_replies"] = _QR_DEFAULT
         
         return ui_elements
     
@@ -378,92 +801,34 @@ class ConversationOrchestrator:
             tools_used: List of tools that were called in this response
             conversation_history: Previous conversation messages for context
         """
-        from agents.scenarios import ConversationScenarios
-        
         response_lower = response_text.lower()
-        user_msg_lower = user_message.lower()
         tools_used = tools_used or []
         conversation_history = conversation_history or []
         
-        # Build conversation context string from recent history
+        # Build conversation context string from recent history. The regex
+        # scans only need the gist, so each message is capped at 500 chars
+        # before lowering - long assistant replies no longer dominate here.
         conversation_context = ""
         if conversation_history:
-            conversation_context = " ".join([msg.get("content", "") for msg in conversation_history[-3:]])
-            conversation_context = conversation_context.lower()
+            conversation_context = " ".join(
+                msg.get("content", "")[:500].lower()
+                for msg in list(conversation_history)[-3:]
+            )
         
         # Priority 1: Check tools_used to determine context (most reliable)
         if tools_used:
-            if "get_latest_test_results" in tools_used:
-                ui_elements["quick_replies"] = [
-                    {"text": "📊 Analyze my last exam", "action": "analyze_exam"},
-                    {"text": "💰 How can I improve my scores?", "action": "improve_scores"},
-                    {"text": "📈 Compare with my target", "action": "compare_progress"},
-                    {"text": "🎯 Generate practice questions", "action": "create_quiz"}
-                ]
-                return
-            
-            if "analyze_performance_by_topic" in tools_used:
-                ui_elements["quick_replies"] = [
-                    {"text": "🎯 Create practice on weak areas", "action": "create_quiz"},
-                    {"text": "📊 Show detailed breakdown", "action": "detailed_analysis"},
-                    {"text": "💡 What should I study next?", "action": "get_recommendations"},
-                    {"text": "📈 How am I doing overall?", "action": "check_progress"}
-                ]
-                return
-            
-            if "generate_adaptive_quiz" in tools_used:
-                ui_elements["quick_replies"] = [
-                    {"text": "▶️ Start this quiz", "action": "start_quiz"},
-                    {"text": "⚙️ Customize quiz settings", "action": "customize_quiz"},
-                    {"text": "📚 Review concepts first", "action": "review_concepts"},
-                    {"text": "❌ Skip for now", "action": "cancel"}
-                ]
-                return
-            
-            if "generate_bar_chart_data" in tools_used or "generate_study_recommendations" in tools_used:
-                ui_elements["quick_replies"] = [
-                    {"text": "🎯 Create practice quiz", "action": "create_quiz"},
-                    {"text": "📊 Analyze more details", "action": "analyze_exam"},
-                    {"text": "💡 Show study plan", "action": "get_recommendations"},
-                    {"text": "📈 Track my progress", "action": "check_progress"}
-                ]
-                return
-            
-            if "get_progress_summary" in tools_used:
-                ui_elements["quick_replies"] = [
-                    {"text": "🎯 Create practice questions", "action": "create_quiz"},
-                    {"text": "📊 Analyze my last test", "action": "analyze_exam"},
-                    {"text": "💡 Get recommendations", "action": "get_recommendations"},
-                    {"text": "🔥 Check my streak", "action": "check_progress"}
-                ]
-                return
-            
-            if "identify_error_patterns" in tools_used:
-                ui_elements["quick_replies"] = [
-                    {"text": "🎯 Practice my weak topics", "action": "create_quiz"},
-                    {"text": "📊 Show detailed analysis", "action": "detailed_analysis"},
-                    {"text": "💡 How to fix these mistakes?", "action": "get_recommendations"},
-                    {"text": "📚 Review explanations", "action": "review_concepts"}
-                ]
-                return
-            
-            if "get_question_explanation" in tools_used:
-                ui_elements["quick_replies"] = [
-                    {"text": "🎯 Try similar questions", "action": "create_quiz"},
-                    {"text": "📊 Analyze my test", "action": "analyze_exam"},
-                    {"text": "💡 Explain another topic", "action": "explain_concepts"},
-                    {"text": "📈 Check my progress", "action": "check_progress"}
-                ]
-                return
-        
+            tools_set = set(tools_used)
+            for tool in _TOOL_REPLY_PRIORITY:
+                if tool in tools_set:
+                    ui_elements["quick_replies"] = _TOOL_QUICK_REPLIES[tool]
+                    return
+
         # Priority 2: Check conversation history for specific states
         if conversation_context:
             # Check if user just completed a quiz
-            if any(phrase in conversation_context for phrase in ['quiz', 'practice', 'question']) and \
-               any(phrase in response_lower for phrase in ['complete', 'finished', 'done', 'result', 'score', 'correct']):
+            if _QUIZ_CONTEXT_RE.search(conversation_context) and _QUIZ_DONE_RE.search(response_lower):
                 # Try to extract quiz accuracy from response if available
-                import re
-                accuracy_match = re.search(r'(\d+)%|(\d+)/(\d+)', response_text)
+                accuracy_match = _ACCURACY_RE.search(response_text)
                 if accuracy_match:
                     # Use scenario helper for quiz completion
                     try:
@@ -475,85 +840,43 @@ class ConversationOrchestrator:
                         scenario = ConversationScenarios.get_quiz_complete_scenario(accuracy, total)
                         ui_elements["quick_replies"] = scenario.get("quick_replies", [])
                         return
-                    except:
+                    except (TypeError, ValueError):
                         pass
                 
                 # Fallback to generic post-quiz buttons
-                ui_elements["quick_replies"] = [
-                    {"text": "📊 Review my results", "action": "analyze_exam"},
-                    {"text": "🎯 Try another quiz", "action": "create_quiz"},
-                    {"text": "💡 Get study tips", "action": "get_recommendations"},
-                    {"text": "📈 Check overall progress", "action": "check_progress"}
-                ]
+                ui_elements["quick_replies"] = _QR_POST_QUIZ
                 return
             
             # Check if we're in an improvement discussion
-            if any(phrase in conversation_context for phrase in ['improve', 'better', 'weak', 'struggl', 'help']):
-                ui_elements["quick_replies"] = [
-                    {"text": "🎯 Create practice on weak areas", "action": "create_quiz"},
-                    {"text": "📊 Show detailed breakdown", "action": "analyze_exam"},
-                    {"text": "💡 Get personalized recommendations", "action": "get_recommendations"},
-                    {"text": "📚 Review explanations", "action": "review_concepts"}
-                ]
+            if _IMPROVEMENT_RE.search(conversation_context):
+                ui_elements["quick_replies"] = _QR_IMPROVEMENT
                 return
         
         # Priority 3: Check response text for specific patterns
         # If response mentions error/issue with data retrieval
-        if any(phrase in response_lower for phrase in [
-            'issue retrieving', 'error', 'could not', 'unable to', 
-            'no recent test results', 'no test results', 'haven\'t taken'
-        ]):
-            ui_elements["quick_replies"] = [
-                {"text": "✅ I did take a test!", "action": "confirm_test_taken"},
-                {"text": "🎯 Let's do a practice quiz", "action": "create_quiz"},
-                {"text": "📊 Check my profile", "action": "check_profile"},
-                {"text": "💬 I need help", "action": "support"}
-            ]
+        if _DATA_ISSUE_RE.search(response_lower):
+            ui_elements["quick_replies"] = _QR_DATA_ISSUE
             return
         
         # If response asks a question or requests confirmation
-        if any(phrase in response_lower for phrase in [
-            'would you like', 'do you want', 'shall we', 'ready to',
-            'can you confirm', 'please confirm', 'let me know'
-        ]):
+        if _CONFIRMATION_RE.search(response_lower):
             # Check what they're asking about
             if 'quiz' in response_lower or 'practice' in response_lower:
-                ui_elements["quick_replies"] = [
-                    {"text": "✅ Yes! Let's do it", "action": "start_quiz"},
-                    {"text": "⚙️ Let me customize it", "action": "customize_quiz"},
-                    {"text": "📚 Review first", "action": "review_concepts"},
-                    {"text": "❌ Maybe later", "action": "cancel"}
-                ]
+                ui_elements["quick_replies"] = _QR_CONFIRM_QUIZ
             elif 'test' in response_lower or 'exam' in response_lower:
-                ui_elements["quick_replies"] = [
-                    {"text": "✅ Yep, I took one!", "action": "confirm_test_taken"},
-                    {"text": "❌ Not yet", "action": "no_test_yet"},
-                    {"text": "🎯 Let's practice", "action": "create_quiz"}
-                ]
+                ui_elements["quick_replies"] = _QR_CONFIRM_TEST
             elif 'schedule' in response_lower or 'reschedule' in response_lower:
-                ui_elements["quick_replies"] = [
-                    {"text": "📅 Set a new date", "action": "schedule_test"},
-                    {"text": "📊 Just study for now", "action": "focus_study"},
-                    {"text": "💬 Tell me more", "action": "more_info"}
-                ]
+                ui_elements["quick_replies"] = _QR_CONFIRM_SCHEDULE
             else:
                 # Generic confirmation buttons
-                ui_elements["quick_replies"] = [
-                    {"text": "✅ Yes, sounds good!", "action": "confirm_yes"},
-                    {"text": "❌ Nope, I'm good", "action": "confirm_no"},
-                    {"text": "💬 Tell me more", "action": "more_info"}
-                ]
+                ui_elements["quick_replies"] = _QR_CONFIRM_GENERIC
             return
         
         # If response provides analysis or recommendations (score analysis, performance breakdown)
-        if any(phrase in response_lower for phrase in [
-            'based on', 'you scored', 'your performance', 'recommend', 'suggest',
-            'weak areas', 'strengths', 'improve', 'focus on', 'analysis', 'breakdown'
-        ]):
+        if _ANALYSIS_RESPONSE_RE.search(response_lower):
             # Extract weak topics if mentioned
             weak_topics = []
-            topic_keywords = ['algebra', 'geometry', 'reading', 'writing', 'math', 'verbal', 'quantitative']
-            for topic in topic_keywords:
+            for topic in _TOPIC_KEYWORDS:
                 if topic in response_lower and ('weak' in response_lower or 'struggle' in response_lower or 'difficulty' in response_lower):
                     weak_topics.append(topic)
             
@@ -563,38 +886,23 @@ class ConversationOrchestrator:
                 ui_elements["quick_replies"] = scenario.get("quick_replies", [])
             else:
                 # Generic analysis response buttons
-                ui_elements["quick_replies"] = [
-                    {"text": "🎯 Help me practice", "action": "create_quiz"},
-                    {"text": "📊 Show me more details", "action": "analyze_exam"},
-                    {"text": "💡 What should I study?", "action": "get_recommendations"},
-                    {"text": "📈 How am I doing now?", "action": "check_progress"}
-                ]
+                ui_elements["quick_replies"] = _QR_ANALYSIS_GENERIC
             return
         
         # Check if discussing progress/streaks
-        if any(phrase in response_lower for phrase in [
-            'streak', 'progress', 'improvement', 'better', 'days', 'practice'
-        ]) and not tools_used:
-            ui_elements["quick_replies"] = [
-                {"text": "📈 Overall progress", "action": "check_progress"},
-                {"text": "🎯 Create practice quiz", "action": "create_quiz"},
-                {"text": "📊 Analyze my test", "action": "analyze_exam"},
-                {"text": "💡 Get recommendations", "action": "get_recommendations"}
-            ]
+        if _PROGRESS_RE.search(response_lower) and not tools_used:
+            ui_elements["quick_replies"] = _QR_PROGRESS
             return
         
         # Default helpful buttons if no specific context detected
-        if not ui_elements.get("quick_replies") or len(ui_elements["quick_replies"]) == 0:
-            ui_elements["quick_replies"] = [
-                {"text": "📊 Analyze my last exam", "action": "analyze_exam"},
-                {"text": "💰 How can I improve my scores?", "action": "improve_scores"},
-                {"text": "🤔 How am I doing now?", "action": "check_progress"},
-                {"text": "📝 Come up with similar questions", "action": "create_quiz"}
-            ]
+        if not ui_elements.get("quick_replies"):
+            ui_elements["quick_replies"] = _QR_DEFAULT
         
         # Debug: Log final quick replies
-        final_replies = ui_elements.get("quick_replies", [])
-        print(f"\n🔘 Quick replies set ({len(final_replies)}): {[r.get('text', '')[:30] for r in final_replies]}\n")
+        if log.isEnabledFor(logging.DEBUG):
+            final_replies = ui_elements.get("quick_replies", [])
+            log.debug("Quick replies set (%d): %s", len(final_replies),
+                      [r.get('text', '')[:30] for r in final_replies])
     
     def _enrich_message_with_context(self, user_id: str, message: str) -> str:
         """
@@ -608,101 +916,89 @@ class ConversationOrchestrator:
         Returns:
             Enriched message with context (or original if analysis requested)
         """
-        message_lower = message.lower()
+        # One shared classification - the same call handle_message makes
+        intent = _classify_intent(message)
         
-        # If user explicitly asks to analyze, SKIP pre-fetching to force tool calls
-        analysis_keywords = ['analyze', 'analysis', 'analyze my test', 'analyze my exam', 'analyze my last test']
-        is_analysis_request = any(keyword in message_lower for keyword in analysis_keywords)
-        
-        if is_analysis_request:
-            print(f"📊 User requested analysis - skipping pre-fetch to FORCE tool calls")
-            print(f"⚠️  LLM MUST call get_latest_test_results, analyze_performance_by_topic, and generate_bar_chart_data")
+        if intent == "analysis":
+            log.debug("User requested analysis - instructing LLM to call analysis tools")
             # Return enriched message that emphasizes tool usage
             return f"{message}\n\n[SYSTEM: User explicitly requested to analyze their test. You MUST call these tools:\n1. get_latest_test_results(user_id='{user_id}') - to get test scores\n2. analyze_performance_by_topic(user_id='{user_id}', section='<appropriate_section>') - to analyze performance\n3. generate_bar_chart_data(user_id='{user_id}') - to create visualizations\nDO NOT respond without calling these tools.]"
         
-        # Keywords that indicate user wants their data
-        score_keywords = ['score', 'result', 'performance', 'test', 'exam']
-        progress_keywords = ['progress', 'improvement', 'better', 'worse', 'how am i doing']
-        
-        should_add_context = any(keyword in message_lower for keyword in score_keywords + progress_keywords)
-        
-        if not should_add_context:
+        if intent != "data":
             return message
         
-        print(f"🎯 Detected data request keywords, enriching message with context...")
-        print(f"⚠️  NOTE: Pre-fetching data for reference, but LLM MUST STILL call tools to get actual data!")
+        log.debug("Detected data request keywords, enriching message with context")
         
         # Fetch relevant data
-        from tools.user_profile import get_user_profile
-        from tools.performance_analysis import get_latest_test_results
-        from tools.progress_tracking import get_progress_summary
-        
         context_parts = [f"User's original question: {message}\n"]
         context_parts.append("\n[SYSTEM: I've pre-fetched the following data for quick reference. However, YOU MUST STILL CALL TOOLS to get actual test results (get_latest_test_results), generate charts (generate_bar_chart_data), and detailed analysis (analyze_performance_by_topic) when requested.]\n")
         
-        try:
-            # Get user profile
-            profile = get_user_profile(user_id)
-            if not profile.get("error"):
-                context_parts.append(f"\nUSER PROFILE:")
-                context_parts.append(f"- Name: {profile.get('name')}")
-                context_parts.append(f"- Test Type: {profile.get('test_type')}")
-                context_parts.append(f"- Target Score: {profile.get('target_score')}")
-                context_parts.append(f"- Baseline Score: {profile.get('baseline_score')}")
-                context_parts.append(f"- Days Until Test: {profile.get('days_until_test')}")
-                print(f"  ✅ Added user profile context")
-            else:
-                print(f"  ⚠️ Profile has error: {profile.get('error')}")
-        except Exception as e:
-            print(f"  ⚠️ Could not add profile context: {e}")
-        
-        try:
-            # Get latest test results - log both success and errors
-            test_results = get_latest_test_results(user_id)
-            print(f"  🔍 Test results query result: error={test_results.get('error')}, user_id={user_id}")
-            if not test_results.get("error"):
-                context_parts.append(f"\nLATEST TEST RESULTS (Pre-fetched):")
-                context_parts.append(f"- Total Score: {test_results.get('total_score')}")
-                context_parts.append(f"- Date Taken: {test_results.get('date_taken')}")
-                sections = test_results.get('sections', {})
-                if sections:
-                    context_parts.append(f"- Section Scores:")
-                    for section, data in sections.items():
-                        context_parts.append(f"  • {section.title()}: {data.get('score')} (percentile: {data.get('percentile')})")
-                print(f"  ✅ Added test results context")
-            else:
-                print(f"  ⚠️ Test results NOT FOUND - error: {test_results.get('error')}, user_id: {user_id}")
-                context_parts.append(f"\n[NOTE: Pre-fetch did not find test results. YOU MUST CALL get_latest_test_results(user_id='{user_id}') to check for test results.]")
-        except Exception as e:
-            print(f"  ❌ Exception getting test results: {e}")
-            import traceback
-            traceback.print_exc()
-        
-        try:
-            # Get progress summary
-            progress = get_progress_summary(user_id)
-            if not progress.get("error") and progress.get("total_questions_attempted", 0) > 0:
-                context_parts.append(f"\nPROGRESS SUMMARY:")
-                context_parts.append(f"- Questions Attempted: {progress.get('total_questions_attempted')}")
-                context_parts.append(f"- Overall Accuracy: {progress.get('overall_accuracy')}%")
-                context_parts.append(f"- Recent Accuracy: {progress.get('recent_accuracy')}%")
-                context_parts.append(f"- Practice Streak: {progress.get('practice_streak')} days")
-                print(f"  ✅ Added progress summary context")
-        except Exception as e:
-            print(f"  ⚠️ Could not add progress context: {e}")
+        # Fan the three independent pre-fetches out together so the total
+        # wait is the slowest call rather than the sum of all three.
+        profile_future = _PREFETCH_POOL.submit(_tool_cache.cached_call, get_user_profile, user_id)
+        test_future = _PREFETCH_POOL.submit(_tool_cache.cached_call, get_latest_test_results, user_id)
+        progress_future = _PREFETCH_POOL.submit(_tool_cache.cached_call, get_progress_summary, user_id)
+        
+        profile = self._safe_tool(profile_future, name="profile")
+        if profile is not None:
+            context_parts.append(
+                f"\nUSER PROFILE:\n"
+                f"- Name: {profile.get('name')}\n"
+                f"- Test Type: {profile.get('test_type')}\n"
+                f"- Target Score: {profile.get('target_score')}\n"
+                f"- Baseline Score: {profile.get('baseline_score')}\n"
+                f"- Days Until Test: {profile.get('days_until_test')}"
+            )
+            log.debug("Added user profile context")
+        
+        test_results = self._safe_tool(test_future, name="test results")
+        if test_results is not None:
+            block = (
+                f"\nLATEST TEST RESULTS (Pre-fetched):\n"
+                f"- Total Score: {test_results.get('total_score')}\n"
+                f"- Date Taken: {test_results.get('date_taken')}"
+            )
+            sections = test_results.get('sections', {})
+            if sections:
+                section_lines = "\n".join(
+                    f"  • {section.title()}: {data.get('score')} (percentile: {data.get('percentile')})"
+                    for section, data in sections.items()
+                )
+                block += f"\n- Section Scores:\n{section_lines}"
+            context_parts.append(block)
+            log.debug("Added test results context")
+        else:
+            context_parts.append(f"\n[NOTE: Pre-fetch did not find test results. YOU MUST CALL get_latest_test_results(user_id='{user_id}') to check for test results.]")
+        
+        progress = self._safe_tool(progress_future, name="progress")
+        if progress is not None and progress.get("total_questions_attempted", 0) > 0:
+            context_parts.append(
+                f"\nPROGRESS SUMMARY:\n"
+                f"- Questions Attempted: {progress.get('total_questions_attempted')}\n"
+                f"- Overall Accuracy: {progress.get('overall_accuracy')}%\n"
+                f"- Recent Accuracy: {progress.get('recent_accuracy')}%\n"
+                f"- Practice Streak: {progress.get('practice_streak')} days"
+            )
+            log.debug("Added progress summary context")
         
         enriched = "\n".join(context_parts)
-        print(f"  📝 Message enriched with {len(context_parts)} context items\n")
+        log.debug("Message enriched with %d context items", len(context_parts))
         return enriched
     
-    def _force_tool_usage_message(self, user_id: str, message: str) -> str:
-        """
-        Force the LLM to call tools by adding explicit instructions.
-        Used when user explicitly asks for analysis or detailed information.
-        """
-        return f"{message}\n\n[SYSTEM: User explicitly requested analysis. You MUST call these tools:\n1. get_latest_test_results(user_id='{user_id}') - MANDATORY to get test scores\n2. generate_bar_chart_data(user_id='{user_id}') - MANDATORY to create visualizations\n3. analyze_performance_by_topic(user_id='{user_id}', section='<appropriate_section>') - Call for relevant sections\n\nDO NOT respond without calling these tools. When get_latest_test_results returns data with 'success': true and 'total_score', that means DATA EXISTS - you MUST acknowledge and use it. NEVER say 'no test results' or 'haven't taken' when tools return actual data.]"
+    def _safe_tool(self, future, name: str) -> Optional[Dict[str, Any]]:
+        """Join a pre-fetch future; None if it failed or returned an error."""
+        try:
+            result = future.result()
+        except Exception:
+            log.exception("%s pre-fetch failed", name)
+            return None
+        if not isinstance(result, dict) or result.get("error"):
+            log.debug("%s pre-fetch returned error: %s", name,
+                      result.get("error") if isinstance(result, dict) else result)
+            return None
+        return result
     
-    def _get_formatted_history(self, session_id: str) -> List[Dict[str, str]]:
+    def _get_formatted_history(self, session_id: str) -> deque:
         """
         Retrieve and format conversation history.
         
@@ -710,20 +1006,31 @@ class ConversationOrchestrator:
             session_id: Conversation session ID
             
         Returns:
-            Formatted conversation history
+            Formatted conversation history as a bounded deque
         """
-        history = store.get_conversation_history(session_id, limit=self.max_context_turns)
-        
-        # Format for LLM
-        formatted = []
-        for msg in history:
-            if msg.get("message_type") in ["user", "assistant"]:
-                formatted.append({
-                    "role": msg["message_type"],
-                    "content": msg["content"]
-                })
-        
-        return formatted
+        cached = self._history_cache.get(session_id)
+        if cached is None:
+            # The store filters to user/assistant rows, so system/tool rows
+            # neither cross the boundary nor eat context-window slots.
+            history = store.get_conversation_history(
+                session_id, limit=self.max_context_turns,
+                message_types=("user", "assistant")
+            )
+
+            # Format for LLM. A bounded deque keeps truncation O(1) downstream -
+            # the LLM client consumes it as-is without re-slicing.
+            cached = deque(
+                ({"role": msg["message_type"], "content": msg["content"]} for msg in history),
+                maxlen=self.max_context_turns
+            )
+
+            if len(self._history_cache) >= self._history_cache_max:
+                self._history_cache.pop(next(iter(self._history_cache)))
+            self._history_cache[session_id] = cached
+
+        # Hand back a copy: _save_message keeps appending to the canonical
+        # deque during the turn, and callers need a stable snapshot.
+        return deque(cached, maxlen=self.max_context_turns)
     
     def _save_message(
         self,
@@ -732,13 +1039,26 @@ class ConversationOrchestrator:
         content: str,
         tool_calls: Optional[List] = None
     ):
-        """Save message to conversation history."""
-        store.add_conversation_message(session_id, {
+        """Save message to conversation history.
+
+        The history cache is updated immediately so the next turn sees the
+        message; the store write itself is queued for the background
+        writer, falling back to an inline write if the queue is full.
+        """
+        entry = {
             "message_type": role,
             "content": content,
             "tool_calls": tool_calls,
-            "timestamp": datetime.now().isoformat()
-        })
+            "timestamp": _now_iso()
+        }
+        if role in ("user", "assistant"):
+            cached = self._history_cache.get(session_id)
+            if cached is not None:
+                cached.append({"role": role, "content": content})
+        try:
+            self._write_queue.put_nowait((session_id, entry))
+        except asyncio.QueueFull:
+            store.add_conversation_message(session_id, entry)
     
     def _identify_follow_ups(self, response: Dict[str, Any]) -> List[str]:
         """
@@ -751,23 +1071,15 @@ class ConversationOrchestrator:
             List of follow-up suggestions
         """
         follow_ups = []
-        tools_used = response.get("tools_used", [])
-        
-        # Suggest follow-ups based on tools used
-        if "analyze_performance_by_topic" in tools_used:
-            follow_ups.append("Would you like me to create a practice quiz focused on your weak areas?")
-        
-        if "generate_adaptive_quiz" in tools_used:
-            follow_ups.append("Ready to start the quiz whenever you are!")
-        
-        if "get_latest_test_results" in tools_used:
-            follow_ups.append("Want to see how this compares to your previous attempts?")
-        
-        if "get_progress_summary" in tools_used:
-            follow_ups.append("Would you like specific recommendations to improve further?")
-        
-        # Limit to 2 most relevant follow-ups
-        return follow_ups[:2]
+        used = set(response.get("tools_used", []))
+        
+        # Suggest follow-ups based on tools used; stop at the 2 most relevant
+        for tool, suggestion in _FOLLOWUPS:
+            if tool in used:
+                follow_ups.append(suggestion)
+                if len(follow_ups) == 2:
+                    break
+        return follow_ups
     
     def start_new_session(self, user_id: str) -> str:
         """
@@ -779,7 +1091,7 @@ class ConversationOrchestrator:
         Returns:
             New session ID
         """
-        return str(uuid.uuid4())
+        return uuid.uuid4().hex
     
     def get_session_summary(self, session_id: str) -> Dict[str, Any]:
         """
@@ -791,31 +1103,23 @@ class ConversationOrchestrator:
         Returns:
             Session summary
         """
-        history = store.get_conversation_history(session_id, limit=100)
-        
-        message_counts = {
-            "user": 0,
-            "assistant": 0,
-            "system": 0
-        }
-        
-        for msg in history:
-            role = msg.get("message_type", "unknown")
-            message_counts[role] = message_counts.get(role, 0) + 1
+        stats = store.get_session_stats(session_id)
+        message_counts = stats["counts"]
         
         return {
             "session_id": session_id,
             "total_turns": message_counts["user"],  # Number of user messages
             "message_counts": message_counts,
-            "started_at": history[0].get("timestamp") if history else None,
-            "last_activity": history[-1].get("timestamp") if history else None
+            "started_at": stats["started_at"],
+            "last_activity": stats["last_activity"]
         }
     
     def _create_structured_response(
         self,
         message: str,
         tools_used: List[str],
-        user_id: str
+        user_id: str,
+        tool_results: Optional[Dict[str, Any]] = None
     ) -> Dict[str, Any]:
         """
         Create structured UI elements based on tools used and context.
@@ -827,10 +1131,13 @@ class ConversationOrchestrator:
             message: The text message
             tools_used: List of tools that were called (empty if no tools were used)
             user_id: User identifier
+            tool_results: Return values captured while the agent ran its
+                tools, keyed by tool name; used instead of re-invoking
             
         Returns:
             Dictionary with UI elements (cards, buttons, charts)
         """
+        tool_results = tool_results or {}
         ui_elements = {
             "cards": [],
             "quick_replies": [],
@@ -838,105 +1145,114 @@ class ConversationOrchestrator:
         }
         
         # Debug: Log tool usage
-        print(f"\n📊 Creating structured response - Tools used: {tools_used}")
+        log.debug("Creating structured response - tools used: %s", tools_used)
         if not tools_used:
-            print(f"⚠️  No tools called - charts will NOT be generated\n")
+            log.debug("No tools called - charts will not be generated")
             return ui_elements
         
         # Note: Quick replies are now handled by _add_contextual_quick_replies
-        # Charts and cards should ONLY be generated when specific functions are called
-        
-        if "get_progress_summary" in tools_used:
-            from tools.progress_tracking import get_progress_summary
-            progress = get_progress_summary(user_id)
-            if not progress.get("error"):
-                ui_elements["charts"].append({
-                    "type": "circular_progress",
-                    "title": "Overall Progress",
-                    "value": progress.get("overall_accuracy", 0),
-                    "target": 85,
-                    "label": f"{progress.get('total_questions_attempted', 0)} questions"
-                })
-                
-                ui_elements["cards"].append({
-                    "type": "progress_card",
-                    "title": "Your Progress",
-                    "data": progress
-                })
-        
-        if "generate_adaptive_quiz" in tools_used:
-            # Try to get quiz data from the most recent tool call
-            # We'll look for the quiz details in the conversation context
-            # For now, add a default quiz card with basic info
-            ui_elements["quick_replies"].extend([
-                {"text": "▶️ Start Quiz", "action": "start_quiz"},
-                {"text": "⚙️ Customize Quiz", "action": "customize_quiz"},
-                {"text": "❌ Cancel", "action": "cancel"}
-            ])
-            
-            # Add a quiz card to show quiz is ready
-            ui_elements["cards"].append({
-                "type": "quiz_ready",
-                "title": "Quiz Ready!",
-                "message": "Your personalized quiz has been created and is ready to start.",
-                "action": "start_quiz",
-                # Note: In a real implementation, we'd fetch quiz details from the tool result
-                # stored in the conversation context or session state
-            })
-            print(f"✅ Quiz card generated")
-        
-        # Generate bar chart ONLY when generate_bar_chart_data function is explicitly called
-        # This prevents duplicate charts when both get_latest_test_results and generate_bar_chart_data are called
-        if "generate_bar_chart_data" in tools_used:
-            from tools.performance_analysis import generate_bar_chart_data
-            bar_chart_data = generate_bar_chart_data(user_id)
-            if not bar_chart_data.get("error") and bar_chart_data.get("bars"):
-                ui_elements["charts"].append({
-                    "type": "bar_chart",
-                    "title": "Score Breakdown by Subject",
-                    "data": bar_chart_data
-                })
-                print(f"✅ Bar chart generated from generate_bar_chart_data tool: {len(bar_chart_data.get('bars', []))} bars")
-        
-        # Note: We no longer generate charts from get_latest_test_results to avoid duplicates
-        # Charts are only generated when generate_bar_chart_data is explicitly called
-        
-        # Generate Math Analysis card (with circular progress) ONLY when analyze_performance_by_topic is called
-        if "analyze_performance_by_topic" in tools_used:
-            from tools.performance_analysis import analyze_performance_by_topic
-            # Check if math was analyzed (from the tool call arguments, but we'll analyze math as default)
-            # In a real implementation, we'd need to track which section was analyzed
-            # For now, we'll generate math analysis if the tool was called
-            perf = analyze_performance_by_topic(user_id, "math", "all")
-            if not perf.get("error") and perf.get("topics"):
-                ui_elements["cards"].append({
-                    "type": "performance",
-                    "title": "Math Analysis",
-                    "data": perf
-                })
-                print(f"✅ Math Analysis card generated from function call")
+        # Charts and cards should ONLY be generated when specific functions are called.
+        # One builder per tool, walked in a fixed order so chart/card
+        # ordering matches the old branch chain.
+        used = set(tools_used)
+        for tool_name, builder in self._ui_builders:
+            if tool_name in used:
+                builder(user_id, ui_elements, tool_results)
         
         # Debug: Log what charts/cards were generated
         charts_count = len(ui_elements.get("charts", []))
         cards_count = len(ui_elements.get("cards", []))
         if charts_count > 0 or cards_count > 0:
-            print(f"📊 Generated: {charts_count} chart(s), {cards_count} card(s)")
-            if charts_count > 0:
-                print(f"   Chart types: {[c.get('type') for c in ui_elements['charts']]}")
-            if cards_count > 0:
-                print(f"   Card types: {[c.get('type') for c in ui_elements['cards']]}")
+            if log.isEnabledFor(logging.DEBUG):
+                log.debug("Generated: %d chart(s), %d card(s)", charts_count, cards_count)
+                if charts_count > 0:
+                    log.debug("Chart types: %s", [c.get('type') for c in ui_elements['charts']])
+                if cards_count > 0:
+                    log.debug("Card types: %s", [c.get('type') for c in ui_elements['cards']])
         else:
-            print(f"📊 No charts or cards generated (no matching tools called)\n")
+            log.debug("No charts or cards generated (no matching tools called)")
         
         # Note: Quick replies are handled by _add_contextual_quick_replies (called separately)
         # Don't set default quick replies here
         
         return ui_elements
     
+    def _ui_progress(self, user_id: str, ui_elements: Dict[str, Any], tool_results: Dict[str, Any]):
+        """Add the overall-progress chart and card."""
+        progress = tool_results.get("get_progress_summary") \
+            or _tool_cache.cached_call(get_progress_summary, user_id)
+        if not progress.get("error"):
+            ui_elements["charts"].append({
+                "type": "circular_progress",
+                "title": "Overall Progress",
+                "value": progress.get("overall_accuracy", 0),
+                "target": 85,
+                "label": f"{progress.get('total_questions_attempted', 0)} questions"
+            })
+            
+            ui_elements["cards"].append({
+                "type": "progress_card",
+                "title": "Your Progress",
+                "data": progress
+            })
+    
+    def _ui_quiz(self, user_id: str, ui_elements: Dict[str, Any], tool_results: Dict[str, Any]):
+        """Add the quiz-ready card and its action buttons."""
+        ui_elements["quick_replies"].extend([
+            {"text": "▶️ Start Quiz", "action": "start_quiz"},
+            {"text": "⚙️ Customize Quiz", "action": "customize_quiz"},
+            {"text": "❌ Cancel", "action": "cancel"}
+        ])
+        
+        # Add a quiz card to show quiz is ready
+        ui_elements["cards"].append({
+            "type": "quiz_ready",
+            "title": "Quiz Ready!",
+            "message": "Your personalized quiz has been created and is ready to start.",
+            "action": "start_quiz",
+        })
+        log.debug("Quiz card generated")
+    
+    def _ui_bar_chart(self, user_id: str, ui_elements: Dict[str, Any], tool_results: Dict[str, Any]):
+        """Add the score-breakdown bar chart.
+        
+        Only built when generate_bar_chart_data was explicitly called, so
+        get_latest_test_results alone never produces a duplicate chart.
+        """
+        bar_chart_data = tool_results.get("generate_bar_chart_data") \
+            or _tool_cache.cached_call(generate_bar_chart_data, user_id)
+        if not bar_chart_data.get("error") and bar_chart_data.get("bars"):
+            ui_elements["charts"].append({
+                "type": "bar_chart",
+                "title": "Score Breakdown by Subject",
+                "data": bar_chart_data
+            })
+            log.debug("Bar chart generated from generate_bar_chart_data tool: %d bars", len(bar_chart_data.get('bars', [])))
+    
+    def _ui_math_analysis(self, user_id: str, ui_elements: Dict[str, Any], tool_results: Dict[str, Any]):
+        """Add the math performance-analysis card.
+        
+        Math is the default section here; tracking which section the tool
+        actually analyzed would need the call arguments threaded through.
+        """
+        perf = tool_results.get("analyze_performance_by_topic") \
+            or _tool_cache.cached_call(analyze_performance_by_topic, user_id, "math", "all")
+        if not perf.get("error") and perf.get("topics"):
+            ui_elements["cards"].append({
+                "type": "performance",
+                "title": "Math Analysis",
+                "data": perf
+            })
+            log.debug("Math analysis card generated from function call")
+    
     def _generate_pie_chart_data(self, sections: Dict[str, Any], test_id: Optional[str] = None) -> Dict[str, Any]:
         """
         Generate pie chart data from section scores.
         
+        Thin adapter over the memoized _pie_chart_for: the sections dict is
+        reduced to a hashable (section, score) key, the only inputs the
+        chart depends on.
+        
         Args:
             sections: Dictionary of section scores
             test_id: Optional test ID to display
@@ -947,73 +1263,10 @@ class ConversationOrchestrator:
         if not sections:
             return None
         
-        # Define colors for different sections/topics
-        section_colors = {
-            "reading": "#1C1C1E",      # Darkest gray
-            "writing": "#3A3A3C",      # Medium-dark gray
-            "math": "#6D6D70",         # Medium gray
-            "verbal": "#8E8E93",       # Light gray
-            "quantitative": "#AEAEB2",  # Lightest gray
-            "reasoning": "#5A5A5D",    # Medium-light gray
-            "algebra": "#AEAEB2",       # Lightest gray
-            "geometry": "#C7C7CC"       # Very light gray
-        }
-        
-        # Calculate total score for percentage calculation
-        total_score = sum(section.get("score", 0) for section in sections.values())
-        
-        # Map section names to display names
-        display_names = {
-            "reading": "Reading",
-            "writing": "Writing",
-            "math": "Math",
-            "verbal": "Verbal",
-            "quantitative": "Quantitative",
-            "reasoning": "Reasoning",
-            "algebra": "Algebra",
-            "geometry": "Geometry"
-        }
-        
-        # Build pie chart segments
-        segments = []
-        for section_key, section_data in sections.items():
-            score = section_data.get("score", 0)
-            percentage = round((score / total_score * 100) if total_score > 0 else 0, 0)
-            
-            display_name = display_names.get(section_key, section_key.title())
-            color = section_colors.get(section_key, "#8E8E93")
-            
-            segments.append({
-                "name": display_name,
-                "score": score,
-                "percentage": int(percentage),
-                "color": color,
-                "section_key": section_key
-            })
-        
-        # Sort by score (largest first)
-        segments.sort(key=lambda x: x["score"], reverse=True)
-        
-        # Extract test number from test_id if available
-        test_number = None
-        if test_id:
-            try:
-                # Try to extract a number from test_id, or use a hash
-                import hashlib
-                hash_int = int(hashlib.md5(test_id.encode()).hexdigest()[:8], 16)
-                test_number = str((hash_int % 99) + 1)  # Number between 1-99
-            except:
-                test_number = "#"
-        
-        return {
-            "type": "pie_chart",
-            "title": "Performance Breakdown",
-            "data": {
-                "segments": segments,
-                "test_number": test_number or "#",
-                "total_score": total_score
-            }
-        }
+        sections_key = tuple(sorted(
+            (key, data.get("score", 0)) for key, data in sections.items()
+        ))
+        return _pie_chart_for(test_id, sections_key)
     
     def _generate_performance_insights(self, results: Dict[str, Any], user_id: str) -> List[Dict[str, Any]]:
         """
@@ -1028,41 +1281,36 @@ class ConversationOrchestrator:
         """
         insights = []
         
-        # Get user profile for comparison
-        from tools.user_profile import get_user_profile
-        from tools.performance_analysis import compare_progress
-        
-        profile = get_user_profile(user_id)
-        if not profile.get("error"):
-            # Compare with previous tests
-            comparison = compare_progress(user_id, "historical")
-            if not comparison.get("error"):
-                if comparison.get("score_change", 0) > 0:
-                    improvement = comparison.get("score_change", 0)
-                    insights.append({
-                        "type": "improvement",
-                        "text": f"Score improved by {improvement} points since last test!",
-                        "icon": "✅"
-                    })
-                
-                # Check section improvements
-                section_changes = comparison.get("section_changes", {})
-                for section, changes in section_changes.items():
-                    change = changes.get("change", 0)
-                    if change > 0:
-                        section_name = section.title()
-                        insights.append({
-                            "type": "section_improvement",
-                            "text": f"{section_name} score improved {change} points",
-                            "icon": "✅"
-                        })
+        # Compare with previous tests. The profile fetch that used to gate
+        # this only had its error flag read; compare_progress reports the
+        # same missing-user condition itself.
+        comparison = compare_progress(user_id, "historical")
+        if not comparison.get("error"):
+            improvement = comparison.get("score_change", 0)
+            if improvement > 0:
+                insights.append({
+                    "type": "improvement",
+                    "text": f"Score improved by {improvement} points since last test!",
+                    "icon": "✅"
+                })
+            
+            # Check section improvements
+            insights.extend(
+                {
+                    "type": "section_improvement",
+                    "text": f"{section.title()} score improved {changes.get('change', 0)} points",
+                    "icon": "✅"
+                }
+                for section, changes in comparison.get("section_changes", {}).items()
+                if changes.get("change", 0) > 0
+            )
         
         # Calculate expected score range based on current performance
         total_score = results.get("total_score", 0)
         if total_score > 0:
-            # Estimate range (roughly +/- 10%)
-            low_range = int(total_score * 0.9)
-            high_range = int(total_score * 1.1)
+            # Estimate range (roughly +/- 10%) in integer math
+            low_range = (total_score * 9) // 10
+            high_range = (total_score * 11) // 10
             insights.append({
                 "type": "score_range",
                 "text": f"Your expected range is {low_range:,} to {high_range:,}",
@@ -1,6 +1,144 @@
 """Conversation scenarios and guided flows."""
 
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Tuple
+
+# Static scenario payloads are built once at import and handed out by
+# reference - callers treat them as read-only, and tuples serialize as
+# JSON arrays. Scenarios whose message is dynamic still share their
+# reply tuple and only format the string per call.
+
+# Canonical button objects, keyed by what the button says (several
+# wordings map to the same action). Every button list below is a tuple
+# of references into this registry, so each distinct button exists once.
+_BTN = {
+    "analyze_exam": {"text": "📊 Analyze my last exam", "action": "analyze_exam"},
+    "analyze_last_test": {"text": "📊 Analyze my last test", "action": "analyze_exam"},
+    "analyze_my_test": {"text": "📊 Analyze my test", "action": "analyze_exam"},
+    "analyze_details": {"text": "📊 Analyze more details", "action": "analyze_exam"},
+    "review_results": {"text": "📊 Review my results", "action": "analyze_exam"},
+    "breakdown_via_analysis": {"text": "📊 Show detailed breakdown", "action": "analyze_exam"},
+    "detailed_breakdown": {"text": "📊 Show detailed breakdown", "action": "detailed_analysis"},
+    "detailed_analysis": {"text": "📊 Show detailed analysis", "action": "detailed_analysis"},
+    "improve_scores": {"text": "💰 How can I improve my scores?", "action": "improve_scores"},
+    "how_am_i_doing": {"text": "🤔 How am I doing now?", "action": "check_progress"},
+    "overall_progress": {"text": "📈 How am I doing overall?", "action": "check_progress"},
+    "track_progress": {"text": "📈 Track my progress", "action": "check_progress"},
+    "check_progress": {"text": "📈 Check my progress", "action": "check_progress"},
+    "check_overall_progress": {"text": "📈 Check overall progress", "action": "check_progress"},
+    "check_streak": {"text": "🔥 Check my streak", "action": "check_progress"},
+    "compare_target": {"text": "📈 Compare with my target", "action": "compare_progress"},
+    "similar_questions": {"text": "📝 Come up with similar questions", "action": "create_quiz"},
+    "generate_practice": {"text": "🎯 Generate practice questions", "action": "create_quiz"},
+    "weak_areas_quiz": {"text": "🎯 Create practice on weak areas", "action": "create_quiz"},
+    "practice_quiz": {"text": "🎯 Create practice quiz", "action": "create_quiz"},
+    "practice_questions": {"text": "🎯 Create practice questions", "action": "create_quiz"},
+    "weak_topics_quiz": {"text": "🎯 Practice my weak topics", "action": "create_quiz"},
+    "similar_quiz": {"text": "🎯 Try similar questions", "action": "create_quiz"},
+    "another_quiz": {"text": "🎯 Try another quiz", "action": "create_quiz"},
+    "study_next": {"text": "💡 What should I study next?", "action": "get_recommendations"},
+    "study_plan": {"text": "💡 Show study plan", "action": "get_recommendations"},
+    "get_recommendations": {"text": "💡 Get recommendations", "action": "get_recommendations"},
+    "fix_mistakes": {"text": "💡 How to fix these mistakes?", "action": "get_recommendations"},
+    "study_tips": {"text": "💡 Get study tips", "action": "get_recommendations"},
+    "personalized_recs": {"text": "💡 Get personalized recommendations", "action": "get_recommendations"},
+    "explain_another": {"text": "💡 Explain another topic", "action": "explain_concepts"},
+    "start_quiz": {"text": "▶️ Start this quiz", "action": "start_quiz"},
+    "customize_quiz": {"text": "⚙️ Customize quiz settings", "action": "customize_quiz"},
+    "review_concepts": {"text": "📚 Review concepts first", "action": "review_concepts"},
+    "review_explanations": {"text": "📚 Review explanations", "action": "review_concepts"},
+    "cancel": {"text": "❌ Skip for now", "action": "cancel"},
+}
+
+_ANALYSIS_REPLIES = (
+    _BTN["analyze_exam"],
+    _BTN["improve_scores"],
+    _BTN["how_am_i_doing"],
+    _BTN["similar_questions"]
+)
+
+_WELCOME_SCENARIO = {
+    "message": "Hi! I'm your personal study coach. I can help you:",
+    "quick_replies": _ANALYSIS_REPLIES
+}
+
+_QUIZ_SCENARIO = {
+    "message": "Great! Let's create a personalized practice quiz for you.",
+    "quick_replies": (
+        {"text": "🎯 Start right away (20 questions)", "action": "quick_quiz"},
+        {"text": "⚙️ Customize my quiz", "action": "customize_quiz"},
+        {"text": "🎲 Random practice", "action": "random_quiz"},
+        {"text": "📊 Focus on weak areas", "action": "weak_areas_quiz"}
+    )
+}
+
+_PROGRESS_SCENARIO = {
+    "message": "Let me show you how you've been progressing!",
+    "quick_replies": (
+        {"text": "📈 Overall progress", "action": "overall_progress"},
+        {"text": "🔥 My study streak", "action": "study_streak"},
+        {"text": "🎯 Compare with goals", "action": "compare_goals"},
+        {"text": "📊 Detailed analytics", "action": "detailed_analytics"}
+    )
+}
+
+_IMPROVEMENT_REPLIES = (
+    {"text": "✅ Give me practice questions", "action": "practice"},
+    {"text": "📚 Explain the concepts", "action": "explain_concepts"},
+    {"text": "🎯 Create a study plan", "action": "create_plan"},
+    {"text": "📊 Show me my mistakes", "action": "show_mistakes"}
+)
+
+_QUIZ_HIGH_REPLIES = (
+    {"text": "📊 Show detailed breakdown", "action": "quiz_breakdown"},
+    {"text": "🎯 Try harder questions", "action": "harder_quiz"},
+    {"text": "📈 Check my progress", "action": "check_progress"},
+    {"text": "✨ Practice more", "action": "practice"}
+)
+
+_QUIZ_MID_REPLIES = (
+    {"text": "📖 Review wrong answers", "action": "review_answers"},
+    {"text": "🎯 Practice weak topics", "action": "weak_topics"},
+    {"text": "💡 Get study tips", "action": "study_tips"},
+    {"text": "🔄 Try similar quiz", "action": "similar_quiz"}
+)
+
+_QUIZ_LOW_REPLIES = (
+    {"text": "📖 Review all answers", "action": "review_all"},
+    {"text": "📚 Explain concepts", "action": "explain_concepts"},
+    {"text": "🎯 Easier practice", "action": "easier_quiz"},
+    {"text": "💪 Get encouragement", "action": "encouragement"}
+)
+
+_ENCOURAGEMENT_SCENARIOS = {
+    "struggling": {
+        "message": "Remember, every expert was once a beginner! Take a break if needed, then come back fresh. You've got this! 💪",
+        "quick_replies": (
+            {"text": "🎯 Try easier questions", "action": "easier_quiz"},
+            {"text": "📚 Learn the concepts", "action": "learn_concepts"},
+            {"text": "💡 Get study tips", "action": "study_tips"},
+            {"text": "📈 See my progress", "action": "check_progress"}
+        )
+    },
+    "milestone": {
+        "message": "🎉 Amazing achievement! Your dedication is really paying off. Keep up the great work!",
+        "quick_replies": (
+            {"text": "📊 Check my stats", "action": "check_stats"},
+            {"text": "🎯 Next challenge", "action": "next_challenge"},
+            {"text": "📈 Set new goals", "action": "set_goals"},
+            {"text": "🔥 Keep practicing", "action": "practice"}
+        )
+    },
+    "general": {
+        "message": "You're making steady progress! Consistency is key to success. Keep going! 🌟",
+        "quick_replies": (
+            {"text": "🎯 Practice now", "action": "practice"},
+            {"text": "📊 Check progress", "action": "check_progress"},
+            {"text": "💡 Study tips", "action": "study_tips"},
+            {"text": "🎓 My goals", "action": "my_goals"}
+        )
+    }
+}
+
 
 class ConversationScenarios:
     """Predefined conversation scenarios for guided interactions."""
@@ -8,54 +146,25 @@ class ConversationScenarios:
     @staticmethod
     def get_welcome_scenario() -> Dict[str, Any]:
         """Get the welcome scenario for new users."""
-        return {
-            "message": "Hi! I'm your personal study coach. I can help you:",
-            "quick_replies": [
-                {"text": "📊 Analyze my last exam", "action": "analyze_exam"},
-                {"text": "💰 How can I improve my scores?", "action": "improve_scores"},
-                {"text": "🤔 How am I doing now?", "action": "check_progress"},
-                {"text": "📝 Come up with similar questions", "action": "create_quiz"}
-            ]
-        }
+        return _WELCOME_SCENARIO
     
     @staticmethod
     def get_score_analysis_scenario(user_data: Dict) -> Dict[str, Any]:
         """Get scenario for score analysis."""
         return {
             "message": f"Let's analyze your performance! You're preparing for the {user_data.get('test_type', 'ABC Certification')}.",
-            "quick_replies": [
-                {"text": "📊 Analyze my last exam", "action": "analyze_exam"},
-                {"text": "💰 How can I improve my scores?", "action": "improve_scores"},
-                {"text": "🤔 How am I doing now?", "action": "check_progress"},
-                {"text": "📝 Come up with similar questions", "action": "create_quiz"}
-            ]
+            "quick_replies": _ANALYSIS_REPLIES
         }
     
     @staticmethod
     def get_quiz_scenario() -> Dict[str, Any]:
         """Get scenario for quiz practice."""
-        return {
-            "message": "Great! Let's create a personalized practice quiz for you.",
-            "quick_replies": [
-                {"text": "🎯 Start right away (20 questions)", "action": "quick_quiz"},
-                {"text": "⚙️ Customize my quiz", "action": "customize_quiz"},
-                {"text": "🎲 Random practice", "action": "random_quiz"},
-                {"text": "📊 Focus on weak areas", "action": "weak_areas_quiz"}
-            ]
-        }
+        return _QUIZ_SCENARIO
     
     @staticmethod
     def get_progress_scenario() -> Dict[str, Any]:
         """Get scenario for progress tracking."""
-        return {
-            "message": "Let me show you how you've been progressing!",
-            "quick_replies": [
-                {"text": "📈 Overall progress", "action": "overall_progress"},
-                {"text": "🔥 My study streak", "action": "study_streak"},
-                {"text": "🎯 Compare with goals", "action": "compare_goals"},
-                {"text": "📊 Detailed analytics", "action": "detailed_analytics"}
-            ]
-        }
+        return _PROGRESS_SCENARIO
     
     @staticmethod
     def get_improvement_scenario(weak_topics: List[str]) -> Dict[str, Any]:
@@ -64,41 +173,22 @@ class ConversationScenarios:
         
         return {
             "message": f"Based on your performance, I recommend focusing on: {topics_str}",
-            "quick_replies": [
-                {"text": "✅ Give me practice questions", "action": "practice"},
-                {"text": "📚 Explain the concepts", "action": "explain_concepts"},
-                {"text": "🎯 Create a study plan", "action": "create_plan"},
-                {"text": "📊 Show me my mistakes", "action": "show_mistakes"}
-            ]
+            "quick_replies": _IMPROVEMENT_REPLIES
         }
     
     @staticmethod
     def get_quiz_complete_scenario(accuracy: float, total: int) -> Dict[str, Any]:
         """Get scenario after quiz completion."""
+        correct = int(accuracy * total / 100)
         if accuracy >= 80:
-            message = f"🎉 Excellent work! You got {accuracy:.0f}% ({int(accuracy * total / 100)}/{total}) correct!"
-            replies = [
-                {"text": "📊 Show detailed breakdown", "action": "quiz_breakdown"},
-                {"text": "🎯 Try harder questions", "action": "harder_quiz"},
-                {"text": "📈 Check my progress", "action": "check_progress"},
-                {"text": "✨ Practice more", "action": "practice"}
-            ]
+            message = f"🎉 Excellent work! You got {accuracy:.0f}% ({correct}/{total}) correct!"
+            replies = _QUIZ_HIGH_REPLIES
         elif accuracy >= 60:
-            message = f"Good effort! You got {accuracy:.0f}% ({int(accuracy * total / 100)}/{total}) correct. Let's review and improve!"
-            replies = [
-                {"text": "📖 Review wrong answers", "action": "review_answers"},
-                {"text": "🎯 Practice weak topics", "action": "weak_topics"},
-                {"text": "💡 Get study tips", "action": "study_tips"},
-                {"text": "🔄 Try similar quiz", "action": "similar_quiz"}
-            ]
+            message = f"Good effort! You got {accuracy:.0f}% ({correct}/{total}) correct. Let's review and improve!"
+            replies = _QUIZ_MID_REPLIES
         else:
-            message = f"You got {accuracy:.0f}% ({int(accuracy * total / 100)}/{total}) correct. Don't worry, let's work on improving!"
-            replies = [
-                {"text": "📖 Review all answers", "action": "review_all"},
-                {"text": "📚 Explain concepts", "action": "explain_concepts"},
-                {"text": "🎯 Easier practice", "action": "easier_quiz"},
-                {"text": "💪 Get encouragement", "action": "encouragement"}
-            ]
+            message = f"You got {accuracy:.0f}% ({correct}/{total}) correct. Don't worry, let's work on improving!"
+            replies = _QUIZ_LOW_REPLIES
         
         return {
             "message": message,
@@ -108,135 +198,63 @@ class ConversationScenarios:
     @staticmethod
     def get_encouragement_scenario(context: str = "general") -> Dict[str, Any]:
         """Get encouragement scenario based on context."""
-        scenarios = {
-            "struggling": {
-                "message": "Remember, every expert was once a beginner! Take a break if needed, then come back fresh. You've got this! 💪",
-                "quick_replies": [
-                    {"text": "🎯 Try easier questions", "action": "easier_quiz"},
-                    {"text": "📚 Learn the concepts", "action": "learn_concepts"},
-                    {"text": "💡 Get study tips", "action": "study_tips"},
-                    {"text": "📈 See my progress", "action": "check_progress"}
-                ]
-            },
-            "milestone": {
-                "message": "🎉 Amazing achievement! Your dedication is really paying off. Keep up the great work!",
-                "quick_replies": [
-                    {"text": "📊 Check my stats", "action": "check_stats"},
-                    {"text": "🎯 Next challenge", "action": "next_challenge"},
-                    {"text": "📈 Set new goals", "action": "set_goals"},
-                    {"text": "🔥 Keep practicing", "action": "practice"}
-                ]
-            },
-            "general": {
-                "message": "You're making steady progress! Consistency is key to success. Keep going! 🌟",
-                "quick_replies": [
-                    {"text": "🎯 Practice now", "action": "practice"},
-                    {"text": "📊 Check progress", "action": "check_progress"},
-                    {"text": "💡 Study tips", "action": "study_tips"},
-                    {"text": "🎓 My goals", "action": "my_goals"}
-                ]
-            }
-        }
-        
-        return scenarios.get(context, scenarios["general"])
+        return _ENCOURAGEMENT_SCENARIOS.get(context, _ENCOURAGEMENT_SCENARIOS["general"])
     
     @staticmethod
-    def get_buttons_for_test_analysis() -> List[Dict[str, Any]]:
+    def get_buttons_for_test_analysis() -> Tuple[Dict[str, Any], ...]:
         """Get quick reply buttons for test analysis context."""
-        return [
-            {"text": "📊 Analyze my last exam", "action": "analyze_exam"},
-            {"text": "💰 How can I improve my scores?", "action": "improve_scores"},
-            {"text": "📈 Compare with my target", "action": "compare_progress"},
-            {"text": "🎯 Generate practice questions", "action": "create_quiz"}
-        ]
+        return (_BTN["analyze_exam"], _BTN["improve_scores"],
+                _BTN["compare_target"], _BTN["generate_practice"])
     
     @staticmethod
-    def get_buttons_for_performance_analysis() -> List[Dict[str, Any]]:
+    def get_buttons_for_performance_analysis() -> Tuple[Dict[str, Any], ...]:
         """Get quick reply buttons for performance breakdown context."""
-        return [
-            {"text": "🎯 Create practice on weak areas", "action": "create_quiz"},
-            {"text": "📊 Show detailed breakdown", "action": "detailed_analysis"},
-            {"text": "💡 What should I study next?", "action": "get_recommendations"},
-            {"text": "📈 How am I doing overall?", "action": "check_progress"}
-        ]
+        return (_BTN["weak_areas_quiz"], _BTN["detailed_breakdown"],
+                _BTN["study_next"], _BTN["overall_progress"])
     
     @staticmethod
-    def get_buttons_for_quiz_generation() -> List[Dict[str, Any]]:
+    def get_buttons_for_quiz_generation() -> Tuple[Dict[str, Any], ...]:
         """Get quick reply buttons when a quiz is being generated."""
-        return [
-            {"text": "▶️ Start this quiz", "action": "start_quiz"},
-            {"text": "⚙️ Customize quiz settings", "action": "customize_quiz"},
-            {"text": "📚 Review concepts first", "action": "review_concepts"},
-            {"text": "❌ Skip for now", "action": "cancel"}
-        ]
+        return (_BTN["start_quiz"], _BTN["customize_quiz"],
+                _BTN["review_concepts"], _BTN["cancel"])
     
     @staticmethod
-    def get_buttons_for_recommendations() -> List[Dict[str, Any]]:
+    def get_buttons_for_recommendations() -> Tuple[Dict[str, Any], ...]:
         """Get quick reply buttons for study recommendations context."""
-        return [
-            {"text": "🎯 Create practice quiz", "action": "create_quiz"},
-            {"text": "📊 Analyze more details", "action": "analyze_exam"},
-            {"text": "💡 Show study plan", "action": "get_recommendations"},
-            {"text": "📈 Track my progress", "action": "check_progress"}
-        ]
+        return (_BTN["practice_quiz"], _BTN["analyze_details"],
+                _BTN["study_plan"], _BTN["track_progress"])
     
     @staticmethod
-    def get_buttons_for_progress_check() -> List[Dict[str, Any]]:
+    def get_buttons_for_progress_check() -> Tuple[Dict[str, Any], ...]:
         """Get quick reply buttons for progress checking context."""
-        return [
-            {"text": "🎯 Create practice questions", "action": "create_quiz"},
-            {"text": "📊 Analyze my last test", "action": "analyze_exam"},
-            {"text": "💡 Get recommendations", "action": "get_recommendations"},
-            {"text": "🔥 Check my streak", "action": "check_progress"}
-        ]
+        return (_BTN["practice_questions"], _BTN["analyze_last_test"],
+                _BTN["get_recommendations"], _BTN["check_streak"])
     
     @staticmethod
-    def get_buttons_for_error_patterns() -> List[Dict[str, Any]]:
+    def get_buttons_for_error_patterns() -> Tuple[Dict[str, Any], ...]:
         """Get quick reply buttons for error pattern analysis context."""
-        return [
-            {"text": "🎯 Practice my weak topics", "action": "create_quiz"},
-            {"text": "📊 Show detailed analysis", "action": "detailed_analysis"},
-            {"text": "💡 How to fix these mistakes?", "action": "get_recommendations"},
-            {"text": "📚 Review explanations", "action": "review_concepts"}
-        ]
+        return (_BTN["weak_topics_quiz"], _BTN["detailed_analysis"],
+                _BTN["fix_mistakes"], _BTN["review_explanations"])
     
     @staticmethod
-    def get_buttons_for_question_explanation() -> List[Dict[str, Any]]:
+    def get_buttons_for_question_explanation() -> Tuple[Dict[str, Any], ...]:
         """Get quick reply buttons after explaining a question."""
-        return [
-            {"text": "🎯 Try similar questions", "action": "create_quiz"},
-            {"text": "📊 Analyze my test", "action": "analyze_exam"},
-            {"text": "💡 Explain another topic", "action": "explain_concepts"},
-            {"text": "📈 Check my progress", "action": "check_progress"}
-        ]
+        return (_BTN["similar_quiz"], _BTN["analyze_my_test"],
+                _BTN["explain_another"], _BTN["check_progress"])
     
     @staticmethod
-    def get_buttons_post_quiz() -> List[Dict[str, Any]]:
+    def get_buttons_post_quiz() -> Tuple[Dict[str, Any], ...]:
         """Get quick reply buttons after completing a quiz."""
-        return [
-            {"text": "📊 Review my results", "action": "analyze_exam"},
-            {"text": "🎯 Try another quiz", "action": "create_quiz"},
-            {"text": "💡 Get study tips", "action": "get_recommendations"},
-            {"text": "📈 Check overall progress", "action": "check_progress"}
-        ]
+        return (_BTN["review_results"], _BTN["another_quiz"],
+                _BTN["study_tips"], _BTN["check_overall_progress"])
     
     @staticmethod
-    def get_buttons_for_improvement_discussion() -> List[Dict[str, Any]]:
+    def get_buttons_for_improvement_discussion() -> Tuple[Dict[str, Any], ...]:
         """Get quick reply buttons when discussing improvement."""
-        return [
-            {"text": "🎯 Create practice on weak areas", "action": "create_quiz"},
-            {"text": "📊 Show detailed breakdown", "action": "analyze_exam"},
-            {"text": "💡 Get personalized recommendations", "action": "get_recommendations"},
-            {"text": "📚 Review explanations", "action": "review_concepts"}
-        ]
+        return (_BTN["weak_areas_quiz"], _BTN["breakdown_via_analysis"],
+                _BTN["personalized_recs"], _BTN["review_explanations"])
     
     @staticmethod
-    def get_buttons_default() -> List[Dict[str, Any]]:
+    def get_buttons_default() -> Tuple[Dict[str, Any], ...]:
         """Get default quick reply buttons."""
-        return [
-            {"text": "📊 Analyze my last exam", "action": "analyze_exam"},
-            {"text": "💰 How can I improve my scores?", "action": "improve_scores"},
-            {"text": "🤔 How am I doing now?", "action": "check_progress"},
-            {"text": "📝 Come up with similar questions", "action": "create_quiz"}
-        ]
-
+        return _ANALYSIS_REPLIES
@@ -1,7 +1,6 @@
 """Configuration management for the test prep agent."""
 
 from pydantic_settings import BaseSettings
-from functools import lru_cache
 from dotenv import load_dotenv
 from pydantic import field_validator
 import os
@@ -59,12 +58,14 @@ class Settings(BaseSettings):
         return api_key
 
 
-@lru_cache()
+# Settings never change during a process lifetime; build the single
+# instance at import so every access is a plain attribute load.
+SETTINGS: Settings = Settings()
+if not SETTINGS.OPENAI_API_KEY:
+    raise ValueError("OPENAI_API_KEY is missing. Please check your .env file.")
+
+
 def get_settings() -> Settings:
-    """Get cached settings instance."""
-    settings = Settings()
-    # Additional validation after initialization
-    if not settings.OPENAI_API_KEY:
-        raise ValueError("OPENAI_API_KEY is missing. Please check your .env file.")
-    return settings
+    """Get the shared settings instance (kept for back-compat)."""
+    return SETTINGS
 
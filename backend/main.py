@@ -2,15 +2,29 @@
 
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from pydantic import BaseModel
 from typing import Optional, List, Dict, Any
+import json
+import logging
+import os
 import uuid
 
 from config import get_settings
+
+# One-time logging setup; module loggers (orchestrator, llm_client) stay
+# silent below this level so debug formatting never runs in production.
+logging.basicConfig(level=os.environ.get("LOG_LEVEL", "INFO"))
 from agents.orchestrator import ConversationOrchestrator
+from agents import _tool_cache
+from tools.quiz_management import generate_adaptive_quiz, submit_quiz_response
+from tools.user_profile import get_user_profile
+
+log = logging.getLogger("chat")
 
 settings = get_settings()
-app = FastAPI(title="Test Prep Agent API", version="1.0.0")
+app = FastAPI(title="Test Prep Agent API", version="1.0.0",
+              default_response_class=ORJSONResponse)
 
 # Enable CORS for React Native app
 app.add_middleware(
@@ -25,6 +39,12 @@ app.add_middleware(
 orchestrator = ConversationOrchestrator()
 
 
+@app.on_event("shutdown")
+async def shutdown():
+    """Flush pending storage writes and close the OpenAI connection pool."""
+    await orchestrator.aclose()
+
+
 # Request/Response Models
 class ChatMessage(BaseModel):
     user_id: str
@@ -67,12 +87,8 @@ async def chat(message: ChatMessage):
     
     Process user messages and return AI-generated responses with tool usage.
     """
-    print(f"\n{'='*80}")
-    print(f"🌐 API /chat endpoint received:")
-    print(f"  📧 user_id: '{message.user_id}'")
-    print(f"  💬 message: '{message.message[:100]}{'...' if len(message.message) > 100 else ''}'")
-    print(f"  🔗 session_id: {message.session_id}")
-    print(f"{'='*80}\n")
+    log.info("POST /chat user_id=%s session_id=%s message=%.100r",
+             message.user_id, message.session_id, message.message)
     
     try:
         result = await orchestrator.handle_message(
@@ -82,34 +98,46 @@ async def chat(message: ChatMessage):
         )
         # Check if there's an error in the result
         if result.get('error'):
-            print(f"\n⚠️  Response generated with error: {result.get('error')}")
-            print(f"  Error code: {result.get('error_code', 'N/A')}")
-        else:
-            print(f"\n✅ Response generated successfully")
-        print(f"  Tools used: {result.get('tools_used', [])}")
-        
-        # Debug: Check if ui_elements and quick_replies are present
-        ui_elements = result.get('ui_elements', {})
-        quick_replies = ui_elements.get('quick_replies', [])
-        print(f"  UI Elements present: {bool(ui_elements)}")
-        print(f"  Quick replies count: {len(quick_replies)}")
-        if quick_replies:
-            print(f"  Quick replies: {[r.get('text', '')[:30] for r in quick_replies]}\n")
-        else:
-            print(f"  ⚠️  No quick replies in response!\n")
+            log.warning("response generated with error: %s (code=%s)",
+                        result.get('error'), result.get('error_code', 'N/A'))
+        if log.isEnabledFor(logging.DEBUG):
+            ui_elements = result.get('ui_elements', {})
+            quick_replies = ui_elements.get('quick_replies', [])
+            log.debug("tools_used=%s quick_replies=%s",
+                      result.get('tools_used', []),
+                      [r.get('text', '')[:30] for r in quick_replies])
         
         return result
     except Exception as e:
-        print(f"\n❌ Error in chat endpoint: {str(e)}\n")
+        log.exception("error in chat endpoint")
         if settings.DEBUG:
             raise HTTPException(status_code=500, detail=str(e))
         raise HTTPException(status_code=500, detail="An error occurred processing your message")
 
 
+@app.post("/chat/stream")
+async def chat_stream(message: ChatMessage):
+    """
+    Streaming chat endpoint (Server-Sent Events).
+
+    Emits {"type": "token", "content": ...} events as the response is
+    generated, then a {"type": "final", "data": ...} event carrying the same
+    payload shape as /chat. The final event is authoritative.
+    """
+    async def event_source():
+        async for event in orchestrator.handle_message_stream(
+            user_id=message.user_id,
+            message=message.message,
+            session_id=message.session_id
+        ):
+            yield f"data: {json.dumps(event)}\n\n"
+
+    return StreamingResponse(event_source(), media_type="text/event-stream")
+
+
 @app.get("/user/{user_id}/profile")
 async def get_profile(user_id: str):
     """Get user profile information."""
-    from tools.user_profile import get_user_profile
     try:
         profile = get_user_profile(user_id)
         if "error" in profile:
@@ -124,7 +152,6 @@ async def get_profile(user_id: str):
 @app.post("/user/{user_id}/quiz/generate")
 async def create_quiz(user_id: str, config: QuizConfig):
     """Generate a personalized quiz."""
-    from tools.quiz_management import generate_adaptive_quiz
     try:
         quiz = generate_adaptive_quiz(user_id, config.model_dump())
         if "error" in quiz:
@@ -139,9 +166,13 @@ async def create_quiz(user_id: str, config: QuizConfig):
 @app.post("/user/{user_id}/quiz/submit")
 async def submit_quiz(user_id: str, quiz_id: str, responses: List[dict]):
     """Submit quiz responses and get results."""
-    from tools.quiz_management import submit_quiz_response
     try:
         result = submit_quiz_response(user_id, quiz_id, responses)
+        # Submission changes progress/analysis data; drop the user's
+        # cached read-only tool results (shared and per-agent) so the
+        # next turn sees fresh state, matching the chat-path writes.
+        _tool_cache.invalidate(user_id)
+        orchestrator.llm_agent._invalidate_tool_cache(user_id)
         return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -1,28 +1,46 @@
 """In-memory data storage for MVP - no database needed."""
 
+from collections import deque
 from datetime import datetime, timedelta
-from typing import Dict, List, Any, Optional
+import bisect
+from functools import lru_cache
+from itertools import islice
+from pathlib import Path
+from typing import Dict, Iterator, List, Any, Optional
 import uuid
 import json
-import os
+
+# orjson parses these files roughly an order of magnitude faster than
+# stdlib json; fall back to stdlib if it is missing (same convention as
+# agents.llm_client).
+try:
+    import orjson
+    _loads = orjson.loads
+except ImportError:
+    _loads = json.loads
+
+_DATA_DIR = Path(__file__).resolve().parent.parent / "data"
+
+
+@lru_cache(maxsize=1)
+def _load_users_raw() -> tuple:
+    """Read and parse mock_users.json once per process."""
+    return tuple(_loads((_DATA_DIR / "mock_users.json").read_bytes()))
+
+
+@lru_cache(maxsize=1)
+def _load_questions_raw() -> tuple:
+    """Read and parse sample_questions.json once per process."""
+    return tuple(_loads((_DATA_DIR / "sample_questions.json").read_bytes()))
 
 class MemoryStore:
-    """Singleton in-memory storage for all application data."""
+    """In-memory storage for all application data.
     
-    _instance = None
-    
-    def __new__(cls):
-        if cls._instance is None:
-            cls._instance = super().__new__(cls)
-            cls._instance._initialized = False
-        return cls._instance
+    The module-level `store` below is the single shared instance; every
+    consumer imports it rather than constructing its own.
+    """
     
     def __init__(self):
-        if self._initialized:
-            return
-            
-        self._initialized = True
-        
         # Load mock data
         self.users: Dict[str, Dict] = self._load_mock_users()
         self.questions: List[Dict] = self._load_sample_questions()
@@ -30,32 +48,68 @@ class MemoryStore:
         # Runtime data storage
         self.test_results: Dict[str, List[Dict]] = {}  # user_id -> list of results
         self.quiz_responses: Dict[str, List[Dict]] = {}  # user_id -> list of responses
-        self.conversation_history: Dict[str, List[Dict]] = {}  # session_id -> list of messages
+        # user_id -> topic -> positions into quiz_responses[user_id],
+        # maintained by add_quiz_response for weak-area queries
+        self._quiz_topic_index: Dict[str, Dict[str, List[int]]] = {}
+        # user_id -> running aggregates, maintained on every response
+        # write so progress reads don't re-scan the whole history
+        self._user_stats: Dict[str, Dict[str, Any]] = {}
+        # session_id -> bounded message deque; maxlen caps per-session
+        # memory for long-running sessions with O(1) append
+        self.conversation_history: Dict[str, deque] = {}
         self.study_sessions: Dict[str, List[Dict]] = {}  # user_id -> list of sessions
         self.quizzes: Dict[str, Dict] = {}  # quiz_id -> quiz data
+        # quiz_id -> frozenset of its question ids, for O(1) membership
+        # checks when a submission is validated against its quiz
+        self.quiz_question_ids: Dict[str, frozenset] = {}
         
         # Initialize with some sample data
         self._seed_sample_data()
+        
+        # Secondary indexes over the (static) question bank
+        self._build_question_indexes()
+        
+        # Quiz generation hits the same few filter signatures per session;
+        # memoize the index lookups. Per-instance wrapping keeps the cache
+        # from pinning instances through the class.
+        self._filter_ids_cached = lru_cache(maxsize=256)(self._filter_question_ids)
+    
+    def _build_question_indexes(self):
+        """Index question positions by the fields get_questions filters on.
+        
+        The question bank is loaded once and never mutated, so each filter
+        lookup becomes a set intersection instead of a full scan.
+        """
+        self._question_index: Dict[str, Dict[Any, set]] = {
+            "test_type": {}, "section": {}, "topic": {}, "difficulty": {}
+        }
+        self.questions_by_id: Dict[Any, Dict] = {}
+        # section -> topics available in it, in question-bank order
+        self._section_topics: Dict[Any, List] = {}
+        for i, question in enumerate(self.questions):
+            self.questions_by_id[question.get("question_id")] = question
+            for field, index in self._question_index.items():
+                index.setdefault(question.get(field), set()).add(i)
+            topic = question.get("topic")
+            if topic:
+                topics = self._section_topics.setdefault(question.get("section"), [])
+                if topic not in topics:
+                    topics.append(topic)
     
     def _load_mock_users(self) -> Dict[str, Dict]:
-        """Load mock users from JSON file."""
+        """Load mock users from the cached JSON parse."""
         try:
-            data_dir = os.path.dirname(__file__) + "/../data"
-            with open(f"{data_dir}/mock_users.json", "r") as f:
-                users_list = json.load(f)
-                return {user["user_id"]: user for user in users_list}
-        except:
-            # Fallback if file doesn't exist yet
+            return {user["user_id"]: user for user in _load_users_raw()}
+        except FileNotFoundError:
+            # Fallback if file doesn't exist yet; corrupt JSON still raises
             return self._get_default_users()
     
     def _load_sample_questions(self) -> List[Dict]:
-        """Load sample questions from JSON file."""
+        """Load sample questions from the cached JSON parse."""
         try:
-            data_dir = os.path.dirname(__file__) + "/../data"
-            with open(f"{data_dir}/sample_questions.json", "r") as f:
-                return json.load(f)
-        except:
-            # Fallback if file doesn't exist yet
+            return list(_load_questions_raw())
+        except FileNotFoundError:
+            # Fallback if file doesn't exist yet; corrupt JSON still raises
             return self._get_default_questions()
     
     def _get_default_users(self) -> Dict[str, Dict]:
@@ -101,12 +155,13 @@ class MemoryStore:
             }
         ]
         
-        # Add sample quiz responses for mock-user
+        # Add sample quiz responses for mock-user (through the normal
+        # write path so the topic index stays consistent)
         self.quiz_responses[mock_user_id] = []
         if self.questions:
             for i, question in enumerate(self.questions[:10]):
                 is_correct = (i % 3 != 0)  # ~66% accuracy
-                self.quiz_responses[mock_user_id].append({
+                self.add_quiz_response(mock_user_id, {
                     "response_id": str(uuid.uuid4()),
                     "quiz_id": "sample-quiz-1",
                     "question_id": question["question_id"],
@@ -140,52 +195,195 @@ class MemoryStore:
         return self.test_results.get(user_id, [])
     
     def add_quiz_response(self, user_id: str, response: Dict):
-        """Add a quiz response."""
-        if user_id not in self.quiz_responses:
-            self.quiz_responses[user_id] = []
-        self.quiz_responses[user_id].append(response)
+        """Add a quiz response and update the user's running aggregates."""
+        self.add_quiz_responses(user_id, (response,))
+    
+    def add_quiz_responses(self, user_id: str, new_responses):
+        """Append many responses for one user in a single call.
+        
+        The per-user containers are resolved once for the whole batch
+        (mirrors add_conversation_messages); a real database would turn
+        this into one executemany instead of a round trip per row.
+        """
+        responses = self.quiz_responses.setdefault(user_id, [])
+        topic_index = self._quiz_topic_index.setdefault(user_id, {})
+        stats = self._user_stats.setdefault(user_id, {
+            "total": 0,
+            "correct": 0,
+            "topics": {},  # topic -> [total, correct]
+            "activity_dates": set(),
+            # (iso_timestamp, is_correct) kept sorted so recent-window
+            # reads can bisect instead of scanning the history
+            "ts_correct": []
+        })
+        for response in new_responses:
+            responses.append(response)
+            topic = response.get("topic")
+            if topic:
+                topic_index.setdefault(topic, []).append(len(responses) - 1)
+            
+            stats["total"] += 1
+            is_correct = bool(response.get("is_correct"))
+            if is_correct:
+                stats["correct"] += 1
+            topic_counts = stats["topics"].setdefault(response.get("topic", "unknown"), [0, 0])
+            topic_counts[0] += 1
+            if is_correct:
+                topic_counts[1] += 1
+            timestamp = response.get("timestamp")
+            if timestamp:
+                try:
+                    stats["activity_dates"].add(
+                        datetime.fromisoformat(timestamp.replace("Z", "+00:00")).date())
+                except ValueError:
+                    continue
+                bisect.insort(stats["ts_correct"], (timestamp, is_correct))
+    
+    def get_user_stats(self, user_id: str) -> Optional[Dict]:
+        """Get a user's running response aggregates, or None if no activity."""
+        return self._user_stats.get(user_id)
+    
+    def get_topic_stats(self, user_id: str) -> Dict[str, List[int]]:
+        """Get the running {topic: [total, correct]} counts for a user."""
+        stats = self._user_stats.get(user_id)
+        return stats["topics"] if stats else {}
+    
+    def get_section_topics(self, section: str) -> List[str]:
+        """Get the topics available in a section (question-bank order)."""
+        return self._section_topics.get(section, [])
     
     def get_quiz_responses(self, user_id: str) -> List[Dict]:
         """Get all quiz responses for a user."""
         return self.quiz_responses.get(user_id, [])
     
+    def get_recent_quiz_responses(self, user_id: str, n: int = 20) -> List[Dict]:
+        """Get the n most recent quiz responses (insertion order)."""
+        return self.quiz_responses.get(user_id, [])[-n:]
+    
+    def get_quiz_responses_by_topic(self, user_id: str, topic: str) -> List[Dict]:
+        """Get a user's responses for one topic via the topic index."""
+        responses = self.quiz_responses.get(user_id, [])
+        positions = self._quiz_topic_index.get(user_id, {}).get(topic, [])
+        return [responses[i] for i in positions]
+    
+    MAX_HISTORY = 200  # messages retained per session
+    
     def add_conversation_message(self, session_id: str, message: Dict):
         """Add a conversation message."""
-        if session_id not in self.conversation_history:
-            self.conversation_history[session_id] = []
-        self.conversation_history[session_id].append(message)
+        self.conversation_history.setdefault(
+            session_id, deque(maxlen=self.MAX_HISTORY)).append(message)
+    
+    def add_conversation_messages(self, messages: List[tuple]):
+        """Append many (session_id, message) pairs in one call.
+        
+        The batched form lets a write-behind queue amortize the per-write
+        round trip (executemany on a real database).
+        """
+        for session_id, message in messages:
+            self.conversation_history.setdefault(
+                session_id, deque(maxlen=self.MAX_HISTORY)).append(message)
     
-    def get_conversation_history(self, session_id: str, limit: int = 10) -> List[Dict]:
-        """Get conversation history for a session."""
-        messages = self.conversation_history.get(session_id, [])
-        return messages[-limit:] if messages else []
+    def get_conversation_history(self, session_id: str, limit: int = 10,
+                                 message_types: Optional[tuple] = None) -> List[Dict]:
+        """Get conversation history for a session.
+        
+        message_types optionally restricts the rows returned (e.g.
+        ("user", "assistant")); filtering happens store-side so the limit
+        counts only the rows the caller wants.
+        """
+        messages = self.conversation_history.get(session_id)
+        if not messages:
+            return []
+        if message_types is not None:
+            filtered = [m for m in messages if m.get("message_type") in message_types]
+            return filtered[-limit:]
+        return list(messages)[-limit:]
+    
+    def get_session_stats(self, session_id: str) -> Dict:
+        """Aggregate message counts and activity timestamps for a session.
+        
+        One pass over the stored rows instead of handing the whole
+        transcript back to the caller to count.
+        """
+        messages = self.conversation_history.get(session_id, ())
+        counts: Dict[str, int] = {"user": 0, "assistant": 0, "system": 0}
+        for msg in messages:
+            role = msg.get("message_type", "unknown")
+            counts[role] = counts.get(role, 0) + 1
+        return {
+            "counts": counts,
+            "started_at": messages[0].get("timestamp") if messages else None,
+            "last_activity": messages[-1].get("timestamp") if messages else None
+        }
     
     def save_quiz(self, quiz_id: str, quiz_data: Dict):
-        """Save a generated quiz."""
+        """Save a generated quiz and index its question ids."""
         self.quizzes[quiz_id] = quiz_data
+        self.quiz_question_ids[quiz_id] = frozenset(
+            q.get("question_id") for q in quiz_data.get("questions", []))
     
     def get_quiz(self, quiz_id: str) -> Optional[Dict]:
         """Get a quiz by ID."""
         return self.quizzes.get(quiz_id)
     
-    def get_questions(self, filters: Optional[Dict] = None, limit: int = 20) -> List[Dict]:
-        """Get questions with optional filters."""
-        questions = self.questions
-        
+    def _filter_question_ids(self, filters: tuple) -> tuple:
+        """Resolve a canonicalized filter signature to question positions."""
+        candidates = None
+        for field, value in filters:
+            index = self._question_index[field]
+            if isinstance(value, tuple):
+                matches = set().union(*(index.get(v, set()) for v in value)) if value else set()
+            else:
+                matches = index.get(value, set())
+            candidates = matches if candidates is None else candidates & matches
+            if not candidates:
+                return ()
+        # Sort positions to keep the original file order deterministic
+        return tuple(sorted(candidates))
+    
+    def _filter_positions(self, filters: Optional[Dict]):
+        """Resolve a filter dict to matching question positions."""
         if filters:
-            if "test_type" in filters:
-                questions = [q for q in questions if q.get("test_type") == filters["test_type"]]
-            if "section" in filters:
-                questions = [q for q in questions if q.get("section") == filters["section"]]
-            if "topic" in filters:
-                questions = [q for q in questions if q.get("topic") == filters["topic"]]
-            if "difficulty" in filters:
-                if isinstance(filters["difficulty"], list):
-                    questions = [q for q in questions if q.get("difficulty") in filters["difficulty"]]
-                else:
-                    questions = [q for q in questions if q.get("difficulty") == filters["difficulty"]]
+            # Canonicalize to a hashable signature (lists become tuples)
+            signature = tuple(
+                (field, tuple(filters[field]) if isinstance(filters[field], list) else filters[field])
+                for field in ("test_type", "section", "topic", "difficulty")
+                if field in filters
+            )
+            if signature:
+                return self._filter_ids_cached(signature)
+        return range(len(self.questions))
+    
+    def iter_questions(self, filters: Optional[Dict] = None,
+                       exclude_ids: Optional[set] = None) -> Iterator[Dict]:
+        """Lazily yield questions matching filters, in bank order.
+        
+        Consumers that stop early (or slice with islice) never pay for
+        rows past the ones they read.
+        """
+        for i in self._filter_positions(filters):
+            question = self.questions[i]
+            if exclude_ids and question.get("question_id") in exclude_ids:
+                continue
+            yield question
+    
+    def get_questions(self, filters: Optional[Dict] = None, limit: int = 20,
+                      exclude_ids: Optional[set] = None,
+                      group_by: Optional[str] = None):
+        """Get questions with optional filters.
         
-        return questions[:limit]
+        exclude_ids drops questions by question_id during the same pass,
+        and group_by buckets the results by a field (e.g. "difficulty")
+        so callers don't have to re-scan the returned list per bucket.
+        Returns a list, or a dict of lists when group_by is given.
+        """
+        rows = islice(self.iter_questions(filters, exclude_ids), limit)
+        if group_by is None:
+            return list(rows)
+        grouped: Dict[Any, List[Dict]] = {}
+        for question in rows:
+            grouped.setdefault(question.get(group_by), []).append(question)
+        return grouped
 
 
 # Global instance
@@ -0,0 +1,29 @@
+"""Memoized timestamp parsing shared by the analytics tools.
+
+Response timestamps are ISO-8601 strings that get re-parsed by every
+tool walking a user's history. fromisoformat plus the "Z" replace is
+the dominant cost of those loops on large histories, and the same
+strings recur across calls, so a cache turns repeat parses into dict
+hits. Failures return None instead of raising so callers can skip bad
+rows without a try/except in the loop.
+"""
+
+from datetime import date, datetime
+from functools import lru_cache
+from typing import Optional
+
+
+@lru_cache(maxsize=4096)
+def parse_ts(value: str) -> Optional[datetime]:
+    """Parse an ISO-8601 timestamp, or None if it doesn't parse."""
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+@lru_cache(maxsize=4096)
+def parse_date(value: str) -> Optional[date]:
+    """Parse an ISO-8601 timestamp down to its date, or None."""
+    ts = parse_ts(value)
+    return ts.date() if ts is not None else None
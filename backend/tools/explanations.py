@@ -1,8 +1,46 @@
 """Explanation and tutoring tools."""
 
+from functools import lru_cache
 from typing import Dict, Any, Optional
 from storage.memory_store import store
 
+# Tip payloads are constants; tuples so the cached results can be
+# shared between callers without defensive copies.
+_GENERAL_TIPS = (
+    "Practice regularly to build familiarity",
+    "Review incorrect answers carefully",
+    "Time yourself to improve speed",
+    "Identify patterns in question types"
+)
+
+_TOPIC_TIPS = {
+    "algebra": (
+        "Master FOIL and factoring techniques",
+        "Draw diagrams for word problems",
+        "Check your work by substituting answers back"
+    ),
+    "geometry": (
+        "Memorize key formulas for area and volume",
+        "Draw and label diagrams",
+        "Look for similar triangles and parallel lines"
+    ),
+    "reading_comprehension": (
+        "Read the questions before the passage",
+        "Underline key phrases",
+        "Eliminate obviously wrong answers first"
+    ),
+    "vocabulary": (
+        "Learn word roots and prefixes",
+        "Use flashcards for daily practice",
+        "Read widely to see words in context"
+    ),
+    "probability": (
+        "Draw tree diagrams for complex problems",
+        "Remember: P(A and B) = P(A) × P(B) for independent events",
+        "Count carefully and check your work"
+    )
+}
+
 
 def get_question_explanation(question_id: str, detailed: bool = True) -> Dict[str, Any]:
     """
@@ -15,7 +53,7 @@ def get_question_explanation(question_id: str, detailed: bool = True) -> Dict[st
     Returns:
         Question explanation with steps
     """
-    question = next((q for q in store.questions if q.get("question_id") == question_id), None)
+    question = store.questions_by_id.get(question_id)
     
     if not question:
         return {"error": "Question not found"}
@@ -54,43 +92,8 @@ def explain_topic_concept(topic: str, subtopic: Optional[str] = None) -> Dict[st
     }
 
 
-def _generate_learning_tips(topic: str) -> list:
+@lru_cache(maxsize=64)
+def _generate_learning_tips(topic: str) -> tuple:
     """Generate topic-specific learning tips."""
-    general_tips = [
-        "Practice regularly to build familiarity",
-        "Review incorrect answers carefully",
-        "Time yourself to improve speed",
-        "Identify patterns in question types"
-    ]
-    
-    # Topic-specific tips
-    topic_tips = {
-        "algebra": [
-            "Master FOIL and factoring techniques",
-            "Draw diagrams for word problems",
-            "Check your work by substituting answers back"
-        ],
-        "geometry": [
-            "Memorize key formulas for area and volume",
-            "Draw and label diagrams",
-            "Look for similar triangles and parallel lines"
-        ],
-        "reading_comprehension": [
-            "Read the questions before the passage",
-            "Underline key phrases",
-            "Eliminate obviously wrong answers first"
-        ],
-        "vocabulary": [
-            "Learn word roots and prefixes",
-            "Use flashcards for daily practice",
-            "Read widely to see words in context"
-        ],
-        "probability": [
-            "Draw tree diagrams for complex problems",
-            "Remember: P(A and B) = P(A) × P(B) for independent events",
-            "Count carefully and check your work"
-        ]
-    }
-    
-    return topic_tips.get(topic.lower(), general_tips)
+    return _TOPIC_TIPS.get(topic.lower(), _GENERAL_TIPS)
 
@@ -4,6 +4,17 @@ from typing import Dict, Any
 from datetime import datetime
 from storage.memory_store import store
 
+_CELEBRATIONS = {
+    "first_quiz": "🎯 First quiz complete! Great start to your learning journey!",
+    "perfect_score": "💯 Perfect score! You absolutely crushed it!",
+    "streak_week": "🔥 7-day streak! Your consistency is impressive!",
+    "100_questions": "💪 100 questions completed! You're building serious momentum!",
+    "score_improvement": "📈 Score improved! Your hard work is paying off!",
+    "reached_target": "🎉 You reached your target score! Amazing achievement!",
+    "10_day_streak": "⭐ 10-day streak! You're unstoppable!",
+    "50_questions": "🌟 50 questions down! You're making great progress!",
+}
+
 
 def generate_encouragement(user_id: str, context: str = "general") -> Dict[str, Any]:
     """
@@ -65,18 +76,7 @@ def celebrate_achievement(user_id: str, achievement_type: str) -> Dict[str, Any]
     Returns:
         Celebration message
     """
-    celebrations = {
-        "first_quiz": "🎯 First quiz complete! Great start to your learning journey!",
-        "perfect_score": "💯 Perfect score! You absolutely crushed it!",
-        "streak_week": "🔥 7-day streak! Your consistency is impressive!",
-        "100_questions": "💪 100 questions completed! You're building serious momentum!",
-        "score_improvement": "📈 Score improved! Your hard work is paying off!",
-        "reached_target": "🎉 You reached your target score! Amazing achievement!",
-        "10_day_streak": "⭐ 10-day streak! You're unstoppable!",
-        "50_questions": "🌟 50 questions down! You're making great progress!",
-    }
-    
-    message = celebrations.get(achievement_type, "🌟 Great achievement! Keep up the excellent work!")
+    message = _CELEBRATIONS.get(achievement_type, "🌟 Great achievement! Keep up the excellent work!")
     
     return {
         "achievement_type": achievement_type,
@@ -2,9 +2,37 @@
 
 from typing import Dict, Any, Optional, List
 from datetime import datetime, timedelta
-from collections import defaultdict
+from collections import Counter, defaultdict
+from operator import itemgetter
+import heapq
+import logging
 from storage.memory_store import store
 
+log = logging.getLogger("performance_analysis")
+
+# Chart styling constants for generate_bar_chart_data
+_SECTION_COLORS = {
+    "reading": "#1C1C1E",      # Darkest gray
+    "writing": "#3A3A3C",       # Medium-dark gray
+    "math": "#6D6D70",         # Medium gray
+    "verbal": "#8E8E93",       # Light gray
+    "quantitative": "#AEAEB2",  # Lightest gray
+    "reasoning": "#5A5A5D",    # Medium-light gray
+    "algebra": "#AEAEB2",      # Lightest gray
+    "geometry": "#C7C7CC"      # Very light gray
+}
+
+_DISPLAY_NAMES = {
+    "reading": "Reading",
+    "writing": "Writing",
+    "math": "Math",
+    "verbal": "Verbal",
+    "quantitative": "Quantitative",
+    "reasoning": "Reasoning",
+    "algebra": "Algebra",
+    "geometry": "Geometry"
+}
+
 
 def get_latest_test_results(user_id: str, test_id: Optional[str] = None) -> Dict[str, Any]:
     """
@@ -17,25 +45,21 @@ def get_latest_test_results(user_id: str, test_id: Optional[str] = None) -> Dict
     Returns:
         Test results with detailed breakdown
     """
-    print(f"🔍 get_latest_test_results called: user_id={user_id}, test_id={test_id}")
+    log.debug("get_latest_test_results user_id=%s test_id=%s", user_id, test_id)
     test_results = store.get_test_results(user_id)
-    print(f"  📊 Retrieved {len(test_results) if test_results else 0} test result(s) for user {user_id}")
     
     if not test_results:
-        error_msg = f"No test results found for user {user_id}"
-        print(f"  ❌ {error_msg}")
-        return {"error": error_msg, "user_id": user_id, "message": "No test results found. Make sure you have taken a practice test."}
+        log.debug("no test results for user %s", user_id)
+        return {"error": f"No test results found for user {user_id}", "user_id": user_id, "message": "No test results found. Make sure you have taken a practice test."}
     
     # Get specific test or most recent
     if test_id:
         test = next((t for t in test_results if t.get("test_id") == test_id), None)
         if not test:
-            error_msg = f"Test with ID {test_id} not found for user {user_id}"
-            print(f"  ❌ {error_msg}")
-            return {"error": error_msg, "test_id": test_id, "user_id": user_id}
+            log.debug("test %s not found for user %s", test_id, user_id)
+            return {"error": f"Test with ID {test_id} not found for user {user_id}", "test_id": test_id, "user_id": user_id}
     else:
         test = test_results[-1]  # Most recent
-        print(f"  ✅ Using most recent test: {test.get('test_id')}, score: {test.get('total_score')}")
     
     result = {
         "success": True,  # Explicitly mark success
@@ -47,14 +71,15 @@ def get_latest_test_results(user_id: str, test_id: Optional[str] = None) -> Dict
         "completion_status": test.get("completion_status"),
         "message": "Test results found successfully"  # Clear success message for LLM
     }
-    print(f"  ✅ Returning test results: total_score={result.get('total_score')}, sections={len(result.get('sections', {}))}")
+    log.debug("returning test %s total_score=%s", result.get("test_id"), result.get("total_score"))
     return result
 
 
 def analyze_performance_by_topic(
     user_id: str,
     section: str,
-    timeframe: str = "all"
+    timeframe: str = "all",
+    limit: int = 10
 ) -> Dict[str, Any]:
     """
     Break down performance by topic and subtopic for a specific section.
@@ -63,51 +88,37 @@ def analyze_performance_by_topic(
         user_id: User's unique identifier
         section: Section to analyze (math, reading, writing, verbal, quantitative)
         timeframe: Time period (week, month, all)
+        limit: Maximum topics (and subtopics per topic) to return
         
     Returns:
-        Detailed breakdown of performance by topic
+        Detailed breakdown of performance by topic, weakest first
     """
-    # Calculate date filter
+    # Calculate date filter. ISO-8601 timestamps sort lexically, so the
+    # timeframe check is a plain string compare - no per-response parsing.
     if timeframe == "week":
-        cutoff_date = datetime.now() - timedelta(days=7)
+        cutoff_iso = (datetime.now() - timedelta(days=7)).isoformat()
     elif timeframe == "month":
-        cutoff_date = datetime.now() - timedelta(days=30)
+        cutoff_iso = (datetime.now() - timedelta(days=30)).isoformat()
     else:
-        cutoff_date = datetime.min
+        cutoff_iso = datetime.min.isoformat()
     
-    # Get quiz responses
     responses = store.get_quiz_responses(user_id)
+    questions_by_id = store.questions_by_id
     
-    # Filter by section and timeframe
-    filtered_responses = []
-    for response in responses:
-        try:
-            response_date = datetime.fromisoformat(response["timestamp"].replace("Z", "+00:00"))
-            if response_date >= cutoff_date:
-                # Get question to check section
-                question_id = response.get("question_id")
-                question = next((q for q in store.questions if q.get("question_id") == question_id), None)
-                if question and question.get("section") == section:
-                    filtered_responses.append((response, question))
-        except:
-            pass
-    
-    if not filtered_responses:
-        return {
-            "section": section,
-            "timeframe": timeframe,
-            "message": "No practice data found for this section",
-            "topics": []
-        }
-    
-    # Organize by topic
+    # Filter, join and aggregate in a single pass
     topic_stats = defaultdict(lambda: {
         "total": 0,
         "correct": 0,
         "subtopics": defaultdict(lambda: {"total": 0, "correct": 0})
     })
     
-    for response, question in filtered_responses:
+    for response in responses:
+        if response.get("timestamp", "") < cutoff_iso:
+            continue
+        question = questions_by_id.get(response.get("question_id"))
+        if not question or question.get("section") != section:
+            continue
+        
         topic = question.get("topic", "unknown")
         subtopic = question.get("subtopic", "general")
         
@@ -118,10 +129,24 @@ def analyze_performance_by_topic(
             topic_stats[topic]["correct"] += 1
             topic_stats[topic]["subtopics"][subtopic]["correct"] += 1
     
-    # Format results
+    if not topic_stats:
+        return {
+            "section": section,
+            "timeframe": timeframe,
+            "message": "No practice data found for this section",
+            "topics": []
+        }
+    
+    # Format results; overall totals cover every topic even when the
+    # returned list is truncated to the weakest `limit`
+    by_accuracy = itemgetter("accuracy")
     topics = []
+    total_attempted = 0
+    total_correct = 0
     for topic, stats in topic_stats.items():
         accuracy = (stats["correct"] / stats["total"] * 100) if stats["total"] > 0 else 0
+        total_attempted += stats["total"]
+        total_correct += stats["correct"]
         
         subtopics = [
             {
@@ -133,28 +158,24 @@ def analyze_performance_by_topic(
             for subtopic, sub_stats in stats["subtopics"].items()
         ]
         
-        # Sort subtopics by accuracy (weakest first)
-        subtopics.sort(key=lambda x: x["accuracy"])
-        
         topics.append({
             "topic": topic,
             "attempted": stats["total"],
             "correct": stats["correct"],
             "accuracy": round(accuracy, 2),
-            "subtopics": subtopics
+            # Weakest subtopics first; callers only display the top few
+            "subtopics": heapq.nsmallest(limit, subtopics, key=by_accuracy)
         })
     
-    # Sort topics by accuracy (weakest first)
-    topics.sort(key=lambda x: x["accuracy"])
+    # Weakest topics first, without sorting the full list
+    topics = heapq.nsmallest(limit, topics, key=by_accuracy)
     
-    overall_accuracy = (
-        sum(t["correct"] for t in topics) / sum(t["attempted"] for t in topics) * 100
-    ) if topics else 0
+    overall_accuracy = (total_correct / total_attempted * 100) if total_attempted else 0
     
     return {
         "section": section,
         "timeframe": timeframe,
-        "total_questions": sum(t["attempted"] for t in topics),
+        "total_questions": total_attempted,
         "overall_accuracy": round(overall_accuracy, 2),
         "topics": topics
     }
@@ -173,13 +194,15 @@ def identify_error_patterns(user_id: str, question_ids: Optional[List[str]] = No
     """
     responses = store.get_quiz_responses(user_id)
     
-    # Filter incorrect responses
-    errors = [(r, next((q for q in store.questions if q.get("question_id") == r.get("question_id")), None))
+    # Filter incorrect responses, joining questions through the id index
+    qmap = store.questions_by_id
+    errors = [(r, qmap.get(r.get("question_id")))
               for r in responses if not r.get("is_correct")]
     
     # Further filter by question_ids if provided
     if question_ids:
-        errors = [(r, q) for r, q in errors if r.get("question_id") in question_ids]
+        qid_set = set(question_ids)
+        errors = [(r, q) for r, q in errors if r.get("question_id") in qid_set]
     
     if not errors:
         return {
@@ -187,9 +210,9 @@ def identify_error_patterns(user_id: str, question_ids: Optional[List[str]] = No
             "patterns": []
         }
     
-    # Analyze patterns
-    difficulty_errors = defaultdict(int)
-    topic_errors = defaultdict(int)
+    # Analyze patterns in one pass
+    difficulty_errors = Counter()
+    topic_errors = Counter()
     time_related = []
     
     for response, question in errors:
@@ -210,8 +233,8 @@ def identify_error_patterns(user_id: str, question_ids: Optional[List[str]] = No
     
     patterns = []
     
-    # Most common error topics
-    top_error_topics = sorted(topic_errors.items(), key=lambda x: x[1], reverse=True)[:5]
+    # Most common error topics; most_common uses a heap for small k
+    top_error_topics = topic_errors.most_common(5)
     if top_error_topics:
         patterns.append({
             "type": "topic_weakness",
@@ -360,53 +383,22 @@ def generate_bar_chart_data(user_id: str, test_id: Optional[str] = None) -> Dict
     if not sections:
         return {"error": "No section data available"}
     
-    # Define colors for different sections/topics
-    section_colors = {
-        "reading": "#1C1C1E",      # Darkest gray
-        "writing": "#3A3A3C",       # Medium-dark gray
-        "math": "#6D6D70",         # Medium gray
-        "verbal": "#8E8E93",       # Light gray
-        "quantitative": "#AEAEB2",  # Lightest gray
-        "reasoning": "#5A5A5D",    # Medium-light gray
-        "algebra": "#AEAEB2",      # Lightest gray
-        "geometry": "#C7C7CC"      # Very light gray
-    }
-    
-    # Map section names to display names
-    display_names = {
-        "reading": "Reading",
-        "writing": "Writing",
-        "math": "Math",
-        "verbal": "Verbal",
-        "quantitative": "Quantitative",
-        "reasoning": "Reasoning",
-        "algebra": "Algebra",
-        "geometry": "Geometry"
-    }
-    
-    # Build bar chart data
-    bars = []
-    max_score = 0
-    
-    for section_key, section_data in sections.items():
-        score = section_data.get("score", 0)
-        max_score = max(max_score, score)
-        
-        display_name = display_names.get(section_key, section_key.title())
-        color = section_colors.get(section_key, "#8E8E93")
-        
-        # Calculate percentage if total score available
-        total_score = test.get("total_score", 0)
-        percentage = round((score / total_score * 100) if total_score > 0 else 0, 0)
-        
-        bars.append({
-            "label": display_name,
-            "value": score,
-            "percentage": int(percentage),
-            "color": color,
+    # Compute the max and total once; the old running max meant bars
+    # built early carried a smaller max_value than later ones
+    max_score = max((sd.get("score", 0) for sd in sections.values()), default=0)
+    total_score = test.get("total_score", 0)
+    
+    bars = [
+        {
+            "label": _DISPLAY_NAMES.get(section_key, section_key.title()),
+            "value": (score := section_data.get("score", 0)),
+            "percentage": int(round(score / total_score * 100, 0)) if total_score > 0 else 0,
+            "color": _SECTION_COLORS.get(section_key, "#8E8E93"),
             "section_key": section_key,
             "max_value": max_score
-        })
+        }
+        for section_key, section_data in sections.items()
+    ]
     
     # Sort by value (descending) for better visualization
     bars.sort(key=lambda x: x["value"], reverse=True)
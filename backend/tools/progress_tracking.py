@@ -2,7 +2,9 @@
 
 from typing import Dict, Any
 from datetime import datetime, timedelta
+import bisect
 from storage.memory_store import store
+from tools._dates import parse_date
 
 
 def get_progress_summary(user_id: str) -> Dict[str, Any]:
@@ -28,25 +30,21 @@ def get_progress_summary(user_id: str) -> Dict[str, Any]:
             "total_questions": 0
         }
     
-    # Calculate overall statistics
-    total_questions = len(responses)
-    total_correct = sum(1 for r in responses if r.get("is_correct"))
+    # Overall statistics come from the store's running aggregates
+    stats = store.get_user_stats(user_id)
+    total_questions = stats["total"] if stats else 0
+    total_correct = stats["correct"] if stats else 0
     overall_accuracy = (total_correct / total_questions * 100) if total_questions > 0 else 0
     
-    # Calculate weekly trend
-    one_week_ago = datetime.now() - timedelta(days=7)
-    recent_responses = []
-    for r in responses:
-        try:
-            timestamp = datetime.fromisoformat(r["timestamp"].replace("Z", "+00:00"))
-            if timestamp >= one_week_ago:
-                recent_responses.append(r)
-        except:
-            pass
+    # Weekly trend: the store keeps (timestamp, is_correct) sorted, so
+    # the recent window is a bisect plus a tail slice
+    one_week_ago_iso = (datetime.now() - timedelta(days=7)).isoformat()
+    ts_correct = stats["ts_correct"] if stats else []
+    recent = ts_correct[bisect.bisect_left(ts_correct, (one_week_ago_iso,)):]
     
     recent_accuracy = (
-        sum(1 for r in recent_responses if r.get("is_correct")) / len(recent_responses) * 100
-        if recent_responses else overall_accuracy
+        sum(1 for _, correct in recent if correct) / len(recent) * 100
+        if recent else overall_accuracy
     )
     
     # Score progression
@@ -97,39 +95,30 @@ def get_progress_summary(user_id: str) -> Dict[str, Any]:
     days_until_test = None
     test_date = user.get("test_date")
     if test_date:
-        try:
-            test_datetime = datetime.fromisoformat(test_date.replace("Z", "+00:00"))
-            days_until_test = (test_datetime.date() - datetime.now().date()).days
-        except:
-            pass
+        test_day = parse_date(test_date)
+        if test_day is not None:
+            days_until_test = (test_day - datetime.now().date()).days
     
     # Current score
     current_score = test_results[-1].get("total_score") if test_results else user.get("baseline_score")
     
-    # Calculate topic-wise performance for weak/strong areas
-    topic_performance = {}
-    for r in responses:
-        topic = r.get("topic", "unknown")
-        if topic not in topic_performance:
-            topic_performance[topic] = {"total": 0, "correct": 0}
-        topic_performance[topic]["total"] += 1
-        if r.get("is_correct"):
-            topic_performance[topic]["correct"] += 1
-    
-    # Calculate accuracy per topic and sort
-    topic_accuracies = []
-    for topic, stats in topic_performance.items():
-        if stats["total"] > 0:
-            accuracy = (stats["correct"] / stats["total"]) * 100
-            topic_accuracies.append({
-                "topic": topic,
-                "accuracy": round(accuracy, 1),
-                "questions": stats["total"]
-            })
+    # Topic-wise performance for weak/strong areas, from the same
+    # aggregates instead of another pass over the history
+    topic_accuracies = [
+        {
+            "topic": topic,
+            "accuracy": round(correct / total * 100, 1),
+            "questions": total
+        }
+        for topic, (total, correct) in (stats["topics"].items() if stats else ())
+        if total > 0
+    ]
     
     topic_accuracies.sort(key=lambda x: x["accuracy"])
     weak_areas = topic_accuracies[:3]  # Bottom 3
-    strong_areas = sorted(topic_accuracies, key=lambda x: x["accuracy"], reverse=True)[:3]  # Top 3
+    # Stable descending re-sort so tied topics keep their original
+    # order (reversing the ascending tail would flip ties)
+    strong_areas = sorted(topic_accuracies, key=lambda x: x["accuracy"], reverse=True)[:3]
     
     return {
         "user_id": user_id,
@@ -145,7 +134,7 @@ def get_progress_summary(user_id: str) -> Dict[str, Any]:
         "score_progression": score_progression,
         "improvement": improvement,
         "milestones": milestones,
-        "practice_streak": _calculate_streak(responses),
+        "practice_streak": _calculate_streak(stats["activity_dates"] if stats else ()),
         "weak_areas": weak_areas,
         "strong_areas": strong_areas
     }
@@ -161,18 +150,10 @@ def track_study_streak(user_id: str) -> Dict[str, Any]:
     Returns:
         Streak information and motivation
     """
-    responses = store.get_quiz_responses(user_id)
-    
-    streak_days = _calculate_streak(responses)
+    stats = store.get_user_stats(user_id)
+    study_dates = stats["activity_dates"] if stats else set()
     
-    # Count unique study days
-    study_dates = set()
-    for r in responses:
-        try:
-            timestamp = datetime.fromisoformat(r["timestamp"].replace("Z", "+00:00"))
-            study_dates.add(timestamp.date())
-        except:
-            pass
+    streak_days = _calculate_streak(study_dates)
     
     return {
         "current_streak": streak_days,
@@ -187,33 +168,24 @@ def track_study_streak(user_id: str) -> Dict[str, Any]:
     }
 
 
-def _calculate_streak(responses: list) -> int:
-    """Calculate current study streak in days."""
-    if not responses:
-        return 0
-    
-    # Get unique dates
-    activity_dates = set()
-    for r in responses:
-        try:
-            timestamp = datetime.fromisoformat(r["timestamp"].replace("Z", "+00:00"))
-            activity_dates.add(timestamp.date())
-        except:
-            pass
+def _calculate_streak(activity_dates) -> int:
+    """Calculate current study streak in days.
     
+    Walks backward from today through the activity-date set, so the
+    cost is O(streak length) with no sort; a streak still counts if
+    the last activity was yesterday.
+    """
     if not activity_dates:
         return 0
     
-    sorted_dates = sorted(activity_dates, reverse=True)
+    day = datetime.now().date()
+    if day not in activity_dates:
+        day -= timedelta(days=1)
+    
     streak = 0
-    expected_date = datetime.now().date()
-    
-    for date in sorted_dates:
-        if date == expected_date or (expected_date - date).days <= 1:
-            streak += 1
-            expected_date = date
-        else:
-            break
+    while day in activity_dates:
+        streak += 1
+        day -= timedelta(days=1)
     
     return streak
 
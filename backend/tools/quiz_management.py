@@ -2,10 +2,14 @@
 
 from typing import Dict, Any, List, Optional
 from datetime import datetime
+from itertools import islice
+import logging
 import uuid
 import random
 from storage.memory_store import store
 
+log = logging.getLogger("quiz_management")
+
 
 def search_questions(filters: Dict[str, Any], limit: int = 20) -> List[Dict[str, Any]]:
     """
@@ -18,8 +22,7 @@ def search_questions(filters: Dict[str, Any], limit: int = 20) -> List[Dict[str,
     Returns:
         List of questions matching criteria
     """
-    questions = store.get_questions(filters, limit)
-    return questions
+    return list(islice(store.iter_questions(filters), limit))
 
 
 def generate_adaptive_quiz(user_id: str, config: Dict[str, Any]) -> Dict[str, Any]:
@@ -34,90 +37,87 @@ def generate_adaptive_quiz(user_id: str, config: Dict[str, Any]) -> Dict[str, An
         Generated quiz with questions
     """
     # Get user profile
-    print(f"🔍 generate_adaptive_quiz called: user_id={user_id}, config={config}")
+    log.debug("generate_adaptive_quiz called: user_id=%s config=%s", user_id, config)
     user = store.get_user(user_id)
     if not user:
-        error_msg = f"User not found: {user_id}"
-        print(f"  ❌ {error_msg}")
-        return {"error": error_msg, "message": "User profile not found. Please check the user ID."}
+        log.warning("generate_adaptive_quiz: user not found: %s", user_id)
+        return {"error": f"User not found: {user_id}",
+                "message": "User profile not found. Please check the user ID."}
     
     quiz_size = config.get("size", 20)
     test_type = config.get("test_type", user.get("test_type"))
     section = config.get("section")
     focus_topics = config.get("topics", [])
     
-    # Get user's recent performance to determine weak areas
-    responses = store.get_quiz_responses(user_id)
-    recent_responses = responses[-50:] if len(responses) > 50 else responses  # Last 50
-    
-    # Analyze weak topics
-    topic_performance = {}
-    for response in recent_responses:
-        # Find the question
-        question = next((q for q in store.questions if q.get("question_id") == response.get("question_id")), None)
-        if question:
-            topic = question.get("topic")
-            if topic not in topic_performance:
-                topic_performance[topic] = {"total": 0, "correct": 0}
-            topic_performance[topic]["total"] += 1
-            if response.get("is_correct"):
-                topic_performance[topic]["correct"] += 1
-    
-    # Identify weak topics (< 70% accuracy)
-    weak_topics = [
-        topic for topic, perf in topic_performance.items()
-        if perf["total"] >= 3 and (perf["correct"] / perf["total"]) < 0.7
-    ]
+    # Get user's recent performance to determine weak areas; responses
+    # carry their topic (saved at submit time), so no question lookups.
+    # Explicit focus topics override weak topics, so skip the analysis
+    # entirely when the caller pinned them (or there is no history).
+    recent_responses = store.get_recent_quiz_responses(user_id, 50)
+    weak_topics = []
+    if not focus_topics and recent_responses:
+        topic_performance = {}
+        for response in recent_responses:
+            topic = response.get("topic")
+            if topic:
+                perf = topic_performance.setdefault(topic, [0, 0])
+                perf[0] += 1
+                if response.get("is_correct"):
+                    perf[1] += 1
+        
+        # Identify weak topics (< 70% accuracy)
+        weak_topics = [
+            topic for topic, (total, correct) in topic_performance.items()
+            if total >= 3 and (correct / total) < 0.7
+        ]
     
     # Build filter - try to match test type first
     filters = {"test_type": test_type}
     if section:
         filters["section"] = section
     
-    # Get all matching questions
-    all_questions = store.get_questions(filters, limit=1000)
+    # Exclude recently seen questions and bucket by difficulty inside
+    # the store's single pass instead of re-scanning the result here
+    recent_question_ids = (
+        {r.get("question_id") for r in recent_responses[-20:]} if recent_responses else set())
+    questions_by_difficulty = store.get_questions(
+        filters, limit=1000, exclude_ids=recent_question_ids, group_by="difficulty")
     
     # If no questions found for this test type, try without test type filter (fallback)
-    if not all_questions:
-        print(f"⚠️  No questions found for test_type='{test_type}', trying without test type filter")
-        filters_without_test_type = {}
-        if section:
-            filters_without_test_type["section"] = section
-        all_questions = store.get_questions(filters_without_test_type, limit=1000)
-        
-        if all_questions:
-            print(f"✅ Found {len(all_questions)} questions using fallback (any test type)")
+    if not questions_by_difficulty:
+        log.debug("no questions for test_type=%s, retrying without test type filter", test_type)
+        filters = {"section": section} if section else {}
+        questions_by_difficulty = store.get_questions(
+            filters, limit=1000, exclude_ids=recent_question_ids, group_by="difficulty")
     
-    # Prioritize weak topics if available
-    target_topics = focus_topics or weak_topics
-    
-    # Exclude recently seen questions (only if we have enough questions)
-    recent_question_ids = {r.get("question_id") for r in recent_responses[-20:]}
-    available_questions = [q for q in all_questions if q.get("question_id") not in recent_question_ids]
+    available_count = sum(len(qs) for qs in questions_by_difficulty.values())
     
     # If excluding recent questions leaves us with too few, use all questions
-    if len(available_questions) < quiz_size and len(all_questions) >= quiz_size:
-        print(f"⚠️  Only {len(available_questions)} new questions available, using all {len(all_questions)} questions (including recent ones)")
-        available_questions = all_questions
+    if available_count < quiz_size:
+        with_recent = store.get_questions(filters, limit=1000, group_by="difficulty")
+        total_count = sum(len(qs) for qs in with_recent.values())
+        if total_count >= quiz_size:
+            log.debug("only %d new questions available, using all %d including recent ones",
+                      available_count, total_count)
+            questions_by_difficulty = with_recent
+            available_count = total_count
     
-    if not available_questions:
+    if not available_count:
         return {
             "error": "No questions available matching criteria",
-            "details": f"Tried test_type='{test_type}', section='{section}', found {len(all_questions)} total questions"
+            "details": f"Tried test_type='{test_type}', section='{section}'"
         }
     
-    # If we have target topics, prioritize them
+    # Prioritize weak topics if available
+    target_topics = focus_topics or weak_topics
     if target_topics:
-        prioritized = [q for q in available_questions if q.get("topic") in target_topics]
-        if prioritized:
-            available_questions = prioritized
-    
-    # Separate by difficulty
-    questions_by_difficulty = {
-        "easy": [q for q in available_questions if q.get("difficulty") == "easy"],
-        "medium": [q for q in available_questions if q.get("difficulty") == "medium"],
-        "hard": [q for q in available_questions if q.get("difficulty") == "hard"]
-    }
+        topic_set = set(target_topics)
+        prioritized = {
+            difficulty: [q for q in qs if q.get("topic") in topic_set]
+            for difficulty, qs in questions_by_difficulty.items()
+        }
+        if any(prioritized.values()):
+            questions_by_difficulty = prioritized
     
     # Select questions with 30% easy, 50% medium, 20% hard distribution
     selected_questions = []
@@ -127,22 +127,16 @@ def generate_adaptive_quiz(user_id: str, config: Dict[str, Any]) -> Dict[str, An
     num_hard = quiz_size - num_easy - num_medium
     
     # Randomly select from each difficulty
-    if questions_by_difficulty["easy"]:
-        selected_questions.extend(
-            random.sample(questions_by_difficulty["easy"], min(num_easy, len(questions_by_difficulty["easy"])))
-        )
-    if questions_by_difficulty["medium"]:
-        selected_questions.extend(
-            random.sample(questions_by_difficulty["medium"], min(num_medium, len(questions_by_difficulty["medium"])))
-        )
-    if questions_by_difficulty["hard"]:
-        selected_questions.extend(
-            random.sample(questions_by_difficulty["hard"], min(num_hard, len(questions_by_difficulty["hard"])))
-        )
+    for difficulty, num_needed in (("easy", num_easy), ("medium", num_medium), ("hard", num_hard)):
+        pool = questions_by_difficulty.get(difficulty)
+        if pool:
+            selected_questions.extend(random.sample(pool, min(num_needed, len(pool))))
     
     # If we don't have enough, fill from available
     if len(selected_questions) < quiz_size:
-        remaining = [q for q in available_questions if q not in selected_questions]
+        selected_ids = {q.get("question_id") for q in selected_questions}
+        remaining = [q for qs in questions_by_difficulty.values() for q in qs
+                     if q.get("question_id") not in selected_ids]
         needed = quiz_size - len(selected_questions)
         selected_questions.extend(random.sample(remaining, min(needed, len(remaining))))
     
@@ -150,12 +144,13 @@ def generate_adaptive_quiz(user_id: str, config: Dict[str, Any]) -> Dict[str, An
     random.shuffle(selected_questions)
     
     quiz_id = str(uuid.uuid4())
+    created_at = datetime.now().isoformat()
     
     # Save quiz
     quiz_data = {
         "quiz_id": quiz_id,
         "user_id": user_id,
-        "created_at": datetime.now().isoformat(),
+        "created_at": created_at,
         "questions": selected_questions
     }
     store.save_quiz(quiz_id, quiz_data)
@@ -165,7 +160,7 @@ def generate_adaptive_quiz(user_id: str, config: Dict[str, Any]) -> Dict[str, An
         "message": f"Successfully created a personalized quiz with {len(selected_questions)} questions",
         "quiz_id": quiz_id,
         "user_id": user_id,
-        "created_at": datetime.now().isoformat(),
+        "created_at": created_at,
         "total_questions": len(selected_questions),
         "section": section or "mixed",
         "focus_areas": target_topics[:3] if target_topics else ["general"],
@@ -201,35 +196,37 @@ def submit_quiz_response(
         Feedback on performance with explanations
     """
     results = []
-    total_correct = 0
-    total_time = 0
+    response_records = []
+    submitted_at = datetime.now().isoformat()
+    
+    # Known quiz: validate each response against the quiz's own question
+    # ids in O(1) before doing any lookups
+    quiz_question_ids = store.quiz_question_ids.get(quiz_id)
     
     for response_data in responses:
         question_id = response_data.get("question_id")
         user_answer = response_data.get("answer")
         time_spent = response_data.get("time_spent", 0)
         
+        if quiz_question_ids is not None and question_id not in quiz_question_ids:
+            continue
+        
         # Get question
-        question = next((q for q in store.questions if q.get("question_id") == question_id), None)
+        question = store.questions_by_id.get(question_id)
         
         if not question:
             continue
         
         is_correct = user_answer == question.get("correct_answer")
-        if is_correct:
-            total_correct += 1
         
-        total_time += time_spent
-        
-        # Save response
-        store.add_quiz_response(user_id, {
+        response_records.append({
             "response_id": str(uuid.uuid4()),
             "quiz_id": quiz_id,
             "question_id": question_id,
             "user_answer": user_answer,
             "is_correct": is_correct,
             "time_spent": time_spent,
-            "timestamp": datetime.now().isoformat(),
+            "timestamp": submitted_at,
             "topic": question.get("topic"),
             "difficulty": question.get("difficulty")
         })
@@ -244,6 +241,11 @@ def submit_quiz_response(
             "explanation": question.get("explanation") if not is_correct else None
         })
     
+    # One store write for the whole submission
+    store.add_quiz_responses(user_id, response_records)
+    
+    total_correct = sum(r["is_correct"] for r in response_records)
+    total_time = sum(r["time_spent"] for r in response_records)
     accuracy = (total_correct / len(responses) * 100) if responses else 0
     
     # Determine performance level
@@ -1,8 +1,10 @@
 """User profile management tools."""
 
 from typing import Dict, Any
-from datetime import datetime
+from collections import Counter
+from datetime import datetime, timedelta
 from storage.memory_store import store
+from tools._dates import parse_date, parse_ts
 
 
 def get_user_profile(user_id: str) -> Dict[str, Any]:
@@ -23,11 +25,9 @@ def get_user_profile(user_id: str) -> Dict[str, Any]:
     # Calculate days until test if test_date exists
     days_until_test = None
     if user.get("test_date"):
-        try:
-            test_date = datetime.fromisoformat(user["test_date"].replace("Z", "+00:00"))
+        test_date = parse_ts(user["test_date"])
+        if test_date is not None:
             days_until_test = (test_date - datetime.now()).days
-        except:
-            pass
     
     return {
         "user_id": user.get("user_id"),
@@ -44,6 +44,29 @@ def get_user_profile(user_id: str) -> Dict[str, Any]:
     }
 
 
+def get_user_dashboard_bundle(user_id: str) -> Dict[str, Any]:
+    """
+    Fetch profile, progress summary and latest test results in one call.
+
+    Session start needs all three for the same user; bundling them into a
+    single call avoids three separate round trips to the store layer.
+
+    Args:
+        user_id: User's unique identifier
+
+    Returns:
+        Dictionary with "profile", "progress" and "latest_test" entries
+    """
+    from tools.progress_tracking import get_progress_summary
+    from tools.performance_analysis import get_latest_test_results
+
+    return {
+        "profile": get_user_profile(user_id),
+        "progress": get_progress_summary(user_id),
+        "latest_test": get_latest_test_results(user_id)
+    }
+
+
 def update_user_profile(user_id: str, updates: Dict[str, Any]) -> Dict[str, Any]:
     """
     Update user preferences, goals, or profile information.
@@ -89,65 +112,56 @@ def get_learning_history(user_id: str, days: int = 30) -> Dict[str, Any]:
     # Get quiz responses
     responses = store.get_quiz_responses(user_id)
     
-    # Filter by timeframe
-    cutoff = datetime.now().timestamp() - (days * 24 * 60 * 60)
-    recent_responses = []
-    for r in responses:
-        try:
-            timestamp = datetime.fromisoformat(r["timestamp"].replace("Z", "+00:00")).timestamp()
-            if timestamp >= cutoff:
-                recent_responses.append(r)
-        except:
-            # Include if can't parse timestamp
-            recent_responses.append(r)
+    # Filter by timeframe. Timestamps are ISO-8601 strings, so the
+    # cutoff check is a lexical comparison and needs no parsing; rows
+    # without a timestamp are kept, matching the old lenient behavior.
+    now = datetime.now()
+    cutoff_iso = (now - timedelta(days=days)).isoformat()
+    recent_responses = [r for r in responses
+                        if not (ts := r.get("timestamp")) or ts >= cutoff_iso]
+    
+    # Tally per-topic counts in one pass; integer Counter buckets beat
+    # a nested dict per topic for these increments
+    totals = Counter()
+    corrects = Counter()
+    for r in recent_responses:
+        topic = r.get("topic", "unknown")
+        totals[topic] += 1
+        corrects[topic] += bool(r.get("is_correct"))
     
     # Calculate statistics
     total_questions = len(recent_responses)
-    correct_answers = sum(1 for r in recent_responses if r.get("is_correct"))
+    correct_answers = sum(corrects.values())
     accuracy = (correct_answers / total_questions * 100) if total_questions > 0 else 0
     
-    # Calculate streak (consecutive days with activity)
-    activity_dates = set()
-    for r in recent_responses:
-        try:
-            date = datetime.fromisoformat(r["timestamp"].replace("Z", "+00:00")).date()
-            activity_dates.add(date)
-        except:
-            pass
+    # Calculate streak (consecutive days with activity) by walking back
+    # from today over the date set; stops at the first gap, no sort
+    activity_dates = {d for d in (parse_date(r.get("timestamp")) for r in recent_responses)
+                      if d is not None}
     
-    sorted_dates = sorted(activity_dates, reverse=True)
     current_streak = 0
-    if sorted_dates:
-        expected_date = datetime.now().date()
-        for date in sorted_dates:
-            if date == expected_date or (expected_date - date).days <= 1:
-                current_streak += 1
-                expected_date = date
-            else:
-                break
-    
-    # Group by topic
-    topic_stats = {}
-    for r in recent_responses:
-        topic = r.get("topic", "unknown")
-        if topic not in topic_stats:
-            topic_stats[topic] = {"total": 0, "correct": 0}
-        topic_stats[topic]["total"] += 1
-        if r.get("is_correct"):
-            topic_stats[topic]["correct"] += 1
+    if activity_dates:
+        day = now.date()
+        if day not in activity_dates:
+            # Today may not have activity yet; a streak through
+            # yesterday still counts
+            day -= timedelta(days=1)
+        while day in activity_dates:
+            current_streak += 1
+            day -= timedelta(days=1)
     
     return {
         "period_days": days,
         "total_questions_attempted": total_questions,
         "accuracy_rate": round(accuracy, 2),
         "current_streak_days": current_streak,
-        "topics_practiced": len(topic_stats),
+        "topics_practiced": len(totals),
         "topic_breakdown": {
             topic: {
-                "attempted": stats["total"],
-                "accuracy": round(stats["correct"] / stats["total"] * 100, 2) if stats["total"] > 0 else 0
+                "attempted": total,
+                "accuracy": round(corrects[topic] / total * 100, 2) if total > 0 else 0
             }
-            for topic, stats in topic_stats.items()
+            for topic, total in totals.items()
         }
     }
 